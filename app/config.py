@@ -8,17 +8,124 @@ load_dotenv()
 # API Keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# LLM response cache; set LLM_CACHE_PATH to a SQLite file to enable the on-disk tier
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1024))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", 100000))
+
 # Model Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096))
+
+# Chunking: "tokens" fits chunks to the embedding model's token window and breaks
+# between sentences; "chars" is the original fixed 1000-character split
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "tokens")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0))  # 0 means the model's limit
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+
+# Persistent chunk embedding store, so re-crawls and index rebuilds skip the model
+# for text it has already embedded; set EMBEDDING_STORE_DIRECTORY to "" to disable.
+# The directory is locked while open, so each worker process needs its own.
+EMBEDDING_STORE_DIRECTORY = os.getenv("EMBEDDING_STORE_DIRECTORY", "./embedding_store")
+EMBEDDING_STORE_MAX_ENTRIES = int(os.getenv("EMBEDDING_STORE_MAX_ENTRIES", 200000))
+
+# Startup: build services in the background so liveness answers immediately,
+# then run one dummy encode and query before reporting ready
+BACKGROUND_STARTUP = os.getenv("BACKGROUND_STARTUP", "true").lower() == "true"
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
 
 # Vector Database Configuration
 CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
 
+# Vector index backend: "chroma", or "memmap" for the built-in index of memory-mapped
+# segments, searched exactly ("flat") or through inverted lists ("ivf", VECTOR_IVF_NPROBE
+# lists per segment). Segments hold up to VECTOR_SEGMENT_ROWS chunks and are rewritten
+# in the background once VECTOR_COMPACTION_DEAD_RATIO of their rows are deleted or replaced.
+# The index directory is locked while open, so each worker process needs its own.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+VECTOR_INDEX_DIRECTORY = os.getenv("VECTOR_INDEX_DIRECTORY", os.path.join(CHROMA_PERSIST_DIRECTORY, "memmap"))
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "flat").lower()
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", 16))
+VECTOR_SEGMENT_ROWS = int(os.getenv("VECTOR_SEGMENT_ROWS", 65536))
+VECTOR_COMPACTION_DEAD_RATIO = float(os.getenv("VECTOR_COMPACTION_DEAD_RATIO", 0.2))
+
+# Quantized copy of the chunk embeddings ("none", "float16" or "int8"). When enabled,
+# unfiltered dense search scans it for QUANTIZED_RERANK_MULTIPLIER candidates per
+# requested result and re-ranks them exactly against the float32 embeddings. The
+# store directory is locked while open, so each worker process needs its own.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+QUANTIZED_STORE_DIRECTORY = os.getenv(
+    "QUANTIZED_STORE_DIRECTORY", os.path.join(CHROMA_PERSIST_DIRECTORY, "quantized")
+)
+QUANTIZED_RERANK_MULTIPLIER = int(os.getenv("QUANTIZED_RERANK_MULTIPLIER", 4))
+
+# Per-URL crawl/index records used for incremental re-crawls
+PAGE_REGISTRY_PATH = os.getenv(
+    "PAGE_REGISTRY_PATH", os.path.join(CHROMA_PERSIST_DIRECTORY, "page_registry.sqlite3")
+)
+
 # Crawler Configuration
 MAX_WEBSITES_TO_CRAWL = int(os.getenv("MAX_WEBSITES_TO_CRAWL", 10))
 MAX_DEPTH = int(os.getenv("MAX_DEPTH", 2))
 USER_AGENT = "SemanticSearchBot/1.0"
+CRAWLER_CONCURRENCY = int(os.getenv("CRAWLER_CONCURRENCY", 8))
+CRAWLER_PER_HOST_CONCURRENCY = int(os.getenv("CRAWLER_PER_HOST_CONCURRENCY", 4))
+CRAWLER_TIMEOUT = float(os.getenv("CRAWLER_TIMEOUT", 10.0))
+CRAWLER_MAX_CONNECTIONS = int(os.getenv("CRAWLER_MAX_CONNECTIONS", 20))
+CRAWLER_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CRAWLER_MAX_KEEPALIVE_CONNECTIONS", 10))
+CRAWLER_KEEPALIVE_EXPIRY = float(os.getenv("CRAWLER_KEEPALIVE_EXPIRY", 30.0))
+CRAWLER_HTTP2 = os.getenv("CRAWLER_HTTP2", "true").lower() == "true"
+
+# HTML extraction: "auto" picks the fastest installed of selectolax, lxml and bs4
+# (pip install -r requirements-extractors.txt for the two optional ones)
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "auto")
+HTML_PARSE_EXECUTOR = os.getenv("HTML_PARSE_EXECUTOR", "thread")  # "thread" or "process"
+HTML_PARSE_WORKERS = int(os.getenv("HTML_PARSE_WORKERS", 4))
+
+# Ingestion: pages are preprocessed and chunked in a pool of INGEST_WORKERS processes
+# (0 runs them in a thread instead), INGEST_BATCH_PAGES pages at a time. At most
+# INGEST_MAX_PENDING_BATCHES prepared batches wait for the embedder before the
+# pipeline stops taking new pages.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_BATCH_PAGES = int(os.getenv("INGEST_BATCH_PAGES", 16))
+INGEST_MAX_PENDING_BATCHES = int(os.getenv("INGEST_MAX_PENDING_BATCHES", 2))
+
+# Near-duplicate detection at ingest: pages and chunks whose SimHash of word
+# shingles is within DEDUP_MAX_DISTANCE of 64 bits of one from another URL are skipped
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", 3))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", 3))
+
+# Background crawl job configuration
+CRAWL_JOBS_DIRECTORY = os.getenv("CRAWL_JOBS_DIRECTORY", "./crawl_jobs")
+CRAWL_JOB_WORKERS = int(os.getenv("CRAWL_JOB_WORKERS", 2))
+CRAWL_JOB_CHECKPOINT_PAGES = int(os.getenv("CRAWL_JOB_CHECKPOINT_PAGES", 20))
 
 # Search Configuration
 TOP_K_RESULTS = 10
-SIMILARITY_THRESHOLD = 0.6
\ No newline at end of file
+SIMILARITY_THRESHOLD = 0.6
+# Reciprocal rank fusion constant for hybrid search, and how many candidates
+# each retriever contributes per requested result
+RRF_K = int(os.getenv("RRF_K", 60))
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", 3))
+# Upper bound on the chunks fetched per query when over-fetching to collapse results to distinct pages
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 500))
+# Keyword hits fetched per requested result when search filters apply, since the
+# keyword index has no metadata and filtered-out hits are dropped afterwards
+LEXICAL_FILTER_CANDIDATE_MULTIPLIER = int(os.getenv("LEXICAL_FILTER_CANDIDATE_MULTIPLIER", 10))
+# Largest number of queries accepted by /api/search/batch
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", 256))
+
+# Per-stage latency budgets for /api/search, in seconds. A stage that runs over
+# is skipped with a fallback and reported in SearchResponse.degraded_stages.
+# Semantic understanding runs concurrently and is measured from the start of the search.
+# search_batch applies the same budgets to its batched encode and dense retrieval.
+# A stage running in a worker thread cannot be interrupted; on timeout its
+# in-flight call finishes in the background and its result is discarded.
+SEARCH_ENHANCE_TIMEOUT = float(os.getenv("SEARCH_ENHANCE_TIMEOUT", 1.5))
+SEARCH_EMBEDDING_TIMEOUT = float(os.getenv("SEARCH_EMBEDDING_TIMEOUT", 1.0))
+SEARCH_RETRIEVAL_TIMEOUT = float(os.getenv("SEARCH_RETRIEVAL_TIMEOUT", 1.0))
+SEARCH_UNDERSTANDING_TIMEOUT = float(os.getenv("SEARCH_UNDERSTANDING_TIMEOUT", 3.0))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 10.0))
@@ -1,27 +1,66 @@
 # app/main.py
 from fastapi import FastAPI, HTTPException, Request, Depends, Query
-from fastapi.responses import HTMLResponse
+from pydantic import ValidationError
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uvicorn
 import asyncio
+import json
 import time
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
 import os
+from contextlib import asynccontextmanager
 
-from app.models.schema import SearchQuery, SearchResponse, WebPage
+from app.config import BACKGROUND_STARTUP
+from app.models.schema import (
+    SearchQuery, SearchResponse, SearchFilters, WebPage, CrawlJobRequest, BatchSearchQuery
+)
+from app.services.container import ServiceContainer
 from app.services.search import SearchService
 from app.services.crawler import WebCrawler
+from app.services.jobs import CrawlJobManager
+from app.services.pipeline import IngestionPipeline
 from app.services.vectordb import VectorDatabase
-from app.utils.helpers import format_time, highlight_terms, truncate_text
+from app.utils.helpers import format_time, truncate_text
 
 from fastapi.middleware.cors import CORSMiddleware
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build the shared service graph on startup and tear it down on shutdown.
+
+    With BACKGROUND_STARTUP the graph is built and warmed up after the server
+    starts accepting connections; /readyz reports when it is done.
+    """
+    services = ServiceContainer()
+    app.state.services = services
+
+    startup_task = None
+    if BACKGROUND_STARTUP:
+        startup_task = asyncio.create_task(services.startup())
+    else:
+        await services.startup()
+
+    yield
+
+    if startup_task is not None:
+        # Stops a startup still in progress; a failed one was already logged by the container
+        startup_task.cancel()
+        await asyncio.gather(startup_task, return_exceptions=True)
+    await services.shutdown()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI-Augmented Semantic Search Engine",
     description="A search engine that uses semantic text analysis to provide more relevant results",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -38,14 +77,54 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Initialize templates
 templates = Jinja2Templates(directory="templates")
 
-# Initialize services
-search_service = SearchService()
-crawler = WebCrawler()
-vector_db = VectorDatabase()
+
+# Service dependencies, resolved from the container built in lifespan
+def get_services(request: Request) -> ServiceContainer:
+    services = request.app.state.services
+    if not services.ready:
+        raise HTTPException(status_code=503, detail="Service is starting up")
+    return services
+
+
+def get_search_service(services: ServiceContainer = Depends(get_services)) -> SearchService:
+    return services.search_service
+
+
+def get_crawler(services: ServiceContainer = Depends(get_services)) -> WebCrawler:
+    return services.crawler
+
+
+def get_vector_db(services: ServiceContainer = Depends(get_services)) -> VectorDatabase:
+    return services.vector_db
+
+
+def get_job_manager(services: ServiceContainer = Depends(get_services)) -> CrawlJobManager:
+    return services.job_manager
+
+
+def get_pipeline(services: ServiceContainer = Depends(get_services)) -> IngestionPipeline:
+    return services.pipeline
+
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests
+    """
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readyz(request: Request):
+    """
+    Readiness probe: services are built and warmed up
+    """
+    status = request.app.state.services.status()
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 503)
 
 
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
+async def home(request: Request, vector_db: VectorDatabase = Depends(get_vector_db)):
     """
     Render the home page with search form
     """
@@ -60,10 +139,16 @@ async def home(request: Request):
 async def search_page(
         request: Request,
         q: str = Query(..., min_length=1),
-        top_k: Optional[int] = Query(10, ge=1, le=50)
+        top_k: Optional[int] = Query(10, ge=1, le=50),
+        mode: Literal["dense", "lexical", "hybrid"] = Query("dense"),
+        stream: bool = Query(True),
+        search_service: SearchService = Depends(get_search_service)
 ):
     """
-    Perform a search and render results page
+    Perform a search and render results page.
+
+    With stream on, the page is returned straight away and fills itself in
+    from /api/search/stream; stream=false renders the complete results server-side.
     """
     if not q:
         return templates.TemplateResponse(
@@ -71,20 +156,22 @@ async def search_page(
             {"request": request, "error": "Please enter a search query"}
         )
 
+    if stream:
+        return templates.TemplateResponse(
+            "results.html",
+            {"request": request, "query": q, "stream": True, "top_k": top_k, "mode": mode}
+        )
+
     start_time = time.time()
 
     # Create search query
-    query = SearchQuery(query=q, top_k=top_k)
+    # Snippets come back escaped, with the search terms highlighted
+    query = SearchQuery(query=q, top_k=top_k, mode=mode, highlight=True)
 
     # Perform search
     try:
         response = await search_service.search(query)
 
-        # Highlight search terms in snippets
-        terms = q.split()
-        for result in response.results:
-            result.snippet = highlight_terms(result.snippet, terms)
-
         execution_time = format_time(time.time() - start_time)
 
         return templates.TemplateResponse(
@@ -104,7 +191,7 @@ async def search_page(
 
 
 @app.post("/api/search")
-async def api_search(query: SearchQuery):
+async def api_search(query: SearchQuery, search_service: SearchService = Depends(get_search_service)):
     """
     API endpoint for search
     """
@@ -115,44 +202,179 @@ async def api_search(query: SearchQuery):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _stream_events(events: AsyncIterator[Dict[str, Any]], event_format: str) -> AsyncIterator[str]:
+    """
+    Encode search events as server-sent events or newline-delimited JSON
+    """
+    async def encode():
+        async for event in events:
+            data = jsonable_encoder(event["data"])
+            if event_format == "sse":
+                yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+            else:
+                yield json.dumps({"event": event["event"], "data": data}) + "\n"
+
+    return encode()
+
+
+@app.get("/api/search/stream")
+async def api_search_stream_get(q: str = Query(..., min_length=1), top_k: int = Query(10, ge=1, le=50),
+                                mode: Literal["dense", "lexical", "hybrid"] = Query("dense"),
+                                highlight: bool = Query(False),
+                                collapse: bool = Query(True),
+                                diversity: float = Query(0.0, ge=0.0, le=1.0),
+                                domain: Optional[List[str]] = Query(None),
+                                crawled_after: Optional[datetime] = Query(None),
+                                crawled_before: Optional[datetime] = Query(None),
+                                url_prefix: Optional[str] = Query(None),
+                                search_service: SearchService = Depends(get_search_service)):
+    """
+    Streaming search as server-sent events, for EventSource clients.
+
+    Takes the same options as the POST endpoints, with the filters as query
+    parameters (domain may be repeated). Sends a "results" event once
+    retrieval finishes, then "understanding" tokens and a final "done".
+    """
+    filters = None
+    if domain or crawled_after or crawled_before or url_prefix:
+        try:
+            filters = SearchFilters(domains=domain, crawled_after=crawled_after, crawled_before=crawled_before,
+                                    url_prefix=url_prefix)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    events = search_service.search_stream(SearchQuery(
+        query=q, top_k=top_k, mode=mode, highlight=highlight, collapse=collapse, diversity=diversity,
+        filters=filters
+    ))
+    return StreamingResponse(
+        _stream_events(events, "sse"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/search/stream")
+async def api_search_stream(query: SearchQuery, search_service: SearchService = Depends(get_search_service)):
+    """
+    Streaming search as newline-delimited JSON, one {"event", "data"} object per line
+    """
+    return StreamingResponse(
+        _stream_events(search_service.search_stream(query), "ndjson"),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/search/batch")
+async def api_search_batch(batch: BatchSearchQuery, search_service: SearchService = Depends(get_search_service)):
+    """
+    API endpoint to run many searches with one batched encode and vector query
+    """
+    try:
+        return await search_service.search_batch(batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/crawl")
-async def api_crawl(url: str, max_pages: int = 10, max_depth: int = 2):
+async def api_crawl(url: str, max_pages: int = 10, max_depth: int = 2,
+                    crawler: WebCrawler = Depends(get_crawler),
+                    pipeline: IngestionPipeline = Depends(get_pipeline)):
     """
     API endpoint to crawl a website and index its content
     """
     try:
-        # Crawl the website
+        # Crawl the website with a crawler of its own, so concurrent requests don't share crawl state
+        crawler = crawler.fork()
         pages = await crawler.crawl(url, max_pages=max_pages, max_depth=max_depth)
 
-        if not pages:
+        if not pages and not crawler.unchanged_urls:
             raise HTTPException(status_code=400, detail="No pages were crawled")
 
-        # Add pages to vector database
-        vector_db.add_webpages(pages)
+        # Add new and changed pages to vector database, off the event loop
+        report = await pipeline.add_webpages(pages)
 
         return {
             "status": "success",
-            "message": f"Crawled and indexed {len(pages)} pages",
-            "pages": [{"url": str(page.url), "title": page.title} for page in pages]
+            "message": f"Crawled and indexed {report['pages']} pages ({len(crawler.unchanged_urls)} unchanged, "
+                       f"{report['duplicate_pages']} near-duplicates skipped)",
+            "pages": [{"url": str(page.url), "title": page.title} for page in pages],
+            "unchanged": crawler.unchanged_urls,
+            "dedup": report
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/jobs", status_code=202)
+async def api_create_crawl_job(request: CrawlJobRequest,
+                               job_manager: CrawlJobManager = Depends(get_job_manager)):
+    """
+    API endpoint to enqueue a crawl that runs in the background
+    """
+    try:
+        job = job_manager.submit(request.url, request.max_pages, request.max_depth)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return job_manager.describe(job)
+
+
+@app.get("/api/jobs")
+async def api_list_crawl_jobs(job_manager: CrawlJobManager = Depends(get_job_manager)):
+    """
+    API endpoint to list crawl jobs, newest first
+    """
+    return [job_manager.describe(job) for job in job_manager.list_jobs()]
+
+
+@app.get("/api/jobs/{job_id}")
+async def api_get_crawl_job(job_id: str, job_manager: CrawlJobManager = Depends(get_job_manager)):
+    """
+    API endpoint to get the status and progress of a crawl job
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job_manager.describe(job)
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def api_cancel_crawl_job(job_id: str, job_manager: CrawlJobManager = Depends(get_job_manager)):
+    """
+    API endpoint to cancel a queued or running crawl job
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job_manager.describe(job)
+
+
 @app.get("/api/stats")
-async def api_stats():
+async def api_stats(services: ServiceContainer = Depends(get_services)):
     """
     API endpoint to get statistics about the search engine
     """
     try:
-        stats = vector_db.get_stats()
+        stats = services.vector_db.get_stats()
+        stats["llm_cache"] = services.llm_service.cache.stats()
+        stats["query_embedding_cache"] = services.processor.query_cache.stats()
+        if services.embedding_store is not None:
+            stats["embedding_store"] = services.embedding_store.stats()
+        stats["ingestion"] = services.pipeline.stats()
+        stats["startup_timings"] = services.startup_timings
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.delete("/api/clear")
-async def api_clear():
+async def api_clear(vector_db: VectorDatabase = Depends(get_vector_db)):
     """
     API endpoint to clear the vector database
     """
@@ -168,7 +390,8 @@ if __name__ == "__main__":
 
 # Add this endpoint to your existing FastAPI app in app/main.py
 @app.post("/api/search_extended")
-async def api_search_extended(query: str = Query(...), top_k: int = Query(10)):
+async def api_search_extended(query: str = Query(...), top_k: int = Query(10),
+                              search_service: SearchService = Depends(get_search_service)):
     """
     API endpoint for extended search with external sources
     """
@@ -1,7 +1,6 @@
 # app/models/embedding.py
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from app.config import EMBEDDING_MODEL
+from app.config import EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE
 
 
 class EmbeddingModel:
@@ -9,7 +8,11 @@ class EmbeddingModel:
 
     def __new__(cls):
         if cls._instance is None:
+            # Imported here because sentence-transformers pulls in torch, which dominates import time
+            from sentence_transformers import SentenceTransformer
+
             cls._instance = super(EmbeddingModel, cls).__new__(cls)
+            cls._instance.model_name = EMBEDDING_MODEL
             cls._instance.model = SentenceTransformer(EMBEDDING_MODEL)
         return cls._instance
 
@@ -22,21 +25,44 @@ class EmbeddingModel:
 
         return self.model.encode(text)
 
-    def batch_encode(self, texts: list[str]) -> np.ndarray:
+    def batch_encode(self, texts: list[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
         """
-        Generate embeddings for a batch of texts
+        Generate embeddings for a batch of texts.
+
+        Rows line up with the input texts; empty texts get zero vectors.
         """
-        if not texts:
-            return np.array([])
+        dim = self.model.get_sentence_embedding_dimension()
+        embeddings = np.zeros((len(texts), dim), dtype=np.float32)
+
+        # Skip empty texts but remember where each encoded row belongs
+        valid_indices = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        if not valid_indices:
+            return embeddings
+
+        # Longest first, so each batch pads to similar sequence lengths
+        valid_indices.sort(key=lambda i: len(texts[i]), reverse=True)
 
-        # Filter out empty texts
-        valid_texts = [text for text in texts if text and text.strip()]
+        encoded = self.model.encode(
+            [texts[i] for i in valid_indices],
+            batch_size=batch_size,
+            convert_to_numpy=True
+        )
+        embeddings[valid_indices] = encoded
 
-        if not valid_texts:
-            dim = self.model.get_sentence_embedding_dimension()
-            return np.zeros((len(texts), dim))
+        return embeddings
 
-        return self.model.encode(valid_texts)
+    def get_tokenizer(self):
+        """
+        Return the model's tokenizer, or None if it does not expose one
+        """
+        return getattr(self.model, "tokenizer", None)
+
+    def get_max_tokens(self) -> int:
+        """
+        Return the number of tokens the model reads per text, excluding the [CLS] and [SEP] tokens it adds
+        """
+        return self.model.max_seq_length - 2
 
     def get_dimension(self) -> int:
         """
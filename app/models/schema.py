@@ -1,6 +1,8 @@
 # app/models/schema.py
-from pydantic import BaseModel, HttpUrl, Field
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from pydantic import BaseModel, HttpUrl, Field, field_validator
+from typing import List, Optional, Dict, Any, Literal
 
 
 class WebPage(BaseModel):
@@ -10,9 +12,63 @@ class WebPage(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+class CrawlJobRequest(BaseModel):
+    url: str
+    max_pages: int = Field(10, ge=1)
+    max_depth: int = Field(2, ge=0)
+
+
+class SearchFilters(BaseModel):
+    # Only pages from these domains (host names, as in the "domain" metadata)
+    domains: Optional[List[str]] = None
+    # Only pages crawled in this time range
+    crawled_after: Optional[datetime] = None
+    crawled_before: Optional[datetime] = None
+    # Only pages whose URL starts with this prefix, e.g. "https://example.com/docs/"
+    url_prefix: Optional[str] = None
+
+    @field_validator("crawled_after", "crawled_before")
+    @classmethod
+    def assume_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """
+        Times without a timezone are UTC, not the server's local time
+        """
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+    @field_validator("url_prefix")
+    @classmethod
+    def require_scheme_and_host(cls, value: Optional[str]) -> Optional[str]:
+        """
+        A prefix is matched against whole URLs, so it needs at least a scheme and host
+        """
+        if value:
+            parsed = urlparse(value)
+            if parsed.scheme not in ("http", "https") or not parsed.netloc:
+                raise ValueError("url_prefix must start with http:// or https:// and a host")
+        return value
+
+
 class SearchQuery(BaseModel):
     query: str
     top_k: Optional[int] = 10
+    # "dense" embedding search, "lexical" BM25 keyword search, or "hybrid" fusion of both
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"
+    # Return snippets as HTML with the query terms wrapped in <mark>
+    highlight: bool = False
+    # One result per page (its best chunk) instead of one per chunk
+    collapse: bool = True
+    # Trade relevance for variety between results with maximal marginal relevance; 0 disables it
+    diversity: float = Field(0.0, ge=0.0, le=1.0)
+    filters: Optional[SearchFilters] = None
+
+
+class BatchSearchQuery(BaseModel):
+    queries: List[SearchQuery] = Field(..., min_length=1)
+    # LLM stages are opt-in, so offline workloads only pay for retrieval
+    enhance: bool = False
+    semantic_understanding: bool = False
 
 
 class SearchResult(BaseModel):
@@ -20,6 +76,8 @@ class SearchResult(BaseModel):
     title: str
     snippet: str
     relevance_score: float
+    # Retrieved chunks of this page that the result stands for (1 unless results are collapsed)
+    chunk_count: int = 1
 
 
 class SearchResponse(BaseModel):
@@ -27,4 +85,13 @@ class SearchResponse(BaseModel):
     query: str
     semantic_understanding: str
     total_results: int
-    execution_time: float
\ No newline at end of file
+    execution_time: float
+    # Pipeline stages that were skipped: they ran over their latency budget, or
+    # ("lexical_index") the keyword index is still being built after a restart
+    degraded_stages: List[str] = Field(default_factory=list)
+
+
+class BatchSearchResponse(BaseModel):
+    responses: List[SearchResponse]
+    total_queries: int
+    execution_time: float
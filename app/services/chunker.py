@@ -0,0 +1,139 @@
+# app/services/chunker.py
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a line break
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*")
+# Stand-in tokens when the model has no fast tokenizer: words and punctuation
+APPROXIMATE_TOKEN = re.compile(r"\w+|[^\w\s]")
+# Approximate tokens undercount subword splits, so only fill this share of the window
+APPROXIMATE_TOKEN_RATIO = 0.75
+
+
+@dataclass
+class Chunk:
+    # content[char_start:char_end] of the page the chunk came from
+    text: str
+    char_start: int
+    char_end: int
+
+
+class TokenChunker:
+    """
+    Splits content into chunks that fit the embedding model's token window,
+    breaking between sentences where possible.
+
+    The page is tokenized once, with character offsets, and every later step
+    walks those offsets forward, so chunking is linear in the page length.
+    Token counts are taken on the original text. Preprocessing only removes
+    characters, so a chunk's preprocessed text fits the window as well.
+    """
+
+    def __init__(self, tokenizer: Optional[Any], max_tokens: int, overlap_tokens: int = 0):
+        # Fast (Rust) tokenizers report offsets; anything else falls back to approximate tokens
+        self.tokenizer = tokenizer if getattr(tokenizer, "is_fast", False) else None
+        self.max_tokens = max_tokens if self.tokenizer is not None else int(max_tokens * APPROXIMATE_TOKEN_RATIO)
+        self.overlap_tokens = min(overlap_tokens, self.max_tokens // 2)
+
+    def token_offsets(self, content: str) -> List[Tuple[int, int]]:
+        """
+        (start, end) character offsets of every token in content
+        """
+        if self.tokenizer is None:
+            return [match.span() for match in APPROXIMATE_TOKEN.finditer(content)]
+
+        encoding = self.tokenizer(
+            content,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            truncation=False,
+            verbose=False
+        )
+        # Some tokenizers emit empty spans for normalization artifacts
+        return [(start, end) for start, end in encoding["offset_mapping"] if end > start]
+
+    def chunk(self, content: str) -> List[Chunk]:
+        """
+        Split content into chunks, keeping their offsets
+        """
+        return [Chunk(content[start:end], start, end) for start, end in self.spans(content)]
+
+    def spans(self, content: str) -> List[Tuple[int, int]]:
+        """
+        (start, end) character offsets of each chunk of content
+        """
+        if not content or not content.strip():
+            return []
+
+        offsets = self.token_offsets(content)
+        if not offsets:
+            return []
+
+        units = self._split_long(self._sentences(content, offsets), offsets)
+        spans = []
+
+        i = 0
+        while i < len(units):
+            # Greedily take whole units while they fit
+            j = i
+            tokens = 0
+            while j < len(units) and tokens + units[j][1] - units[j][0] <= self.max_tokens:
+                tokens += units[j][1] - units[j][0]
+                j += 1
+
+            spans.append((offsets[units[i][0]][0], offsets[units[j - 1][1] - 1][1]))
+            if j >= len(units):
+                break
+
+            # Start the next chunk a few whole units back, for overlap, but always move forward
+            k = j
+            overlap = 0
+            while k - 1 > i and overlap + units[k - 1][1] - units[k - 1][0] <= self.overlap_tokens:
+                k -= 1
+                overlap += units[k][1] - units[k][0]
+            i = k
+
+        return spans
+
+    def _sentences(self, content: str, offsets: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        [first token, last token + 1) of each sentence
+        """
+        boundaries = [match.end() for match in SENTENCE_BOUNDARY.finditer(content)]
+        sentences = []
+        first = 0
+        b = 0
+
+        for i, (start, _) in enumerate(offsets):
+            # Tokens and boundaries are both in order, so one forward pass pairs them up
+            while b < len(boundaries) and start >= boundaries[b]:
+                if i > first:
+                    sentences.append((first, i))
+                    first = i
+                b += 1
+
+        sentences.append((first, len(offsets)))
+        return sentences
+
+    def _split_long(self, units: List[Tuple[int, int]], offsets: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Cut units longer than the window, preferring cuts where a new word starts
+        """
+        split = []
+        for first, last in units:
+            while last - first > self.max_tokens:
+                cut = first + self.max_tokens
+                # Step back over subword pieces (no gap before them), at most half a window
+                candidate = cut
+                while candidate > first + self.max_tokens // 2 and offsets[candidate][0] == offsets[candidate - 1][1]:
+                    candidate -= 1
+                if offsets[candidate][0] != offsets[candidate - 1][1]:
+                    cut = candidate
+
+                split.append((first, cut))
+                first = cut
+            split.append((first, last))
+
+        return split
+
@@ -0,0 +1,202 @@
+# app/services/container.py
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from app.config import WARMUP_ON_STARTUP, EMBEDDING_STORE_DIRECTORY, VECTOR_QUANTIZATION
+from app.models.embedding import EmbeddingModel
+from app.services.crawler import WebCrawler
+from app.services.embedding_store import EmbeddingStore
+from app.services.jobs import CrawlJobManager
+from app.services.llm import LLMService
+from app.services.pipeline import IngestionPipeline
+from app.services.processor import TextProcessor
+from app.services.quantized import QuantizedVectorStore
+from app.services.registry import PageRegistry
+from app.services.search import SearchService
+from app.services.vectordb import VectorDatabase
+
+
+class ServiceContainer:
+    """
+    Builds and owns the one instance of each service for the application: a
+    single embedding model, Chroma client and collection handle shared by
+    search, crawling and indexing
+    """
+
+    def __init__(self):
+        self.embedding_model: Optional[EmbeddingModel] = None
+        self.embedding_store: Optional[EmbeddingStore] = None
+        self.processor: Optional[TextProcessor] = None
+        self.quantized_store: Optional[QuantizedVectorStore] = None
+        self.registry: Optional[PageRegistry] = None
+        self.vector_db: Optional[VectorDatabase] = None
+        self.pipeline: Optional[IngestionPipeline] = None
+        self.llm_service: Optional[LLMService] = None
+        self.search_service: Optional[SearchService] = None
+        self.crawler: Optional[WebCrawler] = None
+        self.job_manager: Optional[CrawlJobManager] = None
+
+        # Seconds spent in each startup phase, in the order they ran
+        self.startup_timings: Dict[str, float] = {}
+        self.ready = False
+        # Background rebuild of the in-memory chunk indexes, started once ready
+        self._index_task: Optional[asyncio.Task] = None
+        self.startup_error: Optional[str] = None
+        self.logger = logging.getLogger(__name__)
+
+    @contextmanager
+    def _phase(self, name: str):
+        """
+        Time a startup phase
+        """
+        start = time.perf_counter()
+        yield
+        self.startup_timings[name] = time.perf_counter() - start
+        self.logger.info(f"Startup phase {name} took {self.startup_timings[name]:.3f}s")
+
+    async def startup(self, warm_up: bool = WARMUP_ON_STARTUP) -> None:
+        """
+        Build the service graph, start background workers and optionally warm up.
+
+        Heavy construction runs in a worker thread so the event loop keeps
+        answering liveness checks; ready is only set once everything is done.
+        The keyword and near-duplicate indexes are then rebuilt from the stored
+        chunks in the background, as that reads the whole collection.
+        """
+        try:
+            await asyncio.to_thread(self._build)
+
+            with self._phase("crawl_jobs"):
+                await self.job_manager.start()
+
+            if warm_up:
+                await asyncio.to_thread(self._warm_up)
+
+            self.startup_timings["total"] = sum(self.startup_timings.values())
+            self.ready = True
+            self._index_task = asyncio.create_task(asyncio.to_thread(self._build_indexes))
+        except Exception as e:
+            self.startup_error = str(e)
+            self.logger.exception("Service startup failed")
+            raise
+
+    def _build(self) -> None:
+        """
+        Construct each service once, timing every phase
+        """
+        with self._phase("embedding_model"):
+            self.embedding_model = EmbeddingModel()
+
+        if EMBEDDING_STORE_DIRECTORY:
+            with self._phase("embedding_store"):
+                self.embedding_store = EmbeddingStore(
+                    model_name=self.embedding_model.model_name,
+                    dim=self.embedding_model.get_dimension()
+                )
+
+        with self._phase("text_processor"):
+            self.processor = TextProcessor(
+                embedding_model=self.embedding_model,
+                embedding_store=self.embedding_store
+            )
+
+        with self._phase("page_registry"):
+            self.registry = PageRegistry()
+
+        if VECTOR_QUANTIZATION != "none":
+            with self._phase("quantized_store"):
+                self.quantized_store = QuantizedVectorStore(dim=self.embedding_model.get_dimension())
+
+        with self._phase("vector_db"):
+            self.vector_db = VectorDatabase(
+                processor=self.processor,
+                registry=self.registry,
+                quantized_store=self.quantized_store
+            )
+
+        with self._phase("ingestion_pipeline"):
+            # The worker pool itself is only started by the first crawl
+            self.pipeline = IngestionPipeline(self.vector_db)
+
+        with self._phase("llm_service"):
+            self.llm_service = LLMService()
+
+        with self._phase("search_service"):
+            self.search_service = SearchService(
+                vector_db=self.vector_db,
+                processor=self.processor,
+                llm_service=self.llm_service
+            )
+
+        with self._phase("crawler"):
+            self.crawler = WebCrawler(registry=self.registry)
+            self.job_manager = CrawlJobManager(self.crawler, self.pipeline)
+
+    def _build_indexes(self) -> None:
+        """
+        Rebuild the chunk indexes; searches skip keyword retrieval until this is done
+        """
+        try:
+            with self._phase("chunk_indexes"):
+                self.vector_db.rebuild_indexes()
+        except Exception:
+            self.logger.exception("Rebuilding the chunk indexes failed")
+
+    def _warm_up(self) -> None:
+        """
+        Run one dummy encode and one query so the first real request does not pay for lazy initialization
+        """
+        with self._phase("warmup_encode"):
+            embedding = self.processor.process_query("warm up")
+
+        with self._phase("warmup_query"):
+            self.vector_db.search(embedding, top_k=1)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Readiness details for health checks
+        """
+        if self.ready:
+            state = "ready"
+        elif self.startup_error is not None:
+            state = "failed"
+        else:
+            state = "starting"
+
+        return {
+            "status": state,
+            "error": self.startup_error,
+            "indexes_ready": self.vector_db is not None and self.vector_db.indexes_ready.is_set(),
+            "startup_timings": self.startup_timings
+        }
+
+    async def shutdown(self) -> None:
+        """
+        Stop background workers and release connections
+        """
+        if self.job_manager is not None:
+            await self.job_manager.stop()
+
+        # Close the crawler's pooled HTTP connections
+        if self.crawler is not None:
+            await self.crawler.aclose()
+
+        if self.pipeline is not None:
+            self.pipeline.close()
+
+        if self.vector_db is not None:
+            # Waits for a running index rebuild to stop at its next batch
+            await asyncio.to_thread(self.vector_db.close)
+        if self._index_task is not None:
+            await asyncio.gather(self._index_task, return_exceptions=True)
+
+        if self.registry is not None:
+            self.registry.close()
+
+        if self.embedding_store is not None:
+            self.embedding_store.close()
+
+        if self.quantized_store is not None:
+            self.quantized_store.close()
@@ -1,121 +1,344 @@
 # app/services/crawler.py
+import asyncio
+import hashlib
+import importlib.util
 import httpx
-from bs4 import BeautifulSoup
 import validators
-from urllib.parse import urljoin, urlparse
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
 import time
-from typing import List, Set, Dict, Any, Optional
+from typing import List, Set, Dict, Any, Optional, Callable, Awaitable
 import logging
-from app.config import USER_AGENT, MAX_WEBSITES_TO_CRAWL, MAX_DEPTH
+from app.config import (
+    USER_AGENT, MAX_WEBSITES_TO_CRAWL, MAX_DEPTH, CRAWLER_CONCURRENCY, CRAWLER_PER_HOST_CONCURRENCY,
+    CRAWLER_TIMEOUT, CRAWLER_MAX_CONNECTIONS, CRAWLER_MAX_KEEPALIVE_CONNECTIONS, CRAWLER_KEEPALIVE_EXPIRY,
+    CRAWLER_HTTP2, HTML_EXTRACTOR, HTML_PARSE_EXECUTOR, HTML_PARSE_WORKERS
+)
 from app.models.schema import WebPage
+from app.services.extractor import extract_html, resolve_backend
+from app.services.registry import PageRegistry
 
 
 class WebCrawler:
-    def __init__(self):
+    def __init__(self, concurrency: int = CRAWLER_CONCURRENCY,
+                 per_host_concurrency: int = CRAWLER_PER_HOST_CONCURRENCY,
+                 client: Optional[httpx.AsyncClient] = None,
+                 registry: Optional[PageRegistry] = None,
+                 extractor: str = HTML_EXTRACTOR,
+                 parse_executor: Optional[Executor] = None):
         self.visited_urls: Set[str] = set()
         self.pages: List[WebPage] = []
+        self.unchanged_urls: List[str] = []
+        self.registry = registry or PageRegistry()
+        self._pending: Dict[str, int] = {}
+        self._page_count = 0
         self.headers = {
             "User-Agent": USER_AGENT
         }
+        self.concurrency = max(1, concurrency)
+        self.per_host_concurrency = max(1, per_host_concurrency)
         self.logger = logging.getLogger(__name__)
 
-    async def crawl(self, start_url: str, max_pages: int = MAX_WEBSITES_TO_CRAWL, max_depth: int = MAX_DEPTH) -> List[
-        WebPage]:
+        # A client or executor passed in is shared with its owner, who is responsible for closing it
+        self._client = client
+        self._owns_client = client is None
+        self.extractor = resolve_backend(extractor)
+        self._parse_executor = parse_executor
+        self._owns_parse_executor = parse_executor is None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        Get the long-lived pooled HTTP client, creating it on first use
+        """
+        if self._client is None or self._client.is_closed:
+            self._owns_client = True
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=CRAWLER_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=CRAWLER_MAX_CONNECTIONS,
+                    max_keepalive_connections=CRAWLER_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=CRAWLER_KEEPALIVE_EXPIRY
+                ),
+                http2=self._http2_available()
+            )
+        return self._client
+
+    def _http2_available(self) -> bool:
+        """
+        HTTP/2 needs the optional h2 package (installed with httpx[http2])
+        """
+        if not CRAWLER_HTTP2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            self.logger.warning("CRAWLER_HTTP2 is enabled but the h2 package is not installed; using HTTP/1.1")
+            return False
+        return True
+
+    def get_parse_executor(self) -> Executor:
         """
-        Crawl websites starting from the given URL up to a maximum number of pages
+        Get the pool that HTML extraction runs in, so parsing never blocks the event loop
+        """
+        if self._parse_executor is None:
+            self._owns_parse_executor = True
+            if HTML_PARSE_EXECUTOR == "process":
+                self._parse_executor = ProcessPoolExecutor(max_workers=HTML_PARSE_WORKERS)
+            else:
+                self._parse_executor = ThreadPoolExecutor(
+                    max_workers=HTML_PARSE_WORKERS, thread_name_prefix="html-parse"
+                )
+        return self._parse_executor
+
+    def fork(self) -> "WebCrawler":
+        """
+        A new crawler sharing this one's HTTP client, registry and parse pool.
+
+        The state of a crawl lives on the crawler, so a long-lived crawler
+        must not run two crawls at once; each crawl gets a fork instead.
+        """
+        return WebCrawler(
+            concurrency=self.concurrency,
+            per_host_concurrency=self.per_host_concurrency,
+            client=self.get_client(),
+            registry=self.registry,
+            extractor=self.extractor,
+            parse_executor=self.get_parse_executor()
+        )
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled HTTP client and the parse pool
+        """
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+        self._client = None
+
+        if self._parse_executor is not None and self._owns_parse_executor:
+            self._parse_executor.shutdown(wait=False, cancel_futures=True)
+        self._parse_executor = None
+
+    async def crawl(self, start_url: str, max_pages: int = MAX_WEBSITES_TO_CRAWL, max_depth: int = MAX_DEPTH,
+                    resume_state: Optional[Dict[str, Any]] = None,
+                    checkpoint: Optional[Callable[[Dict[str, Any], List[WebPage]], Awaitable[None]]] = None,
+                    checkpoint_every: int = 20) -> List[WebPage]:
+        """
+        Crawl websites breadth-first starting from the given URL up to a maximum number of pages.
+
+        When a checkpoint callback is given it is awaited every checkpoint_every
+        pages, and once more at the end, with a snapshot of the crawl state and
+        the pages fetched since the previous checkpoint. Passing a snapshot back
+        as resume_state continues the crawl from that point.
         """
         if not validators.url(start_url):
             self.logger.error(f"Invalid URL: {start_url}")
             return []
 
-        self.visited_urls = set()
         self.pages = []
+        self.unchanged_urls = []
+        self._pending = {}
+        self._in_flight = 0
+        self._slot_condition = asyncio.Condition()
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._checkpoint = checkpoint
+        self._checkpoint_every = max(1, checkpoint_every)
+        self._checkpoint_lock = asyncio.Lock()
+        self._checkpointed_pages = 0
 
-        await self._crawl_recursive(start_url, depth=0, max_depth=max_depth, max_pages=max_pages)
+        # The frontier holds (url, depth) pairs; a URL is marked visited when it is enqueued
+        frontier: asyncio.Queue = asyncio.Queue()
+        if resume_state:
+            self.visited_urls = set(resume_state["visited"])
+            self._page_count = resume_state["page_count"]
+            for url, depth in resume_state["frontier"]:
+                self._enqueue(frontier, url, depth)
+        else:
+            self.visited_urls = {start_url}
+            self._page_count = 0
+            self._enqueue(frontier, start_url, 0)
+        self._last_checkpoint_count = self._page_count
+
+        workers = [
+            asyncio.create_task(self._crawl_worker(frontier, max_depth, max_pages))
+            for _ in range(self.concurrency)
+        ]
+        try:
+            await frontier.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        if checkpoint is not None:
+            await self._write_checkpoint(force=True)
 
         return self.pages
 
-    async def _crawl_recursive(self, url: str, depth: int, max_depth: int, max_pages: int) -> None:
-        """
-        Recursively crawl websites up to the specified depth
+    def get_state(self) -> Dict[str, Any]:
         """
-        if depth > max_depth or len(self.pages) >= max_pages or url in self.visited_urls:
-            return
+        Snapshot of the crawl state that can be passed back as resume_state.
 
-        self.visited_urls.add(url)
+        Pages that are still being fetched stay in the frontier, so they are
+        fetched again after a resume.
+        """
+        return {
+            "frontier": [[url, depth] for url, depth in self._pending.items()],
+            "visited": list(self.visited_urls),
+            "page_count": self._page_count
+        }
 
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                # Extract title
-                title = soup.title.string if soup.title else url
-
-                # Extract main content
-                content = self._extract_main_content(soup)
-
-                # Create WebPage object
-                webpage = WebPage(
-                    url=url,
-                    title=title,
-                    content=content,
-                    metadata={
-                        "crawled_at": time.time(),
-                        "depth": depth,
-                        "domain": urlparse(url).netloc
-                    }
-                )
+    def progress(self) -> Dict[str, int]:
+        """
+        Live counters for the current crawl
+        """
+        return {
+            "pages_crawled": self._page_count,
+            "frontier_size": len(self._pending),
+            "visited_urls": len(self.visited_urls)
+        }
 
-                self.pages.append(webpage)
+    def _enqueue(self, frontier: asyncio.Queue, url: str, depth: int) -> None:
+        """
+        Add a URL to the frontier and to the pending set used for checkpoints
+        """
+        self._pending[url] = depth
+        frontier.put_nowait((url, depth))
 
-                # Extract links for further crawling
-                if depth < max_depth and len(self.pages) < max_pages:
-                    links = self._extract_links(soup, url)
-                    for link in links:
-                        if len(self.pages) >= max_pages:
-                            break
-                        await self._crawl_recursive(link, depth + 1, max_depth, max_pages)
+    async def _write_checkpoint(self, force: bool = False) -> None:
+        """
+        Hand the pages fetched since the last checkpoint and a state snapshot to the callback
+        """
+        async with self._checkpoint_lock:
+            if not force and self._page_count - self._last_checkpoint_count < self._checkpoint_every:
+                return
 
-        except Exception as e:
-            self.logger.error(f"Error crawling {url}: {str(e)}")
+            new_pages = self.pages[self._checkpointed_pages:]
+            self._checkpointed_pages = len(self.pages)
+            self._last_checkpoint_count = self._page_count
+            await self._checkpoint(self.get_state(), new_pages)
 
-    def _extract_main_content(self, soup: BeautifulSoup) -> str:
+    async def _crawl_worker(self, frontier: asyncio.Queue, max_depth: int, max_pages: int) -> None:
         """
-        Extract the main content from the webpage
+        Drain the frontier queue, crawling one page at a time
         """
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
+        while True:
+            url, depth = await frontier.get()
+            try:
+                if await self._reserve_page_slot(max_pages):
+                    try:
+                        await self._crawl_page(url, depth, frontier, max_depth, max_pages)
+                    finally:
+                        self._pending.pop(url, None)
+                        await self._release_page_slot()
+                else:
+                    self._pending.pop(url, None)
 
-        # Get text
-        text = soup.get_text(separator=' ', strip=True)
+                if self._checkpoint is not None:
+                    await self._write_checkpoint()
+            finally:
+                frontier.task_done()
 
-        # Clean up text
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
+    async def _reserve_page_slot(self, max_pages: int) -> bool:
+        """
+        Reserve one of the max_pages slots before fetching a page.
 
-        return text
+        Unchanged pages use up a slot too. Waits while in-flight fetches could
+        still fill the remaining slots and returns False once the page budget
+        is exhausted.
+        """
+        async with self._slot_condition:
+            while self._page_count + self._in_flight >= max_pages:
+                if self._page_count >= max_pages:
+                    return False
+                await self._slot_condition.wait()
+            self._in_flight += 1
+            return True
 
-    def _extract_links(self, soup: BeautifulSoup, base_url: str) -> List[str]:
+    async def _release_page_slot(self) -> None:
         """
-        Extract links from the webpage
+        Release a slot reserved by _reserve_page_slot
         """
-        links = []
-        base_domain = urlparse(base_url).netloc
+        async with self._slot_condition:
+            self._in_flight -= 1
+            self._slot_condition.notify_all()
 
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
-            full_url = urljoin(base_url, href)
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        """
+        Get the semaphore limiting concurrent requests to a single host
+        """
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_limits[host]
 
-            # Validate URL and check if it's from the same domain
-            if validators.url(full_url) and urlparse(full_url).netloc == base_domain:
-                # Remove fragments and queries
-                clean_url = full_url.split('#')[0].split('?')[0]
-                if clean_url not in self.visited_urls:
-                    links.append(clean_url)
+    async def _crawl_page(self, url: str, depth: int, frontier: asyncio.Queue, max_depth: int,
+                          max_pages: int) -> None:
+        """
+        Fetch a single page, record it and enqueue its links for the next depth.
+
+        Pages indexed before are fetched conditionally; a 304 response or an
+        identical content hash marks the page unchanged so it is not re-indexed.
+        """
+        try:
+            # Registry reads and writes are SQLite calls, so they run off the event loop
+            record = await asyncio.to_thread(self.registry.get, url)
+            headers = {}
+            if record is not None:
+                if record.etag:
+                    headers["If-None-Match"] = record.etag
+                if record.last_modified:
+                    headers["If-Modified-Since"] = record.last_modified
 
-        return links
\ No newline at end of file
+            async with self._host_limit(urlparse(url).netloc):
+                response = await self.get_client().get(url, headers=headers)
+                not_modified = response.status_code == 304 and record is not None
+                if not not_modified:
+                    response.raise_for_status()
+
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+
+            if not_modified:
+                links = record.links
+                self.unchanged_urls.append(url)
+                await asyncio.to_thread(self.registry.touch, url, etag, last_modified)
+            else:
+                # Extract title, main content and links off the event loop
+                extracted = await asyncio.get_running_loop().run_in_executor(
+                    self.get_parse_executor(), extract_html, self.extractor, response.text, url
+                )
+                title = extracted.title or url
+                content = extracted.content
+                links = extracted.links
+                content_hash = hashlib.sha256(f"{title}\n{content}".encode("utf-8")).hexdigest()
+
+                if record is not None and record.content_hash == content_hash:
+                    self.unchanged_urls.append(url)
+                    await asyncio.to_thread(self.registry.touch, url, etag, last_modified)
+                else:
+                    # Create WebPage object
+                    webpage = WebPage(
+                        url=url,
+                        title=title,
+                        content=content,
+                        metadata={
+                            "crawled_at": time.time(),
+                            "depth": depth,
+                            "domain": urlparse(url).netloc,
+                            "etag": etag,
+                            "last_modified": last_modified,
+                            "content_hash": content_hash,
+                            "links": links
+                        }
+                    )
+                    self.pages.append(webpage)
+
+            self._page_count += 1
+
+            # Enqueue links for further crawling
+            if depth < max_depth and self._page_count < max_pages:
+                for link in links:
+                    if link not in self.visited_urls:
+                        self.visited_urls.add(link)
+                        self._enqueue(frontier, link, depth + 1)
+
+        except Exception as e:
+            self.logger.error(f"Error crawling {url}: {str(e)}")
@@ -0,0 +1,251 @@
+# app/services/dedup.py
+import hashlib
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+import numpy as np
+from app.config import DEDUP_MAX_DISTANCE, DEDUP_SHINGLE_SIZE
+from app.services.lexical import tokenize
+
+SIMHASH_BITS = 64
+
+
+def simhash(text: str, shingle_size: int = DEDUP_SHINGLE_SIZE) -> int:
+    """
+    64-bit SimHash of the word shingles of text.
+
+    Near-identical texts get fingerprints that differ in only a few bits. Each
+    shingle is hashed with blake2b rather than hash(), so fingerprints match
+    across processes. Empty text has fingerprint 0.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return 0
+
+    if len(tokens) <= shingle_size:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, SIMHASH_BITS)
+    # A fingerprint bit is set when most shingles set it
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_int64(fingerprint: int) -> int:
+    """
+    Fingerprint as a signed 64-bit integer, the widest integer Chroma metadata stores
+    """
+    return fingerprint - (1 << SIMHASH_BITS) if fingerprint >= 1 << (SIMHASH_BITS - 1) else fingerprint
+
+
+def from_int64(value: int) -> int:
+    return value & ((1 << SIMHASH_BITS) - 1)
+
+
+def with_dedup_ratios(counts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Add the share of pages and chunks skipped as near-duplicates to ingestion counts
+    """
+    seen_pages = counts["pages"] + counts["duplicate_pages"]
+    seen_chunks = counts["chunks"] + counts["duplicate_chunks"]
+    return {
+        **counts,
+        "duplicate_page_ratio": counts["duplicate_pages"] / seen_pages if seen_pages else 0.0,
+        "duplicate_chunk_ratio": counts["duplicate_chunks"] / seen_chunks if seen_chunks else 0.0
+    }
+
+
+class PageFingerprints(NamedTuple):
+    # SimHash of the page content and of each of its chunks, in chunk order
+    page: int
+    chunks: List[int]
+
+
+def fingerprint_page(content: str, chunks: List[str]) -> PageFingerprints:
+    """
+    Fingerprints of a page and its preprocessed chunks
+    """
+    return PageFingerprints(simhash(content), [simhash(chunk) for chunk in chunks])
+
+
+class NearDuplicateIndex:
+    """
+    Finds fingerprints within max_distance bits of a query fingerprint.
+
+    Fingerprints are split into max_distance + 1 bands, and each band value
+    maps to the entries that share it. Two fingerprints at most max_distance
+    bits apart agree on at least one whole band, so a lookup only compares
+    against entries that share a band with the query.
+    """
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.max_distance = max(0, max_distance)
+        bands = self.max_distance + 1
+        bounds = [i * SIMHASH_BITS // bands for i in range(bands + 1)]
+        # (shift, mask) of each band
+        self._bands = [(SIMHASH_BITS - end, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables: List[Dict[int, Set[int]]] = [{} for _ in self._bands]
+            # Entry number -> (fingerprint, owner), and owner -> its entry numbers
+            self._entries: Dict[int, Tuple[int, str]] = {}
+            self._owners: Dict[str, List[int]] = {}
+            self._next_entry = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, owner: str) -> bool:
+        return owner in self._owners
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    def add(self, owner: str, fingerprint: int) -> None:
+        """
+        Add a fingerprint belonging to owner (a page URL)
+        """
+        with self._lock:
+            entry = self._next_entry
+            self._next_entry += 1
+            self._entries[entry] = (fingerprint, owner)
+            self._owners.setdefault(owner, []).append(entry)
+            for table, value in zip(self._tables, self._band_values(fingerprint)):
+                table.setdefault(value, set()).add(entry)
+
+    def remove(self, owner: str) -> None:
+        """
+        Remove every fingerprint belonging to owner
+        """
+        with self._lock:
+            for entry in self._owners.pop(owner, []):
+                fingerprint, _ = self._entries.pop(entry)
+                for table, value in zip(self._tables, self._band_values(fingerprint)):
+                    bucket = table[value]
+                    bucket.discard(entry)
+                    if not bucket:
+                        del table[value]
+
+    def find(self, fingerprint: int, exclude_owner: Optional[str] = None) -> Optional[str]:
+        """
+        Owner of a fingerprint within max_distance bits, ignoring exclude_owner's, or None
+        """
+        with self._lock:
+            seen = set()
+            for table, value in zip(self._tables, self._band_values(fingerprint)):
+                for entry in table.get(value, ()):
+                    if entry in seen:
+                        continue
+                    seen.add(entry)
+                    candidate, owner = self._entries[entry]
+                    if owner != exclude_owner and hamming_distance(candidate, fingerprint) <= self.max_distance:
+                        return owner
+        return None
+
+    def owners(self) -> int:
+        return len(self._owners)
+
+    def items(self) -> List[Tuple[str, int]]:
+        """
+        (owner, fingerprint) of every entry
+        """
+        with self._lock:
+            return [(owner, fingerprint) for fingerprint, owner in self._entries.values()]
+
+
+class Deduplicator:
+    """
+    Near-duplicate detection for pages and chunks at ingest time.
+
+    A page whose content is a near-duplicate of a page indexed under another
+    URL is dropped entirely; otherwise each chunk that is a near-duplicate of
+    a chunk indexed from another URL (shared boilerplate) is dropped. Matches
+    within the same URL never count, so re-indexing a page does not dedupe it
+    against its own previous version. The first copy indexed is the one kept.
+
+    Pages are filtered into a batch (see new_batch) and only committed to the
+    index once their chunks are stored, so a failed write leaves it unchanged.
+    """
+
+    def __init__(self, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.pages = NearDuplicateIndex(max_distance)
+        self.chunks = NearDuplicateIndex(max_distance)
+
+    def new_batch(self) -> "Deduplicator":
+        """
+        Empty index collecting the fingerprints of the pages filtered for one write
+        """
+        return Deduplicator(self.pages.max_distance)
+
+    def filter_page(self, url: str, fingerprints: PageFingerprints, chunks: List[str],
+                    batch: "Deduplicator") -> Tuple[List[str], bool]:
+        """
+        Blank out the chunks of a page that are already indexed, or earlier in
+        batch, from other URLs (all of them if the page itself is a
+        near-duplicate) and record the fingerprints of the rest in batch.
+
+        Returns the chunks, dropped ones replaced by "" so chunk indices stay
+        the same, and whether the whole page was a duplicate.
+        """
+        def indexed(index: str, fingerprint: int) -> bool:
+            return any(getattr(source, index).find(fingerprint, exclude_owner=url) is not None
+                       for source in (self, batch))
+
+        if fingerprints.page and indexed("pages", fingerprints.page):
+            return [""] * len(chunks), True
+        if fingerprints.page:
+            batch.pages.add(url, fingerprints.page)
+
+        kept = []
+        for chunk, fingerprint in zip(chunks, fingerprints.chunks):
+            if chunk and indexed("chunks", fingerprint):
+                kept.append("")
+                continue
+            kept.append(chunk)
+            if chunk:
+                batch.chunks.add(url, fingerprint)
+
+        return kept, False
+
+    def commit(self, urls: List[str], batch: "Deduplicator") -> None:
+        """
+        Replace the fingerprints of the pages at urls with the ones recorded in batch
+        """
+        for url in urls:
+            self.pages.remove(url)
+            self.chunks.remove(url)
+        for url, fingerprint in batch.pages.items():
+            self.pages.add(url, fingerprint)
+        for url, fingerprint in batch.chunks.items():
+            self.chunks.add(url, fingerprint)
+
+    def add_indexed(self, url: str, page_fingerprint: Optional[int], chunk_fingerprint: int) -> None:
+        """
+        Record a chunk (and its page, the first time the URL is seen) already in the index
+        """
+        if page_fingerprint and url not in self.pages:
+            self.pages.add(url, page_fingerprint)
+        self.chunks.add(url, chunk_fingerprint)
+
+    def clear(self) -> None:
+        self.pages.clear()
+        self.chunks.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Number of fingerprinted pages and chunks
+        """
+        return {
+            "pages": self.pages.owners(),
+            "chunks": len(self.chunks),
+            "max_distance": self.pages.max_distance
+        }
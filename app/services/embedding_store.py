@@ -0,0 +1,230 @@
+# app/services/embedding_store.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.config import EMBEDDING_STORE_DIRECTORY, EMBEDDING_STORE_MAX_ENTRIES
+from app.utils.locks import DirectoryLock
+
+
+class EmbeddingStore:
+    """
+    Persistent content-addressed cache of chunk embeddings.
+
+    Vectors live in a memory-mapped float32 file, one row per entry; a SQLite
+    index maps hash(model, text) to its row and last access time. Once
+    max_entries is reached the least recently used rows are evicted and their
+    slots reused, so the file stops growing at about max_entries rows.
+
+    Slots are allocated in-process, so a store directory is locked while it
+    is open: a second process (or store) opening it raises RuntimeError.
+    """
+
+    INITIAL_CAPACITY = 1024
+    # SQLite limits the number of bound parameters per statement
+    LOOKUP_BATCH = 500
+
+    def __init__(self, model_name: str, dim: int, directory: str = EMBEDDING_STORE_DIRECTORY,
+                 max_entries: int = EMBEDDING_STORE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # One subdirectory per model keeps each vector file at a single dimension
+        self.directory = os.path.join(directory, re.sub(r"[^\w.-]", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self._directory_lock = DirectoryLock(self.directory)
+        self._directory_lock.acquire()
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL UNIQUE,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        stored_dim = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if stored_dim is not None and int(stored_dim[0]) != dim:
+            # Same model name but a different dimension: the stored rows cannot be reused
+            self._conn.execute("DELETE FROM entries")
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+        elif not os.path.exists(self.vectors_path):
+            self._conn.execute("DELETE FROM entries")
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+        self._conn.commit()
+
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        if os.path.exists(self.vectors_path):
+            self._map(os.path.getsize(self.vectors_path) // (dim * 4))
+
+    def make_key(self, text: str) -> str:
+        """
+        Content address of a chunk for this model
+        """
+        return hashlib.sha256(f"{self.model_name}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def _map(self, capacity: int) -> None:
+        """
+        (Re)map the vector file with room for capacity rows, growing the file if needed
+        """
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(max(capacity * self.dim * 4, os.path.getsize(self.vectors_path)))
+
+        self._capacity = capacity
+        if capacity:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(self._capacity, self.INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+        self._map(max(min(capacity, self.max_entries), rows))
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Look up the embeddings of several texts.
+
+        Returns a matrix with one row per text and the indices of the texts
+        that were not found; their rows are zero.
+        """
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        keys = [self.make_key(text) for text in texts]
+        slots: Dict[str, int] = {}
+
+        with self._lock:
+            unique_keys = list(set(keys))
+            for start in range(0, len(unique_keys), self.LOOKUP_BATCH):
+                batch = unique_keys[start:start + self.LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                slots.update(rows)
+
+            found = [i for i, key in enumerate(keys) if key in slots]
+            if found:
+                embeddings[found] = self._vectors[[slots[keys[i]] for i in found]]
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in slots]
+                )
+                self._conn.commit()
+
+        missing = [i for i, key in enumerate(keys) if key not in slots]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return embeddings, missing
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """
+        Store embeddings for texts, evicting the least recently used entries beyond max_entries
+        """
+        if self.max_entries <= 0:
+            return
+
+        # Later copies of the same text win; beyond max_entries only the last ones can be kept
+        entries = {self.make_key(text): embedding for text, embedding in zip(texts, embeddings)}
+        items = list(entries.items())[-self.max_entries:]
+
+        with self._lock:
+            existing = set()
+            keys = [key for key, _ in items]
+            for start in range(0, len(keys), self.LOOKUP_BATCH):
+                batch = keys[start:start + self.LOOKUP_BATCH]
+                existing.update(row[0] for row in self._conn.execute(
+                    f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ))
+            items = [(key, embedding) for key, embedding in items if key not in existing]
+            if not items:
+                return
+
+            # New rows are appended until max_entries, then evicted rows hand their slot to a new entry
+            count, next_slot = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(slot) + 1, 0) FROM entries"
+            ).fetchone()
+            free = min(len(items), max(self.max_entries - count, 0))
+            slots = list(range(next_slot, next_slot + free))
+
+            # Also trims the store if max_entries was lowered since it was written
+            evict = len(items) - free + max(count - self.max_entries, 0)
+            if evict:
+                evicted = self._conn.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_access LIMIT ?", (evict,)
+                ).fetchall()
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                slots.extend(slot for _, slot in evicted)
+            slots = slots[:len(items)]
+
+            self._ensure_capacity(max(slots) + 1)
+            self._vectors[slots] = np.asarray([embedding for _, embedding in items], dtype=np.float32)
+            # Rows hit the file before the index references them
+            self._vectors.flush()
+
+            now = time.time()
+            self._conn.executemany(
+                "INSERT INTO entries (key, slot, last_access) VALUES (?, ?, ?)",
+                [(key, slot, now) for (key, _), slot in zip(items, slots)]
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Drop every stored embedding
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Size and hit rate of the store
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": self.count(),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "directory": self.directory
+        }
+
+    def close(self) -> None:
+        """
+        Flush the vector file, close the index and unlock the directory
+        """
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            self._conn.close()
+            self._directory_lock.release()
@@ -0,0 +1,191 @@
+# app/services/extractor.py
+import importlib.util
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+import validators
+from app.config import HTML_EXTRACTOR
+
+# Elements whose text and links are not part of the main content
+SKIPPED_TAGS = ["script", "style", "nav", "footer", "header"]
+
+
+@dataclass
+class ExtractedPage:
+    title: Optional[str]
+    content: str
+    links: List[str] = field(default_factory=list)
+
+
+class HTMLExtractor(ABC):
+    """
+    Extracts the title, main text and same-domain links of an HTML page.
+
+    Each backend parses the page once. Skipped elements, text and links are
+    then gathered by the parser's own (C-level) tree walks, which is faster
+    than visiting every node once from Python.
+    """
+    name: str
+
+    @abstractmethod
+    def extract(self, html: str, base_url: str) -> ExtractedPage:
+        """
+        Title, cleaned main text and same-domain links of the page at base_url
+        """
+
+
+class SoupExtractor(HTMLExtractor):
+    """
+    Reference extractor built on BeautifulSoup's pure-Python html.parser
+    """
+    name = "bs4"
+
+    def extract(self, html: str, base_url: str) -> ExtractedPage:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, 'html.parser')
+        title = soup.title.string if soup.title else None
+
+        # Remove script and style elements
+        for element in soup(SKIPPED_TAGS):
+            element.decompose()
+
+        text = soup.get_text(separator=' ', strip=True)
+        hrefs = [a_tag['href'] for a_tag in soup.find_all('a', href=True)]
+
+        return ExtractedPage(title=title, content=clean_text(text), links=normalize_links(hrefs, base_url))
+
+
+class LxmlExtractor(HTMLExtractor):
+    """
+    Extractor built on lxml's C parser
+    """
+    name = "lxml"
+
+    def extract(self, html: str, base_url: str) -> ExtractedPage:
+        import lxml.html
+        from lxml import etree
+
+        if not html.strip():
+            return ExtractedPage(title=None, content="")
+
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            root = lxml.html.document_fromstring(html.encode('utf-8'))
+        title = root.findtext('.//title')
+
+        etree.strip_elements(root, *SKIPPED_TAGS, etree.Comment, with_tail=False)
+
+        text = ' '.join(part.strip() for part in root.itertext() if part.strip())
+        hrefs = [a_tag.get('href') for a_tag in root.iter('a') if a_tag.get('href')]
+
+        return ExtractedPage(title=title, content=clean_text(text), links=normalize_links(hrefs, base_url))
+
+
+class SelectolaxExtractor(HTMLExtractor):
+    """
+    Extractor built on selectolax's lexbor engine, the fastest of the backends
+    """
+    name = "selectolax"
+
+    def extract(self, html: str, base_url: str) -> ExtractedPage:
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(html)
+        title_node = tree.css_first('title')
+        title = title_node.text() if title_node is not None else None
+
+        tree.strip_tags(SKIPPED_TAGS)
+
+        text = tree.root.text(separator=' ', strip=True) if tree.root is not None else ""
+        hrefs = [a_tag.attributes.get('href') for a_tag in tree.css('a[href]')]
+
+        return ExtractedPage(title=title, content=clean_text(text), links=normalize_links(hrefs, base_url))
+
+
+EXTRACTORS: Dict[str, HTMLExtractor] = {
+    extractor.name: extractor
+    for extractor in (SelectolaxExtractor(), LxmlExtractor(), SoupExtractor())
+}
+
+# Python packages each backend needs, in order of preference for "auto"
+BACKEND_MODULES = {
+    "selectolax": "selectolax",
+    "lxml": "lxml",
+    "bs4": "bs4"
+}
+
+
+def available_backends() -> List[str]:
+    """
+    Names of the backends whose package is installed, fastest first
+    """
+    return [name for name, module in BACKEND_MODULES.items() if importlib.util.find_spec(module) is not None]
+
+
+def resolve_backend(name: str = HTML_EXTRACTOR) -> str:
+    """
+    Resolve "auto" to the fastest installed backend and validate explicit names
+    """
+    if name == "auto":
+        backends = available_backends()
+        return backends[0] if backends else "bs4"
+
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor: {name}")
+
+    return name
+
+
+def get_extractor(name: str = HTML_EXTRACTOR) -> HTMLExtractor:
+    """
+    Get the extractor for a backend name, or the fastest installed one for "auto"
+    """
+    return EXTRACTORS[resolve_backend(name)]
+
+
+def extract_html(backend: str, html: str, base_url: str) -> ExtractedPage:
+    """
+    Module-level entry point so extraction can run in a thread or process pool
+    """
+    return EXTRACTORS[backend].extract(html, base_url)
+
+
+def clean_text(text: str) -> str:
+    """
+    Collapse the whitespace left behind by markup
+    """
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+def normalize_links(hrefs: List[Optional[str]], base_url: str) -> List[str]:
+    """
+    Resolve hrefs against the page URL and keep the distinct same-domain links
+    """
+    links = []
+    seen = set()
+    seen_hrefs = set()
+    base_domain = urlparse(base_url).netloc
+
+    for href in hrefs:
+        # Pages repeat the same hrefs in menus and bodies; resolve each only once
+        if not href or href in seen_hrefs:
+            continue
+        seen_hrefs.add(href)
+
+        # Remove fragments and queries
+        clean_url = urljoin(base_url, href).split('#')[0].split('?')[0]
+        if clean_url in seen:
+            continue
+        seen.add(clean_url)
+
+        # Validate URL and check if it's from the same domain
+        if urlparse(clean_url).netloc == base_domain and validators.url(clean_url):
+            links.append(clean_url)
+
+    return links
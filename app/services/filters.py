@@ -0,0 +1,70 @@
+# app/services/filters.py
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+from app.models.schema import SearchFilters
+
+# URL path prefixes stored per chunk as path_1 ("/docs"), path_2 ("/docs/api") and path_3,
+# so url_prefix filters on the first levels of a site can be pushed into the where clause
+PATH_METADATA_DEPTH = 3
+
+
+def path_prefixes(url: str) -> Dict[str, str]:
+    """
+    path_1 .. path_N metadata of a URL, one per leading path segment
+    """
+    segments = [segment for segment in urlparse(url).path.split("/") if segment]
+    return {
+        f"path_{depth}": "/" + "/".join(segments[:depth])
+        for depth in range(1, min(len(segments), PATH_METADATA_DEPTH) + 1)
+    }
+
+
+def build_where(filters: Optional[SearchFilters]) -> Optional[Dict[str, Any]]:
+    """
+    Chroma where clause for the filters, or None when nothing can be pushed down.
+
+    A url_prefix contributes its domain and the deepest of its complete path
+    segments (those followed by "/") that is stored as metadata; the rest of
+    the prefix is checked by matches_filters afterwards.
+    """
+    if filters is None:
+        return None
+
+    conditions: List[Dict[str, Any]] = []
+    if filters.domains:
+        conditions.append({"domain": {"$in": list(filters.domains)}})
+    if filters.crawled_after is not None:
+        conditions.append({"crawled_at": {"$gte": filters.crawled_after.timestamp()}})
+    if filters.crawled_before is not None:
+        conditions.append({"crawled_at": {"$lte": filters.crawled_before.timestamp()}})
+
+    if filters.url_prefix:
+        parsed = urlparse(filters.url_prefix)
+        if parsed.netloc:
+            conditions.append({"domain": parsed.netloc})
+        # The last segment may be cut short ("/docs/ap" matches "/docs/api"), so it is only used if followed by "/"
+        complete = [segment for segment in parsed.path.split("/")[:-1] if segment][:PATH_METADATA_DEPTH]
+        if complete:
+            conditions.append({f"path_{len(complete)}": "/" + "/".join(complete)})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def matches_filters(metadata: Dict[str, Any], filters: Optional[SearchFilters]) -> bool:
+    """
+    Whether a chunk's metadata passes every filter; used for the parts a where clause cannot express
+    """
+    if filters is None:
+        return True
+    if filters.domains and metadata.get("domain") not in filters.domains:
+        return False
+    crawled_at = metadata.get("crawled_at", 0)
+    if filters.crawled_after is not None and crawled_at < filters.crawled_after.timestamp():
+        return False
+    if filters.crawled_before is not None and crawled_at > filters.crawled_before.timestamp():
+        return False
+    if filters.url_prefix and not metadata.get("url", "").startswith(filters.url_prefix):
+        return False
+    return True
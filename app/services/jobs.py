@@ -0,0 +1,271 @@
+# app/services/jobs.py
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+import validators
+from app.config import CRAWL_JOBS_DIRECTORY, CRAWL_JOB_WORKERS, CRAWL_JOB_CHECKPOINT_PAGES
+from app.models.schema import WebPage
+from app.services.crawler import WebCrawler
+from app.services.dedup import with_dedup_ratios
+from app.services.pipeline import IngestionPipeline
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+TERMINAL_STATUSES = {COMPLETED, FAILED, CANCELLED}
+
+
+@dataclass
+class CrawlJob:
+    id: str
+    url: str
+    max_pages: int
+    max_depth: int
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    progress: Dict[str, int] = field(default_factory=lambda: {
+        "pages_crawled": 0,
+        "pages_indexed": 0,
+        "pages_unchanged": 0,
+        "pages_duplicate": 0,
+        "chunks_indexed": 0,
+        "chunks_duplicate": 0,
+        "frontier_size": 0
+    })
+    # Last checkpoint of the crawler (frontier, visited set, page count)
+    state: Optional[Dict[str, Any]] = None
+
+
+class CrawlJobManager:
+    """
+    Runs crawls in background workers and checkpoints them to disk, so a
+    restart re-queues unfinished jobs and resumes them from their last
+    checkpoint
+    """
+
+    def __init__(self, crawler: WebCrawler, pipeline: IngestionPipeline,
+                 directory: str = CRAWL_JOBS_DIRECTORY, workers: int = CRAWL_JOB_WORKERS,
+                 checkpoint_every: int = CRAWL_JOB_CHECKPOINT_PAGES):
+        self.crawler = crawler
+        self.pipeline = pipeline
+        self.directory = directory
+        self.num_workers = max(1, workers)
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.jobs: Dict[str, CrawlJob] = {}
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._crawlers: Dict[str, WebCrawler] = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+    async def start(self) -> None:
+        """
+        Load persisted jobs, re-queue unfinished ones and start the workers
+        """
+        self._queue = asyncio.Queue()
+
+        for job in self._load_jobs():
+            self.jobs[job.id] = job
+            if job.status in (QUEUED, RUNNING):
+                # A running job was interrupted by a shutdown; resume it from its checkpoint
+                job.status = QUEUED
+                self._save(job)
+                self._queue.put_nowait(job.id)
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Interrupted jobs keep their checkpoint and resume on the next start
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, url: str, max_pages: int, max_depth: int) -> CrawlJob:
+        """
+        Enqueue a new crawl job
+        """
+        if not validators.url(url):
+            raise ValueError(f"Invalid URL: {url}")
+        if self._queue is None:
+            raise RuntimeError("Crawl job manager has not been started")
+
+        job = CrawlJob(id=uuid.uuid4().hex, url=url, max_pages=max_pages, max_depth=max_depth)
+        self.jobs[job.id] = job
+        self._save(job)
+        self._queue.put_nowait(job.id)
+
+        return job
+
+    def get(self, job_id: str) -> Optional[CrawlJob]:
+        """
+        Get a job by id
+        """
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[CrawlJob]:
+        """
+        All known jobs, newest first
+        """
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[CrawlJob]:
+        """
+        Cancel a queued or running job. Pages indexed before cancellation are kept
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATUSES:
+            return job
+
+        job.status = CANCELLED
+        job.finished_at = time.time()
+        self._save(job)
+
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+
+        return job
+
+    def describe(self, job: CrawlJob) -> Dict[str, Any]:
+        """
+        Public view of a job, with live counters while it is running
+        """
+        data = asdict(job)
+        data.pop("state")
+
+        crawler = self._crawlers.get(job.id)
+        if crawler is not None:
+            live = crawler.progress()
+            data["progress"]["pages_crawled"] = live["pages_crawled"]
+            data["progress"]["frontier_size"] = live["frontier_size"]
+
+        progress = data["progress"]
+        ratios = with_dedup_ratios({
+            "pages": progress["pages_indexed"],
+            "duplicate_pages": progress.get("pages_duplicate", 0),
+            "chunks": progress.get("chunks_indexed", 0),
+            "duplicate_chunks": progress.get("chunks_duplicate", 0)
+        })
+        data["dedup"] = {key: ratios[key] for key in ("duplicate_page_ratio", "duplicate_chunk_ratio")}
+
+        return data
+
+    async def _worker(self) -> None:
+        """
+        Take jobs off the queue and run them one at a time
+        """
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is None or job.status != QUEUED:
+                    continue
+
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks[job_id] = task
+                try:
+                    await task
+                finally:
+                    self._tasks.pop(job_id, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Crawl job {job_id} crashed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: CrawlJob) -> None:
+        """
+        Crawl with checkpoints, indexing the pages of each checkpoint before persisting it
+        """
+        job.status = RUNNING
+        job.started_at = job.started_at or time.time()
+        self._save(job)
+
+        crawler = self.crawler.fork()
+        self._crawlers[job.id] = crawler
+
+        async def checkpoint(state: Dict[str, Any], pages: List[WebPage]) -> None:
+            report = await self.pipeline.add_webpages(pages)
+
+            progress = job.progress
+            job.state = state
+            progress["pages_crawled"] = state["page_count"]
+            # Jobs persisted before near-duplicate detection lack its counters
+            for key, reported in (("pages_indexed", "pages"), ("pages_duplicate", "duplicate_pages"),
+                                  ("chunks_indexed", "chunks"), ("chunks_duplicate", "duplicate_chunks")):
+                progress[key] = progress.get(key, 0) + report[reported]
+            progress["pages_unchanged"] = state["page_count"] - progress["pages_indexed"] - progress["pages_duplicate"]
+            job.progress["frontier_size"] = len(state["frontier"])
+            self._save(job)
+
+        try:
+            await crawler.crawl(
+                job.url,
+                max_pages=job.max_pages,
+                max_depth=job.max_depth,
+                resume_state=job.state,
+                checkpoint=checkpoint,
+                checkpoint_every=self.checkpoint_every
+            )
+            job.status = COMPLETED
+        except asyncio.CancelledError:
+            if job.status != CANCELLED:
+                # Shutdown: leave the job running on disk so it resumes on restart
+                raise
+        except Exception as e:
+            self.logger.error(f"Crawl job {job.id} failed: {str(e)}")
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            self._crawlers.pop(job.id, None)
+
+        job.finished_at = job.finished_at or time.time()
+        job.state = None
+        self._save(job)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: CrawlJob) -> None:
+        """
+        Atomically write a job and its checkpoint to disk
+        """
+        path = self._job_path(job.id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(job), f)
+        os.replace(tmp_path, path)
+
+    def _load_jobs(self) -> List[CrawlJob]:
+        """
+        Read all persisted jobs, oldest first
+        """
+        jobs = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    jobs.append(CrawlJob(**json.load(f)))
+            except Exception as e:
+                self.logger.error(f"Skipping unreadable crawl job {name}: {str(e)}")
+
+        return sorted(jobs, key=lambda job: job.created_at)
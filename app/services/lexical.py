@@ -0,0 +1,171 @@
+# app/services/lexical.py
+import math
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens, matching how chunks are preprocessed before indexing
+    """
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class LexicalIndex:
+    """
+    In-memory inverted index over chunks with BM25 scoring.
+
+    Each term maps to two parallel arrays of document numbers and term
+    frequencies, appended to as chunks are added. Removed or replaced chunks
+    are tombstoned and dropped from the postings once enough of them pile up.
+    Until then they still count towards document frequencies, which only
+    nudges idf slightly.
+    """
+
+    # Compact once this share of document numbers belongs to removed chunks
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Drop every document
+        """
+        with self._lock:
+            self._postings: Dict[str, Tuple[array, array]] = {}
+            self._doc_ids: List[str] = []
+            self._doc_numbers: Dict[str, int] = {}
+            self._doc_lengths = array("I")
+            self._alive = bytearray()
+            self._total_length = 0
+            self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def add_many(self, doc_ids: List[str], documents: List[str]) -> None:
+        """
+        Index documents, replacing any earlier version of the same id
+        """
+        with self._lock:
+            for doc_id, document in zip(doc_ids, documents):
+                self._remove(doc_id)
+
+                tokens = tokenize(document)
+                frequencies: Dict[str, int] = {}
+                for token in tokens:
+                    frequencies[token] = frequencies.get(token, 0) + 1
+
+                number = len(self._doc_ids)
+                self._doc_ids.append(doc_id)
+                self._doc_numbers[doc_id] = number
+                self._doc_lengths.append(len(tokens))
+                self._alive.append(1)
+                self._total_length += len(tokens)
+
+                for token, frequency in frequencies.items():
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = (array("I"), array("I"))
+                    postings[0].append(number)
+                    postings[1].append(frequency)
+
+            self._maybe_compact()
+
+    def remove_many(self, doc_ids: Iterable[str]) -> None:
+        """
+        Tombstone documents by id
+        """
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+            self._maybe_compact()
+
+    def _remove(self, doc_id: str) -> None:
+        number = self._doc_numbers.pop(doc_id, None)
+        if number is not None:
+            self._alive[number] = 0
+            self._removed += 1
+
+    def _maybe_compact(self) -> None:
+        """
+        Rebuild the postings without tombstoned documents once they make up too much of the index
+        """
+        if not self._removed or self._removed < len(self._doc_ids) * self.COMPACT_RATIO:
+            return
+
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        # Old document number -> new document number
+        renumber = np.cumsum(alive) - 1
+
+        postings = {}
+        for token, (numbers, frequencies) in self._postings.items():
+            numbers = np.frombuffer(numbers, dtype=np.uint32)
+            keep = alive[numbers]
+            if keep.any():
+                postings[token] = (
+                    array("I", renumber[numbers[keep]].astype(np.uint32).tobytes()),
+                    array("I", np.frombuffer(frequencies, dtype=np.uint32)[keep].tobytes())
+                )
+
+        self._postings = postings
+        self._doc_ids = [doc_id for doc_id, keep in zip(self._doc_ids, alive) if keep]
+        self._doc_numbers = {doc_id: number for number, doc_id in enumerate(self._doc_ids)}
+        self._doc_lengths = array("I", np.frombuffer(self._doc_lengths, dtype=np.uint32)[alive].tobytes())
+        self._alive = bytearray(b"\x01" * len(self._doc_ids))
+        self._total_length = sum(self._doc_lengths)
+        self._removed = 0
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        (document id, BM25 score) of the best matching documents, best first
+        """
+        terms = set(tokenize(query))
+
+        with self._lock:
+            total_docs = len(self._doc_ids)
+            if not total_docs or not terms:
+                return []
+
+            average_length = self._total_length / total_docs or 1.0
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+            scores = np.zeros(total_docs, dtype=np.float32)
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+
+                numbers = np.frombuffer(postings[0], dtype=np.uint32)
+                frequencies = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                idf = math.log(1 + (total_docs - len(numbers) + 0.5) / (len(numbers) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[numbers] / average_length)
+                # A document appears at most once per term, so plain fancy-index addition is safe
+                scores[numbers] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+            scores[np.frombuffer(bytes(self._alive), dtype=np.uint8) == 0] = 0
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(scores[candidates], -top_k)[-top_k:]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+            return [(self._doc_ids[number], float(scores[number])) for number in candidates]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Size of the index
+        """
+        return {
+            "documents": len(self._doc_numbers),
+            "terms": len(self._postings),
+            "tombstones": self._removed
+        }
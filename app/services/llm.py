@@ -1,14 +1,37 @@
 # app/services/llm.py
-import groq
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List
 import time
-from app.config import GROQ_API_KEY
+from app.config import GROQ_API_KEY, LLM_REQUEST_TIMEOUT
+from app.services.llm_cache import LLMResponseCache
+
+UNDERSTANDING_SYSTEM_PROMPT = "You are a helpful search query analysis assistant."
 
 
 class LLMService:
     def __init__(self):
-        self.client = groq.Client(api_key=GROQ_API_KEY)
+        # Imported here to keep groq out of the application's import time
+        import groq
+
+        # Async client, so completions don't block the event loop during the round trip
+        self.client = groq.AsyncClient(api_key=GROQ_API_KEY, timeout=LLM_REQUEST_TIMEOUT)
         self.model = "llama3-8b-8192"  # You can change this to any model Groq supports
+        self.cache = LLMResponseCache(model=self.model)
+
+    async def _complete(self, system: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        """
+        Run a single chat completion and return its text
+        """
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+
+        return response.choices[0].message.content.strip()
 
     async def enhance_query(self, query: str) -> str:
         """
@@ -25,29 +48,23 @@ class LLMService:
             Enhanced query:
             """
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful search query enhancement assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=100,
-                temperature=0.2
+            enhanced_query = await self.cache.get_or_compute(
+                "enhance_query",
+                query,
+                lambda: self._complete(
+                    "You are a helpful search query enhancement assistant.", prompt,
+                    max_tokens=100, temperature=0.2
+                )
             )
-
-            enhanced_query = response.choices[0].message.content.strip()
             return enhanced_query
 
         except Exception as e:
             print(f"Error enhancing query: {str(e)}")
             return query  # Return original query if enhancement fails
 
-    async def generate_semantic_understanding(self, query: str) -> str:
-        """
-        Generate a semantic understanding of the query
-        """
-        try:
-            prompt = f"""
+    @staticmethod
+    def _understanding_prompt(query: str) -> str:
+        return f"""
             Analyze the following search query and provide a brief explanation of what the user is looking for.
             Include key concepts, potential topics, and the likely intent behind the query.
 
@@ -56,22 +73,72 @@ class LLMService:
             Semantic understanding:
             """
 
-            response = self.client.chat.completions.create(
+    async def generate_semantic_understanding(self, query: str) -> str:
+        """
+        Generate a semantic understanding of the query
+        """
+        try:
+            prompt = self._understanding_prompt(query)
+
+            understanding = await self.cache.get_or_compute(
+                "semantic_understanding",
+                query,
+                lambda: self._complete(
+                    UNDERSTANDING_SYSTEM_PROMPT, prompt,
+                    max_tokens=150, temperature=0.3
+                )
+            )
+            return understanding
+
+        except Exception as e:
+            print(f"Error generating semantic understanding: {str(e)}")
+            return "Unable to generate semantic understanding."
+
+    async def stream_semantic_understanding(self, query: str) -> AsyncIterator[str]:
+        """
+        Stream the semantic understanding of the query as it is generated.
+
+        A cached understanding is yielded in one piece; a freshly streamed one
+        is cached once complete, so generate_semantic_understanding reuses it.
+        """
+        cached = await self.cache.get("semantic_understanding", query)
+        if cached is not None:
+            yield cached
+            return
+
+        streamed = False
+        try:
+            stream = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a helpful search query analysis assistant."},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": UNDERSTANDING_SYSTEM_PROMPT},
+                    {"role": "user", "content": self._understanding_prompt(query)}
                 ],
                 max_tokens=150,
-                temperature=0.3
+                temperature=0.3,
+                stream=True
             )
 
-            understanding = response.choices[0].message.content.strip()
-            return understanding
+            parts = []
+            async for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if not token:
+                    continue
+                # Leading whitespace would not survive the strip() applied to non-streamed answers
+                if not parts:
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                parts.append(token)
+                streamed = True
+                yield token
+
+            await self.cache.set("semantic_understanding", query, "".join(parts).strip())
 
         except Exception as e:
-            print(f"Error generating semantic understanding: {str(e)}")
-            return "Unable to generate semantic understanding."
+            print(f"Error streaming semantic understanding: {str(e)}")
+            if not streamed:
+                yield "Unable to generate semantic understanding."
 
     async def summarize_results(self, query: str, results: List[Dict[str, Any]]) -> str:
         """
@@ -96,17 +163,10 @@ class LLMService:
             Summary:
             """
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful search results summarization assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=250,
-                temperature=0.3
+            summary = await self._complete(
+                "You are a helpful search results summarization assistant.", prompt,
+                max_tokens=250, temperature=0.3
             )
-
-            summary = response.choices[0].message.content.strip()
             return summary
 
         except Exception as e:
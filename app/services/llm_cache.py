@@ -0,0 +1,211 @@
+# app/services/llm_cache.py
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.config import LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_PATH, LLM_CACHE_DISK_MAX_ENTRIES
+from app.utils.cache import LRUCache
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier, shared across restarts and worker processes.
+
+    Its methods block on SQLite; LLMResponseCache calls them in a worker thread.
+    """
+
+    # Trim the table back to max_entries after this many writes
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, ttl: Optional[float], max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get an unexpired value and refresh its access time
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a value, periodically evicting expired and least recently used rows
+        """
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._conn.execute("DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM completions keyed on (model, prompt kind, normalized query).
+
+    Concurrent misses for the same key share a single in-flight completion.
+    """
+
+    def __init__(self, model: str, max_size: int = LLM_CACHE_SIZE, ttl: Optional[float] = LLM_CACHE_TTL,
+                 path: str = LLM_CACHE_PATH, disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES):
+        self.model = model
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.disk = SQLiteCache(path, ttl, disk_max_entries) if path else None
+        self.disk_hits = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def make_key(self, kind: str, query: str) -> str:
+        """
+        Cache key for a prompt kind and query; case and whitespace are ignored
+        """
+        normalized = " ".join(query.lower().split())
+        return hashlib.sha256(f"{self.model}\x1f{kind}\x1f{normalized}".encode("utf-8")).hexdigest()
+
+    async def get(self, kind: str, query: str) -> Optional[str]:
+        """
+        Look a response up in memory, then on disk
+        """
+        key = self.make_key(kind, query)
+        value = self.memory.get(key)
+        if value is None:
+            value = await self._get_from_disk(key)
+        return value
+
+    async def set(self, kind: str, query: str, value: str) -> None:
+        """
+        Store a response in both tiers; the disk write runs in a thread
+        """
+        key = self.make_key(kind, query)
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    async def _get_from_disk(self, key: str) -> Optional[str]:
+        """
+        Look a response up on disk in a thread, promoting a hit to memory
+        """
+        if self.disk is None:
+            return None
+        value = await asyncio.to_thread(self.disk.get, key)
+        if value is not None:
+            self.disk_hits += 1
+            self.memory.set(key, value)
+        return value
+
+    async def get_or_compute(self, kind: str, query: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return the cached response, or run compute once for all concurrent callers and cache it.
+
+        Only the memory lookup happens inline; the disk lookup is part of the
+        shared completion, so concurrent misses also share it. Failures are not
+        cached; they propagate to every caller waiting on the completion.
+        """
+        key = self.make_key(kind, query)
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load_or_compute(kind, query, key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        # Shielded, so a caller that gives up does not cancel the completion for the others
+        return await asyncio.shield(task)
+
+    async def _load_or_compute(self, kind: str, query: str, key: str,
+                               compute: Callable[[], Awaitable[str]]) -> str:
+        value = await self._get_from_disk(key)
+        if value is None:
+            value = await compute()
+            await self.set(kind, query, value)
+        return value
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # Mark the exception as retrieved in case every caller gave up waiting
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self) -> None:
+        """
+        Drop all cached responses
+        """
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit/miss counters for both tiers
+        """
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        stats = {
+            "size": memory["size"],
+            "max_size": memory["max_size"],
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": memory["misses"] - self.disk_hits,
+            "hit_rate": (memory["hits"] + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_enabled": self.disk is not None,
+            "disk_size": self.disk.count() if self.disk is not None else 0,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight)
+        }
+        return stats
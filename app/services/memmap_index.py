@@ -0,0 +1,884 @@
+# app/services/memmap_index.py
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import (
+    VECTOR_INDEX_DIRECTORY, VECTOR_INDEX_MODE, VECTOR_IVF_NPROBE, VECTOR_SEGMENT_ROWS, VECTOR_COMPACTION_DEAD_RATIO
+)
+from app.services.quantized import normalize
+from app.utils.locks import DirectoryLock
+
+INDEX_MODES = ("flat", "ivf")
+
+# Chroma where operators and their SQL equivalents
+COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# (segment, row) of a chunk packed into one int64, so candidates from all segments rank together
+ROW_BITS = 32
+
+
+def where_to_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    SQL condition over the chunks table's JSON metadata equivalent to a Chroma where clause.
+
+    Supports $and, $or, plain equality and the $eq, $ne, $gt, $gte, $lt,
+    $lte, $in and $nin operators.
+    """
+    params: List[Any] = []
+
+    def condition(clause: Dict[str, Any]) -> str:
+        parts = []
+        for key, value in clause.items():
+            if key in ("$and", "$or"):
+                parts.append("(" + f" {key[1:].upper()} ".join(condition(item) for item in value) + ")")
+                continue
+
+            operator, operand = next(iter(value.items())) if isinstance(value, dict) else ("$eq", value)
+            params.append(f'$."{key}"')
+            if operator in ("$in", "$nin"):
+                params.extend(operand)
+                negation = "NOT " if operator == "$nin" else ""
+                parts.append(f"json_extract(metadata, ?) {negation}IN ({','.join('?' * len(operand))})")
+            elif operator in COMPARISONS:
+                params.append(operand)
+                parts.append(f"json_extract(metadata, ?) {COMPARISONS[operator]} ?")
+            else:
+                raise ValueError(f"Unsupported where operator {operator!r}")
+        return " AND ".join(parts) if parts else "1"
+
+    return condition(where), params
+
+
+def train_ivf(vectors: np.ndarray, lists: int, iterations: int = 10,
+              seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cluster normalized vectors into inverted lists with spherical k-means.
+
+    Centroids are trained on a sample of 64 rows per list. Returns the
+    centroids, the row numbers ordered by list, and the offset of each list
+    in that order (lists + 1 entries).
+    """
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(len(vectors), size=min(len(vectors), lists * 64), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)]
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        # A list that lost all its rows keeps its previous centroid
+        filled = np.bincount(assignment, minlength=lists) > 0
+        centroids[filled] = normalize(sums[filled])
+
+    assignment = np.concatenate([
+        np.argmax(np.asarray(vectors[start:start + MemmapCollection.SCAN_BLOCK]) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), MemmapCollection.SCAN_BLOCK)
+    ])
+    order = np.argsort(assignment, kind="stable").astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=lists))]).astype(np.int64)
+    return centroids, order, offsets
+
+
+class ReadWriteLock:
+    """
+    Any number of readers or one writer; waiting writers keep new readers out
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class Segment:
+    """
+    Append-only block of rows: normalized float32 vectors and one liveness byte
+    per row, both memory-mapped, plus the segment's inverted lists once built
+    """
+
+    def __init__(self, directory: str, segment_id: int, dim: int, rows: int = 0, sealed: bool = False,
+                 lists: int = 0, capacity: int = 0):
+        self.id = segment_id
+        self.dim = dim
+        self.rows = rows
+        self.sealed = sealed
+        self.prefix = os.path.join(directory, f"segment-{segment_id:06d}")
+        self.vectors_path = f"{self.prefix}.f32"
+        self.alive_path = f"{self.prefix}.alive"
+
+        self.capacity = 0
+        self.vectors: Optional[np.memmap] = None
+        self.alive: Optional[np.memmap] = None
+        self._map(max(capacity, rows, os.path.getsize(self.vectors_path) // (dim * 4)
+                      if os.path.exists(self.vectors_path) else 0, 1))
+        self.live = int(np.count_nonzero(self.alive[:rows]))
+
+        self.lists = 0
+        self.centroids: Optional[np.memmap] = None
+        self.order: Optional[np.memmap] = None
+        self.offsets: Optional[np.memmap] = None
+        if lists:
+            self.load_ivf(lists)
+
+    def _map(self, capacity: int) -> None:
+        for path, row_bytes in ((self.vectors_path, self.dim * 4), (self.alive_path, 1)):
+            with open(path, "ab") as f:
+                f.truncate(max(capacity * row_bytes, os.path.getsize(path)))
+        self.flush()
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.alive = np.memmap(self.alive_path, dtype=np.uint8, mode="r+", shape=(capacity,))
+
+    def reserve(self, rows: int, limit: int) -> None:
+        """
+        Grow the files to hold at least rows rows, doubling up to limit
+        """
+        if rows > self.capacity:
+            self._map(min(max(rows, self.capacity * 2), max(limit, rows)))
+
+    def ivf_paths(self) -> Tuple[str, str, str]:
+        return f"{self.prefix}.centroids.f32", f"{self.prefix}.order.i64", f"{self.prefix}.offsets.i64"
+
+    def write_ivf(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray) -> None:
+        for path, array in zip(self.ivf_paths(), (centroids, order, offsets)):
+            array.tofile(path)
+
+    def load_ivf(self, lists: int) -> None:
+        centroids_path, order_path, offsets_path = self.ivf_paths()
+        self.centroids = np.memmap(centroids_path, dtype=np.float32, mode="r", shape=(lists, self.dim))
+        self.order = np.memmap(order_path, dtype=np.int64, mode="r")
+        self.offsets = np.memmap(offsets_path, dtype=np.int64, mode="r", shape=(lists + 1,))
+        self.lists = lists
+
+    def dead_ratio(self) -> float:
+        return 1 - self.live / self.rows if self.rows else 0.0
+
+    def flush(self) -> None:
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.alive.flush()
+
+    def remove(self) -> None:
+        """
+        Delete the segment's files; mappings still held by a reader stay valid until dropped
+        """
+        for path in (self.vectors_path, self.alive_path, *self.ivf_paths()):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class MemmapCollection:
+    """
+    Vector index of memory-mapped segments, exposing the part of Chroma's
+    Collection API that VectorDatabase uses (upsert, update, delete, get, query, count).
+
+    Embeddings are normalized and appended to the active segment, which is
+    sealed once it holds segment_rows rows. Re-upserting an id tombstones its
+    old row and appends a new one; deleting only tombstones. A background
+    thread rewrites sealed segments once compaction_dead_ratio of their rows
+    are tombstoned, merging small ones, and in "ivf" mode clusters every
+    sealed segment of at least IVF_MIN_ROWS rows into about sqrt(rows) lists.
+
+    Documents, metadata and the (segment, row) of each id live in SQLite,
+    which also evaluates where clauses. Opening only maps the existing files,
+    so startup does not grow with the index. Rows are allocated in-process,
+    so the directory is locked while open; a second opener raises RuntimeError.
+
+    "flat" queries score every live row with one matrix product per block of
+    rows and all queries of a batch. "ivf" queries score only the nprobe
+    lists closest to the query in each clustered segment; the active segment
+    is always scanned in full. Filtered queries score just the rows that pass
+    the where clause.
+    """
+
+    INITIAL_CAPACITY = 1024
+    # Rows scored per matrix product when scanning
+    SCAN_BLOCK = 8192
+    # SQLite limits the number of bound parameters per statement
+    LOOKUP_BATCH = 500
+    IVF_MIN_ROWS = 4096
+    # Sealed segments with fewer live rows than segment_rows / SMALL_SEGMENT_DIVISOR are merged
+    SMALL_SEGMENT_DIVISOR = 4
+
+    def __init__(self, directory: str, mode: str = VECTOR_INDEX_MODE, nprobe: int = VECTOR_IVF_NPROBE,
+                 segment_rows: int = VECTOR_SEGMENT_ROWS, compaction_dead_ratio: float = VECTOR_COMPACTION_DEAD_RATIO):
+        if mode not in INDEX_MODES:
+            raise ValueError(f"Unsupported vector index mode {mode!r}; expected one of {', '.join(INDEX_MODES)}")
+
+        self.directory = directory
+        self.mode = mode
+        self.nprobe = max(1, nprobe)
+        self.segment_rows = max(1, segment_rows)
+        self.compaction_dead_ratio = compaction_dead_ratio
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+        # Taken before anything is read, as unrecorded segment files are removed below
+        self._directory_lock = DirectoryLock(directory)
+        self._directory_lock.acquire()
+
+        self._lock = ReadWriteLock()
+        # Serializes use of the one SQLite connection between concurrent readers
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                segment INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_location ON chunks (segment, row)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                rows INTEGER NOT NULL,
+                sealed INTEGER NOT NULL,
+                lists INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        stored_dim = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim: Optional[int] = int(stored_dim[0]) if stored_dim is not None else None
+
+        self._segments: Dict[int, Segment] = {}
+        for segment_id, rows, sealed, lists in self._conn.execute("SELECT id, rows, sealed, lists FROM segments"):
+            self._segments[segment_id] = Segment(directory, segment_id, self.dim, rows, bool(sealed), lists)
+        self._next_segment_id = max(self._segments, default=0) + 1
+        # Only the newest unsealed segment takes appends
+        unsealed = sorted((segment for segment in self._segments.values() if not segment.sealed), key=lambda s: s.id)
+        for segment in unsealed[:-1]:
+            segment.sealed = True
+        # Bumped by clear, so a compaction that started before it is discarded
+        self._generation = 0
+
+        # Files of a compaction or list build that was interrupted before it was recorded
+        for name in os.listdir(directory):
+            if name.startswith("segment-") and int(name[8:14]) not in self._segments:
+                os.remove(os.path.join(directory, name))
+
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._maintain, name="memmap-index-maintenance", daemon=True)
+        self._thread.start()
+        self._wake.set()
+
+    # Writes
+
+    def upsert(self, ids: List[str], embeddings: Sequence[Sequence[float]],
+               documents: Optional[List[str]] = None, metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Add chunks, replacing any with the same id
+        """
+        if not ids:
+            return
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        documents = documents if documents is not None else [""] * len(ids)
+        metadatas = metadatas if metadatas is not None else [{}] * len(ids)
+
+        # Later copies of the same id win
+        latest = list({doc_id: i for i, doc_id in enumerate(ids)}.values())
+        if len(latest) < len(ids):
+            vectors = vectors[latest]
+            ids, documents, metadatas = ([values[i] for i in latest] for values in (ids, documents, metadatas))
+
+        with self._lock.write():
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with self._db_lock:
+                    self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dim})")
+
+            self._tombstone(self._locations(ids).values())
+            locations = self._append(vectors)
+
+            with self._db_lock:
+                self._conn.executemany(
+                    """
+                    INSERT INTO chunks (id, segment, row, document, metadata) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        segment = excluded.segment, row = excluded.row,
+                        document = excluded.document, metadata = excluded.metadata
+                    """,
+                    [
+                        (doc_id, segment_id, row, document or "", json.dumps(metadata or {}))
+                        for doc_id, (segment_id, row), document, metadata in zip(ids, locations, documents, metadatas)
+                    ]
+                )
+                self._save_segments()
+                self._conn.commit()
+
+        self._wake.set()
+
+    def update(self, ids: List[str], embeddings: Optional[Sequence[Sequence[float]]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None, documents: Optional[List[str]] = None) -> None:
+        """
+        Change stored chunks; metadata is merged into the existing metadata like Chroma does. Unknown ids are ignored.
+
+        Only new embeddings move a chunk to a new row; metadata and documents are changed in place.
+        """
+        with self._lock.write():
+            stored = {row[0]: row for row in self._select(ids=ids)}
+            known = [i for i, doc_id in enumerate(ids) if doc_id in stored]
+            if not known:
+                return
+            if embeddings is not None:
+                self._tombstone([stored[ids[i]][1:3] for i in known])
+                locations = self._append(normalize(np.asarray([embeddings[i] for i in known], dtype=np.float32)))
+            else:
+                locations = [stored[ids[i]][1:3] for i in known]
+
+            with self._db_lock:
+                self._conn.executemany(
+                    "UPDATE chunks SET segment = ?, row = ?, document = ?, metadata = ? WHERE id = ?",
+                    [
+                        (
+                            segment_id, row,
+                            documents[i] if documents is not None else stored[ids[i]][3],
+                            json.dumps({**json.loads(stored[ids[i]][4]), **(metadatas[i] if metadatas else {})}),
+                            ids[i]
+                        )
+                        for i, (segment_id, row) in zip(known, locations)
+                    ]
+                )
+                self._save_segments()
+                self._conn.commit()
+        self._wake.set()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Remove chunks by id and/or where clause; their rows are reclaimed by compaction
+        """
+        if ids is None and where is None:
+            return
+        with self._lock.write():
+            if where is not None:
+                ids = [row[0] for row in self._select(ids=ids, where=where)]
+            locations = self._locations(ids)
+            self._tombstone(locations.values())
+            with self._db_lock:
+                removed = list(locations)
+                for start in range(0, len(removed), self.LOOKUP_BATCH):
+                    batch = removed[start:start + self.LOOKUP_BATCH]
+                    self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+                self._conn.commit()
+        self._wake.set()
+
+    def _append(self, vectors: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Append rows to the active segment, sealing it and starting another when full
+        """
+        locations = []
+        start = 0
+        while start < len(vectors):
+            segment = self._active_segment()
+            count = min(len(vectors) - start, self.segment_rows - segment.rows)
+            segment.reserve(segment.rows + count, self.segment_rows)
+            segment.vectors[segment.rows:segment.rows + count] = vectors[start:start + count]
+            segment.alive[segment.rows:segment.rows + count] = 1
+            segment.flush()
+
+            locations.extend((segment.id, row) for row in range(segment.rows, segment.rows + count))
+            segment.rows += count
+            segment.live += count
+            segment.sealed = segment.rows >= self.segment_rows
+            start += count
+        return locations
+
+    def _unsealed_segment(self) -> Optional[Segment]:
+        # Compaction outputs get newer ids than the active segment, so it is not simply the last one
+        return next((segment for segment in self._segments.values() if not segment.sealed), None)
+
+    def _active_segment(self) -> Segment:
+        segment = self._unsealed_segment()
+        if segment is None:
+            segment = Segment(self.directory, self._next_segment_id, self.dim, capacity=self.INITIAL_CAPACITY)
+            self._segments[segment.id] = segment
+            self._next_segment_id += 1
+        return segment
+
+    def _tombstone(self, locations) -> None:
+        for segment_id, row in locations:
+            segment = self._segments.get(segment_id)
+            if segment is not None and segment.alive[row]:
+                segment.alive[row] = 0
+                segment.live -= 1
+        for segment in self._segments.values():
+            segment.alive.flush()
+
+    def _save_segments(self) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO segments (id, rows, sealed, lists) VALUES (?, ?, ?, ?)",
+            [(segment.id, segment.rows, int(segment.sealed), segment.lists) for segment in self._segments.values()]
+        )
+
+    # Reads
+
+    def count(self) -> int:
+        with self._lock.read():
+            return sum(segment.live for segment in self._segments.values())
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Sequence[str] = ("metadatas", "documents")) -> Dict[str, Any]:
+        """
+        Stored chunks by id and/or where clause, in insertion order when paging with limit and offset
+        """
+        with self._lock.read():
+            rows = self._select(ids, where, limit, offset)
+            embeddings = self._embeddings([row[1:3] for row in rows]) if "embeddings" in include else None
+            return {
+                "ids": [row[0] for row in rows],
+                "embeddings": embeddings.tolist() if embeddings is not None else None,
+                "documents": [row[3] for row in rows] if "documents" in include else None,
+                "metadatas": [json.loads(row[4]) for row in rows] if "metadatas" in include else None
+            }
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        """
+        Nearest chunks of each query by cosine distance (1 - cosine similarity)
+        """
+        queries = normalize(np.asarray(query_embeddings, dtype=np.float32))
+        queries = queries.reshape(len(queries), -1)
+        results = {key: [[] for _ in queries] for key in ("ids", "embeddings", "documents", "metadatas", "distances")}
+
+        with self._lock.read():
+            if self.dim is None or not n_results:
+                return results
+            allowed = self._allowed_rows(where) if where is not None else None
+            nearest = self._nearest(queries, n_results, allowed)
+
+            keys = np.unique(np.concatenate(
+                [query_keys for query_keys, _ in nearest] + [np.zeros(0, dtype=np.int64)]
+            ))
+            stored = self._at(keys)
+            vectors = self._embeddings(
+                [divmod(int(key), 1 << ROW_BITS) for key in keys]
+            ) if "embeddings" in include else None
+            positions = {int(key): i for i, key in enumerate(keys)}
+
+        for query_index, (query_keys, scores) in enumerate(nearest):
+            for key, score in zip(query_keys.tolist(), scores.tolist()):
+                if key not in stored:
+                    continue
+                doc_id, document, metadata = stored[key]
+                results["ids"][query_index].append(doc_id)
+                results["documents"][query_index].append(document)
+                results["metadatas"][query_index].append(json.loads(metadata))
+                results["distances"][query_index].append(1 - score)
+                if vectors is not None:
+                    results["embeddings"][query_index].append(vectors[positions[key]].tolist())
+
+        for key in ("embeddings", "documents", "metadatas", "distances"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def _select(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+                limit: Optional[int] = None, offset: Optional[int] = None) -> List[Tuple]:
+        """
+        (id, segment, row, document, metadata JSON) of matching chunks
+        """
+        condition, params = where_to_sql(where) if where is not None else ("1", [])
+        query = f"SELECT id, segment, row, document, metadata FROM chunks WHERE ({condition})"
+
+        with self._db_lock:
+            if ids is None:
+                return self._conn.execute(
+                    f"{query} ORDER BY rowid LIMIT ? OFFSET ?",
+                    [*params, limit if limit is not None else -1, offset or 0]
+                ).fetchall()
+
+            rows = []
+            for start in range(0, len(ids), self.LOOKUP_BATCH):
+                batch = ids[start:start + self.LOOKUP_BATCH]
+                rows.extend(self._conn.execute(
+                    f"{query} AND id IN ({','.join('?' * len(batch))})", [*params, *batch]
+                ).fetchall())
+        return rows[offset or 0:(offset or 0) + limit if limit is not None else None]
+
+    def _locations(self, ids: List[str]) -> Dict[str, Tuple[int, int]]:
+        return {row[0]: (row[1], row[2]) for row in self._select(ids=ids)}
+
+    def _at(self, keys: np.ndarray) -> Dict[int, Tuple[str, str, str]]:
+        """
+        (id, document, metadata JSON) of the chunks at packed (segment, row) keys
+        """
+        stored = {}
+        segment_ids, rows = np.divmod(keys, 1 << ROW_BITS)
+        with self._db_lock:
+            for segment_id in np.unique(segment_ids).tolist():
+                segment_rows = rows[segment_ids == segment_id].tolist()
+                for start in range(0, len(segment_rows), self.LOOKUP_BATCH):
+                    batch = segment_rows[start:start + self.LOOKUP_BATCH]
+                    for row, doc_id, document, metadata in self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM chunks "
+                        f"WHERE segment = ? AND row IN ({','.join('?' * len(batch))})",
+                        [segment_id, *batch]
+                    ):
+                        stored[(segment_id << ROW_BITS) | row] = (doc_id, document, metadata)
+        return stored
+
+    def _embeddings(self, locations: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """
+        Stored (normalized) vectors at (segment, row) locations, in order
+        """
+        vectors = np.zeros((len(locations), self.dim or 0), dtype=np.float32)
+        if not len(locations):
+            return vectors
+        segment_ids = np.array([segment_id for segment_id, _ in locations])
+        rows = np.array([row for _, row in locations])
+        for segment_id in np.unique(segment_ids).tolist():
+            selected = np.flatnonzero(segment_ids == segment_id)
+            vectors[selected] = self._segments[segment_id].vectors[rows[selected]]
+        return vectors
+
+    def _allowed_rows(self, where: Dict[str, Any]) -> Dict[int, np.ndarray]:
+        """
+        Sorted rows of each segment whose chunks pass a where clause
+        """
+        condition, params = where_to_sql(where)
+        with self._db_lock:
+            locations = np.array(
+                self._conn.execute(f"SELECT segment, row FROM chunks WHERE {condition}", params).fetchall(),
+                dtype=np.int64
+            ).reshape(-1, 2)
+        return {
+            segment_id: np.sort(locations[locations[:, 0] == segment_id, 1])
+            for segment_id in np.unique(locations[:, 0]).tolist()
+        }
+
+    def _nearest(self, queries: np.ndarray, top_k: int,
+                 allowed: Optional[Dict[int, np.ndarray]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (packed keys, cosine similarities) of each query's top_k live rows, best first
+        """
+        candidate_keys: List[List[np.ndarray]] = [[] for _ in queries]
+        candidate_scores: List[List[np.ndarray]] = [[] for _ in queries]
+
+        def collect(query_indices, scores: np.ndarray, keys: np.ndarray) -> None:
+            # Keep the block's top_k of each query; keys are per block or per query
+            if scores.shape[1] > top_k:
+                keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                keys = keys[keep] if keys.ndim == 1 else np.take_along_axis(keys, keep, axis=1)
+            else:
+                keys = np.broadcast_to(keys, scores.shape)
+            for query_index, query_scores, query_keys in zip(query_indices, scores, keys):
+                candidate_scores[query_index].append(query_scores)
+                candidate_keys[query_index].append(query_keys)
+
+        all_queries = range(len(queries))
+        for segment in self._segments.values():
+            base = segment.id << ROW_BITS
+            if allowed is not None:
+                rows = allowed.get(segment.id, np.zeros(0, dtype=np.int64))
+                rows = rows[segment.alive[rows] > 0]
+                if len(rows):
+                    collect(all_queries, queries @ segment.vectors[rows].T, base | rows)
+            elif self.mode == "ivf" and segment.lists:
+                probes = min(self.nprobe, segment.lists)
+                nearest_lists = np.argpartition(-(queries @ segment.centroids.T), probes - 1, axis=1)[:, :probes]
+                for query_index, lists in enumerate(nearest_lists):
+                    rows = np.sort(np.concatenate(
+                        [segment.order[segment.offsets[i]:segment.offsets[i + 1]] for i in lists]
+                    ))
+                    rows = rows[segment.alive[rows] > 0]
+                    if len(rows):
+                        collect([query_index], (segment.vectors[rows] @ queries[query_index])[np.newaxis], base | rows)
+            else:
+                for start in range(0, segment.rows, self.SCAN_BLOCK):
+                    end = min(start + self.SCAN_BLOCK, segment.rows)
+                    scores = queries @ segment.vectors[start:end].T
+                    scores[:, segment.alive[start:end] == 0] = -np.inf
+                    collect(all_queries, scores, base | np.arange(start, end, dtype=np.int64))
+
+        nearest = []
+        for keys, scores in zip(candidate_keys, candidate_scores):
+            keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+            scores = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+            finite = np.isfinite(scores)
+            keys, scores = keys[finite], scores[finite]
+            # Ties go to the earlier row
+            order = np.lexsort((keys, -scores))[:top_k]
+            nearest.append((keys[order], scores[order]))
+        return nearest
+
+    # Background maintenance
+
+    def _maintain(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopping:
+                return
+            try:
+                while self._compact():
+                    pass
+                if self.mode == "ivf":
+                    self._build_lists()
+            except Exception:
+                self.logger.exception("Vector index maintenance failed")
+
+    def _compaction_groups(self) -> List[List[Segment]]:
+        """
+        Sealed segments to rewrite, grouped into outputs of at most segment_rows live rows
+        """
+        small = self.segment_rows // self.SMALL_SEGMENT_DIVISOR
+        with self._lock.write():
+            # An active segment that is mostly tombstones is sealed so it can be compacted
+            active = self._unsealed_segment()
+            if (active is not None and not active.sealed and active.rows >= self.INITIAL_CAPACITY
+                    and active.dead_ratio() > self.compaction_dead_ratio):
+                active.sealed = True
+                with self._db_lock:
+                    self._save_segments()
+                    self._conn.commit()
+
+            sealed = [segment for segment in self._segments.values() if segment.sealed]
+
+        dirty = [segment for segment in sealed if segment.dead_ratio() > self.compaction_dead_ratio]
+        undersized = [segment for segment in sealed if segment not in dirty and segment.live < small]
+        if not dirty and len(undersized) < 2:
+            return []
+
+        groups: List[List[Segment]] = [[]]
+        live = 0
+        for segment in sorted(dirty + undersized, key=lambda segment: segment.id):
+            if groups[-1] and live + segment.live > self.segment_rows:
+                groups.append([])
+                live = 0
+            groups[-1].append(segment)
+            live += segment.live
+        return groups
+
+    def _compact(self) -> bool:
+        """
+        Rewrite one group of segments without their tombstoned rows; returns whether there was one
+        """
+        # Rewriting a lone segment only pays off if it has tombstones to drop
+        sources = next((
+            group for group in self._compaction_groups()
+            if len(group) > 1 or group[0].dead_ratio() > self.compaction_dead_ratio
+        ), None)
+        if sources is None:
+            return False
+
+        with self._lock.write():
+            generation = self._generation
+            target_id = self._next_segment_id
+            self._next_segment_id += 1
+
+        # Sealed segments only change by tombstoning, so they are copied without holding the lock
+        copied = [(segment, np.flatnonzero(segment.alive[:segment.rows])) for segment in sources]
+        total = sum(len(rows) for _, rows in copied)
+        target = Segment(self.directory, target_id, self.dim, sealed=True, capacity=max(total, 1))
+        position = 0
+        for segment, rows in copied:
+            for start in range(0, len(rows), self.SCAN_BLOCK):
+                block = rows[start:start + self.SCAN_BLOCK]
+                target.vectors[position:position + len(block)] = segment.vectors[block]
+                position += len(block)
+        target.rows = total
+        target.flush()
+
+        with self._lock.write():
+            if generation != self._generation:
+                target.remove()
+                return True
+
+            # Rows tombstoned while copying stay dead in the new segment
+            moves = []
+            position = 0
+            for segment, rows in copied:
+                still_alive = segment.alive[rows] > 0
+                target.alive[position:position + len(rows)] = still_alive
+                moves.extend(
+                    (target_id, position + i, segment.id, int(row))
+                    for i, row in zip(np.flatnonzero(still_alive).tolist(), rows[still_alive].tolist())
+                )
+                position += len(rows)
+            target.live = len(moves)
+            target.flush()
+
+            with self._db_lock:
+                self._conn.executemany(
+                    "UPDATE chunks SET segment = ?, row = ? WHERE segment = ? AND row = ?", moves
+                )
+                self._conn.executemany("DELETE FROM segments WHERE id = ?", [(segment.id,) for segment in sources])
+                for segment in sources:
+                    del self._segments[segment.id]
+                if target.live:
+                    self._segments[target_id] = target
+                self._save_segments()
+                self._conn.commit()
+
+            for segment in sources:
+                segment.remove()
+            if not target.live:
+                target.remove()
+
+        self.logger.info(
+            f"Compacted {len(sources)} vector index segments ({sum(s.rows for s in sources)} rows) into {target.live}"
+        )
+        return True
+
+    def _build_lists(self) -> None:
+        """
+        Cluster sealed segments that have no inverted lists yet
+        """
+        with self._lock.read():
+            pending = [
+                segment for segment in self._segments.values()
+                if segment.sealed and not segment.lists and segment.rows >= self.IVF_MIN_ROWS
+            ]
+
+        for segment in pending:
+            lists = int(np.clip(np.sqrt(segment.rows), 16, 4096))
+            centroids, order, offsets = train_ivf(segment.vectors[:segment.rows], lists)
+            segment.write_ivf(centroids, order, offsets)
+
+            with self._lock.write():
+                if self._segments.get(segment.id) is not segment:
+                    # Compacted away meanwhile
+                    segment.remove()
+                    continue
+                segment.load_ivf(lists)
+                with self._db_lock:
+                    self._save_segments()
+                    self._conn.commit()
+
+    # Lifecycle
+
+    def clear(self) -> None:
+        """
+        Remove every chunk and segment
+        """
+        with self._lock.write():
+            self._generation += 1
+            with self._db_lock:
+                self._conn.execute("DELETE FROM chunks")
+                self._conn.execute("DELETE FROM segments")
+                self._conn.commit()
+            for segment in self._segments.values():
+                segment.remove()
+            self._segments = {}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Segment, row and inverted list counts
+        """
+        with self._lock.read():
+            segments = list(self._segments.values())
+        rows = sum(segment.rows for segment in segments)
+        live = sum(segment.live for segment in segments)
+        return {
+            "mode": self.mode,
+            "segments": len(segments),
+            "sealed_segments": sum(segment.sealed for segment in segments),
+            "clustered_segments": sum(bool(segment.lists) for segment in segments),
+            "rows": rows,
+            "live_rows": live,
+            "dead_rows": rows - live,
+            "directory": self.directory
+        }
+
+    def close(self) -> None:
+        """
+        Stop background maintenance, flush the mapped files, close the SQLite connection
+        and unlock the directory
+        """
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        with self._lock.write():
+            for segment in self._segments.values():
+                segment.flush()
+            with self._db_lock:
+                self._conn.close()
+            self._directory_lock.release()
+
+
+class MemmapClient:
+    """
+    Stand-in for chromadb.PersistentClient that opens MemmapCollections, one subdirectory each
+    """
+
+    # Chroma caps writes per call; the memmap index has no limit, this only sizes VectorDatabase's batches
+    max_batch_size = 5000
+
+    def __init__(self, directory: str = VECTOR_INDEX_DIRECTORY):
+        self.directory = directory
+        self._collections: Dict[str, MemmapCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> MemmapCollection:
+        """
+        Open a collection; distances are always cosine, so metadata is ignored
+        """
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemmapCollection(os.path.join(self.directory, name))
+            return self._collections[name]
+
+    get_collection = get_or_create_collection
+    create_collection = get_or_create_collection
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def close(self) -> None:
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections = {}
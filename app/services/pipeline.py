@@ -0,0 +1,169 @@
+# app/services/pipeline.py
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import INGEST_WORKERS, INGEST_BATCH_PAGES, INGEST_MAX_PENDING_BATCHES, DEDUP_ENABLED
+from app.models.schema import WebPage
+from app.services.chunker import TokenChunker
+from app.services.dedup import PageFingerprints, fingerprint_page, with_dedup_ratios
+from app.services.processor import PreparedContent, chunk_content
+from app.services.vectordb import VectorDatabase
+
+# Chunker of a worker process, handed over once by the pool initializer
+_worker_chunker: Optional[TokenChunker] = None
+
+
+def _init_worker(chunker: Optional[TokenChunker]) -> None:
+    global _worker_chunker
+    _worker_chunker = chunker
+
+
+def prepare_batch(contents: List[str], chunker: Optional[TokenChunker] = None
+                  ) -> Tuple[List[PreparedContent], Optional[List[PageFingerprints]]]:
+    """
+    Preprocess, chunk and (with DEDUP_ENABLED) fingerprint the content of a batch of pages.
+
+    In a worker process the chunker comes from the pool initializer, so the
+    tokenizer is pickled once per worker instead of once per batch.
+    """
+    chunker = chunker or _worker_chunker
+    prepared = [chunk_content(content, chunker) for content in contents]
+    if not DEDUP_ENABLED:
+        return prepared, None
+    return prepared, [fingerprint_page(content, chunks) for content, (chunks, _) in zip(contents, prepared)]
+
+
+class IngestionPipeline:
+    """
+    Indexes pages in two overlapping stages, keeping CPU-bound work off the event loop.
+
+    Preprocessing and chunking fan out over a process pool in batches of
+    batch_pages. Prepared batches are embedded and upserted in a worker
+    thread, one at a time and in order, while the pool prepares the next ones.
+    At most max_pending prepared batches wait for the embedder; beyond that
+    add_webpages stops submitting work until the embedder catches up.
+    """
+
+    def __init__(self, vector_db: VectorDatabase, workers: int = INGEST_WORKERS,
+                 batch_pages: int = INGEST_BATCH_PAGES, max_pending: int = INGEST_MAX_PENDING_BATCHES):
+        self.vector_db = vector_db
+        self.workers = max(0, workers)
+        self.batch_pages = max(1, batch_pages)
+        self.max_pending = max(1, max_pending)
+        self.logger = logging.getLogger(__name__)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # The model encodes one batch at a time anyway; concurrent crawls take turns
+        self._index_lock = asyncio.Lock()
+        self._stats = {
+            "pages": 0, "duplicate_pages": 0, "chunks": 0, "duplicate_chunks": 0,
+            "batches": 0, "prepare_seconds": 0.0, "index_seconds": 0.0
+        }
+
+    def get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """
+        Get the preprocessing pool, or None when preprocessing runs in a thread
+        """
+        if self._executor is None and self.workers:
+            # Spawned rather than forked: forking a process that has loaded torch
+            # and a Rust tokenizer can deadlock the children
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.vector_db.processor.chunker,)
+            )
+        return self._executor
+
+    async def _prepare(self, contents: List[str]) -> Tuple[List[PreparedContent], Optional[List[PageFingerprints]]]:
+        """
+        Run prepare_batch in the pool, or in a thread if there is no pool or it broke
+        """
+        start = time.perf_counter()
+        executor = self.get_executor()
+        try:
+            if executor is not None:
+                return await asyncio.get_running_loop().run_in_executor(executor, prepare_batch, contents)
+        except BrokenProcessPool:
+            # A worker died (for example killed for memory); start a fresh pool for the next batch
+            self.logger.error("Ingestion worker pool broke, preparing the batch in a thread")
+            if self._executor is executor:
+                self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+        finally:
+            self._stats["prepare_seconds"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(prepare_batch, contents, self.vector_db.processor.chunker)
+        finally:
+            self._stats["prepare_seconds"] += time.perf_counter() - start
+
+    async def add_webpages(self, webpages: List[WebPage]) -> Dict[str, Any]:
+        """
+        Preprocess, chunk, embed and index pages without blocking the event loop.
+
+        Returns how many pages and chunks were indexed and how many of them were
+        skipped as near-duplicates.
+        """
+        report = {"pages": 0, "duplicate_pages": 0, "chunks": 0, "duplicate_chunks": 0}
+        if not webpages:
+            return with_dedup_ratios(report)
+
+        batches = [webpages[i:i + self.batch_pages] for i in range(0, len(webpages), self.batch_pages)]
+        # Prepared (or in progress) batches waiting for the embedder; put blocks once it is full
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+
+        async def produce() -> None:
+            for batch in batches:
+                task = asyncio.create_task(self._prepare([webpage.content for webpage in batch]))
+                await pending.put((batch, task))
+            await pending.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+
+                batch, task = item
+                prepared, fingerprints = await task
+
+                start = time.perf_counter()
+                async with self._index_lock:
+                    counts = await asyncio.to_thread(self.vector_db.add_webpages, batch, prepared, fingerprints)
+                self._stats["index_seconds"] += time.perf_counter() - start
+                self._stats["batches"] += 1
+                for key, value in counts.items():
+                    report[key] += value
+                    self._stats[key] += value
+
+            await producer
+        finally:
+            producer.cancel()
+            # Drop batches that were prepared but will not be indexed (error or cancellation)
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item is not None:
+                    item[1].cancel()
+
+        return with_dedup_ratios(report)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pages indexed so far, near-duplicates skipped and the time spent in each stage
+        """
+        return {**with_dedup_ratios(self._stats), "workers": self.workers, "batch_pages": self.batch_pages}
+
+    def close(self) -> None:
+        """
+        Shut the preprocessing pool down
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
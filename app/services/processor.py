@@ -1,91 +1,231 @@
 # app/services/processor.py
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 from app.models.schema import WebPage
+from app.config import QUERY_EMBEDDING_CACHE_SIZE, CHUNK_STRATEGY, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
 from app.models.embedding import EmbeddingModel
+from app.services.chunker import TokenChunker
+from app.services.embedding_store import EmbeddingStore
+from app.utils.cache import LRUCache
 
+# Preprocessed chunks of a page, and their (start, end) in the original content when known
+PreparedContent = Tuple[List[str], Optional[List[Tuple[int, int]]]]
 
-class TextProcessor:
-    def __init__(self):
-        self.embedding_model = EmbeddingModel()
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+TAG_PATTERN = re.compile(r'<.*?>')
+SPECIAL_CHARACTER_PATTERN = re.compile(r'[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
 
-    def preprocess_text(self, text: str) -> str:
-        """
-        Preprocess text by removing extra whitespace, special characters, etc.
-        """
-        if not text:
-            return ""
 
-        # Convert to lowercase
-        text = text.lower()
+def preprocess_text(text: str) -> str:
+    """
+    Preprocess text by removing extra whitespace, special characters, etc.
 
-        # Remove URLs
-        text = re.sub(r'https?://\S+|www\.\S+', '', text)
+    Module-level, like chunk_text and chunk_content, so the ingestion pipeline
+    can run it in worker processes without an embedding model.
+    """
+    if not text:
+        return ""
 
-        # Remove HTML tags
-        text = re.sub(r'<.*?>', '', text)
+    # Convert to lowercase
+    text = text.lower()
 
-        # Remove special characters and digits
-        text = re.sub(r'[^\w\s]', '', text)
+    # Remove URLs
+    text = URL_PATTERN.sub('', text)
 
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+    # Remove HTML tags
+    text = TAG_PATTERN.sub('', text)
 
-        return text
+    # Remove special characters and digits
+    text = SPECIAL_CHARACTER_PATTERN.sub('', text)
+
+    # Remove extra whitespace
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
+
+    return text
 
-    def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-        """
-        Split text into overlapping chunks
-        """
-        if not text or len(text) <= chunk_size:
-            return [text] if text else []
 
-        chunks = []
-        start = 0
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """
+    Split text into overlapping chunks
+    """
+    if not text or len(text) <= chunk_size:
+        return [text] if text else []
 
-        while start < len(text):
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+
+        if end >= len(text):
+            chunks.append(text[start:])
+            break
+
+        # Try to find a space to break at
+        while end > start and text[end] != ' ':
+            end -= 1
+
+        if end == start:  # No space found, just cut at chunk_size
             end = start + chunk_size
 
-            if end >= len(text):
-                chunks.append(text[start:])
-                break
+        chunks.append(text[start:end])
+        start = end - overlap
+
+    return chunks
+
 
-            # Try to find a space to break at
-            while end > start and text[end] != ' ':
-                end -= 1
+def chunk_content(content: str, chunker: Optional[TokenChunker] = None) -> PreparedContent:
+    """
+    Split page content into preprocessed chunks ready to embed.
+
+    With a token chunker the original content is chunked first and each chunk
+    preprocessed afterwards, so offsets holds the (start, end) of every chunk
+    in the original content. Without one, the preprocessed content is split
+    by chunk_text and offsets is None.
+    """
+    if chunker is None:
+        return chunk_text(preprocess_text(content)), None
+
+    chunks = chunker.chunk(content)
+    texts = [preprocess_text(chunk.text) for chunk in chunks]
+    return texts, [(chunk.char_start, chunk.char_end) for chunk in chunks]
+
+
+class TextProcessor:
+    def __init__(self, embedding_model: Optional[EmbeddingModel] = None,
+                 embedding_store: Optional[EmbeddingStore] = None, chunk_strategy: str = CHUNK_STRATEGY):
+        self.embedding_model = embedding_model or EmbeddingModel()
+        self.embedding_store = embedding_store
+
+        # Token-aware chunking needs the model's tokenizer; the "chars" strategy uses chunk_text
+        self.chunker = None
+        if chunk_strategy == "tokens":
+            self.chunker = TokenChunker(
+                self.embedding_model.get_tokenizer(),
+                CHUNK_MAX_TOKENS or self.embedding_model.get_max_tokens(),
+                CHUNK_OVERLAP_TOKENS
+            )
+
+        # Query embeddings keyed on the preprocessed query; the processor's model never changes
+        self.query_cache = LRUCache(max_size=QUERY_EMBEDDING_CACHE_SIZE)
 
-            if end == start:  # No space found, just cut at chunk_size
-                end = start + chunk_size
+    def preprocess_text(self, text: str) -> str:
+        """
+        Preprocess text by removing extra whitespace, special characters, etc.
+        """
+        return preprocess_text(text)
 
-            chunks.append(text[start:end])
-            start = end - overlap
+    def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+        """
+        Split text into overlapping chunks
+        """
+        return chunk_text(text, chunk_size, overlap)
 
-        return chunks
+    def chunk_content(self, content: str) -> PreparedContent:
+        """
+        Split page content into preprocessed chunks ready to embed
+        """
+        return chunk_content(content, self.chunker)
 
     def process_webpage(self, webpage: WebPage) -> Dict[str, Any]:
         """
         Process a webpage by chunking content and generating embeddings
         """
-        processed_text = self.preprocess_text(webpage.content)
-        chunks = self.chunk_text(processed_text)
+        return self.process_webpages([webpage])[0]
+
+    def process_webpages(self, webpages: List[WebPage],
+                         prepared: Optional[List[PreparedContent]] = None) -> List[Dict[str, Any]]:
+        """
+        Process several webpages, embedding the chunks of all pages in one batched pass.
+
+        prepared, if given, holds the chunk_content result of each page, already
+        computed elsewhere (see IngestionPipeline); otherwise pages are chunked here.
+        """
+        if prepared is None:
+            prepared = [self.chunk_content(webpage.content) for webpage in webpages]
+        page_chunks = prepared
+
+        # Generate embeddings for every chunk at once, then split them back per page
+        all_chunks = [chunk for chunks, _ in page_chunks for chunk in chunks]
+        all_embeddings = self.embed_chunks(all_chunks)
+
+        processed = []
+        offset = 0
+        for webpage, (chunks, offsets) in zip(webpages, page_chunks):
+            processed.append({
+                "url": str(webpage.url),
+                "title": webpage.title,
+                "chunks": chunks,
+                "offsets": offsets,
+                "embeddings": all_embeddings[offset:offset + len(chunks)],
+                "metadata": webpage.metadata
+            })
+            offset += len(chunks)
+
+        return processed
+
+    def embed_chunks(self, chunks: List[str]) -> np.ndarray:
+        """
+        Embed chunks, reusing stored embeddings and only encoding text the store has not seen
+        """
+        if self.embedding_store is None:
+            return self.embedding_model.batch_encode(chunks)
 
-        # Generate embeddings for each chunk
-        embeddings = [self.embedding_model.encode(chunk) for chunk in chunks]
+        embeddings, missing = self.embedding_store.get_many(chunks)
+        if missing:
+            missing_chunks = [chunks[i] for i in missing]
+            encoded = self.embedding_model.batch_encode(missing_chunks)
+            embeddings[missing] = encoded
+            self.embedding_store.put_many(missing_chunks, encoded)
 
-        return {
-            "url": str(webpage.url),
-            "title": webpage.title,
-            "chunks": chunks,
-            "embeddings": embeddings,
-            "metadata": webpage.metadata
-        }
+        return embeddings
 
     def process_query(self, query: str) -> np.ndarray:
         """
-        Process a search query and generate embedding
+        Process a search query and generate embedding.
+
+        Embeddings are cached as read-only float32 vectors, so repeated
+        queries skip the model.
         """
         processed_query = self.preprocess_text(query)
-        query_embedding = self.embedding_model.encode(processed_query)
 
-        return query_embedding
\ No newline at end of file
+        query_embedding = self.query_cache.get(processed_query)
+        if query_embedding is None:
+            query_embedding = np.asarray(self.embedding_model.encode(processed_query), dtype=np.float32)
+            query_embedding.flags.writeable = False
+            self.query_cache.set(processed_query, query_embedding)
+
+        return query_embedding
+
+    def process_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed several search queries, encoding the ones not in the cache in one batched pass.
+
+        Returns a float32 matrix with one row per query.
+        """
+        keys = [self.preprocess_text(query) for query in queries]
+        embeddings = np.zeros((len(queries), self.embedding_model.get_dimension()), dtype=np.float32)
+
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.query_cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                embeddings[i] = cached
+
+        if missing:
+            # Duplicate queries within the batch are encoded once
+            texts = list(dict.fromkeys(keys[i] for i in missing))
+            encoded = dict(zip(texts, self.embedding_model.batch_encode(texts)))
+            for i in missing:
+                embeddings[i] = encoded[keys[i]]
+
+            for text, embedding in encoded.items():
+                embedding = embedding.copy()
+                embedding.flags.writeable = False
+                self.query_cache.set(text, embedding)
+
+        return embeddings
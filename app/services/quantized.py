@@ -0,0 +1,301 @@
+# app/services/quantized.py
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from app.config import VECTOR_QUANTIZATION, QUANTIZED_STORE_DIRECTORY
+from app.utils.locks import DirectoryLock
+
+# Bytes per component of each code type
+CODE_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Rows scaled to unit length, so dot products are cosine similarities; zero rows stay zero
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (codes, scales) of normalized vectors; a row is approximately codes * scale.
+
+    float16 codes need no scale (it is 1). int8 codes use a per-vector scale
+    so that the largest component maps to 127.
+    """
+    vectors = normalize(vectors)
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+    peaks = np.abs(vectors).max(axis=1) if len(vectors) else np.zeros(0, dtype=np.float32)
+    scales = np.where(peaks > 0, peaks / 127, 1).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def rerank(query_embeddings: np.ndarray, candidates: List[List[str]], stored_ids: Sequence[str],
+           stored_embeddings: Sequence[Sequence[float]], top_k: int) -> List[List[Tuple[str, float]]]:
+    """
+    Exact cosine re-ranking of each query's candidates against their float32 embeddings.
+
+    Returns (id, cosine similarity) of the top_k candidates of each query, best first.
+    Candidates missing from stored_ids are skipped.
+    """
+    rows = {doc_id: i for i, doc_id in enumerate(stored_ids)}
+    exact = normalize(np.asarray(stored_embeddings, dtype=np.float32).reshape(len(stored_ids), -1))
+    queries = normalize(query_embeddings)
+
+    ranked = []
+    for query, query_candidates in zip(queries, candidates):
+        present = [doc_id for doc_id in query_candidates if doc_id in rows]
+        if not present:
+            ranked.append([])
+            continue
+        scores = exact[[rows[doc_id] for doc_id in present]] @ query
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        ranked.append([(present[i], float(scores[i])) for i in order])
+
+    return ranked
+
+
+class QuantizedVectorStore:
+    """
+    Compact copy of the collection's chunk embeddings for approximate search.
+
+    Normalized embeddings are stored as float16, or as int8 with a per-vector
+    scale, in memory-mapped files: 2x or about 4x smaller than float32. A
+    SQLite index maps chunk ids to rows; rows of deleted chunks are reused.
+    search scans the codes in blocks with one matrix product per block and
+    returns candidates for an exact re-rank (see rerank).
+
+    Like the embedding store, the directory is locked while the store is
+    open, so a second process (or store) opening it raises RuntimeError.
+    """
+
+    INITIAL_CAPACITY = 1024
+    # Rows converted to float32 at a time while scanning; small enough to stay in cache
+    SCAN_BLOCK = 4096
+    # SQLite limits the number of bound parameters per statement
+    LOOKUP_BATCH = 500
+
+    def __init__(self, dim: int, dtype: str = VECTOR_QUANTIZATION, directory: str = QUANTIZED_STORE_DIRECTORY):
+        if dtype not in CODE_DTYPES:
+            raise ValueError(f"Unsupported quantization {dtype!r}; expected one of {', '.join(CODE_DTYPES)}")
+
+        self.dim = dim
+        self.dtype = dtype
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Taken before the files are checked, as a mismatched store is wiped below
+        self._directory_lock = DirectoryLock(directory)
+        self._directory_lock.acquire()
+        self.codes_path = os.path.join(directory, f"codes.{dtype}")
+        self.scales_path = os.path.join(directory, "scales.f32")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, f"index.{dtype}.sqlite3"), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rows (id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        stored_dim = self._conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if (stored_dim is not None and int(stored_dim[0]) != dim) or not os.path.exists(self.codes_path):
+            # Rows written for another model, or without their codes, cannot be reused
+            self._conn.execute("DELETE FROM rows")
+            for path in (self.codes_path, self.scales_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+        self._conn.commit()
+
+        self._codes = None
+        self._scales = None
+        self._capacity = 0
+        if os.path.exists(self.codes_path):
+            self._map(os.path.getsize(self.codes_path) // (dim * np.dtype(CODE_DTYPES[dtype]).itemsize))
+
+        # Row -> chunk id and liveness, kept in memory for scans
+        self._ids: List[Any] = [None] * self._capacity
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._rows: Dict[str, int] = {}
+        for doc_id, row in self._conn.execute("SELECT id, row FROM rows"):
+            self._ids[row] = doc_id
+            self._alive[row] = True
+            self._rows[doc_id] = row
+        self._size = max(self._rows.values()) + 1 if self._rows else 0
+        self._free = [row for row in range(self._size) if not self._alive[row]]
+
+    def _map(self, capacity: int) -> None:
+        """
+        (Re)map the code and scale files with room for capacity rows, growing them if needed
+        """
+        itemsize = np.dtype(CODE_DTYPES[self.dtype]).itemsize
+        for path, row_bytes in ((self.codes_path, self.dim * itemsize), (self.scales_path, 4)):
+            with open(path, "ab") as f:
+                f.truncate(max(capacity * row_bytes, os.path.getsize(path)))
+
+        if self._codes is not None:
+            self._codes.flush()
+            self._scales.flush()
+
+        self._capacity = capacity
+        if capacity:
+            self._codes = np.memmap(self.codes_path, dtype=CODE_DTYPES[self.dtype], mode="r+",
+                                    shape=(capacity, self.dim))
+            self._scales = np.memmap(self.scales_path, dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(self._capacity, self.INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+        self._map(capacity)
+        self._ids.extend([None] * (capacity - len(self._ids)))
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray) -> None:
+        """
+        Store or replace the embeddings of chunks
+        """
+        if not ids:
+            return
+
+        # Later copies of the same id win
+        latest = {doc_id: i for i, doc_id in enumerate(ids)}
+        ids = list(latest)
+        codes, scales = quantize(np.asarray(embeddings, dtype=np.float32)[list(latest.values())], self.dtype)
+
+        with self._lock:
+            rows = []
+            new = []
+            for doc_id in ids:
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = self._free.pop() if self._free else self._size
+                    self._size = max(self._size, row + 1)
+                    new.append((doc_id, row))
+                rows.append(row)
+
+            self._ensure_capacity(self._size)
+            self._codes[rows] = codes
+            self._scales[rows] = scales
+            # Rows hit the files before the index references them
+            self._codes.flush()
+            self._scales.flush()
+
+            for doc_id, row in new:
+                self._rows[doc_id] = row
+                self._ids[row] = doc_id
+            self._alive[[row for _, row in new]] = True
+
+            self._conn.executemany("INSERT INTO rows (id, row) VALUES (?, ?)", new)
+            self._conn.commit()
+
+    def delete(self, ids: List[str]) -> None:
+        """
+        Drop chunks; their rows are reused by later upserts
+        """
+        with self._lock:
+            removed = [(doc_id, self._rows.pop(doc_id)) for doc_id in ids if doc_id in self._rows]
+            if not removed:
+                return
+            for doc_id, row in removed:
+                self._ids[row] = None
+                self._alive[row] = False
+                self._free.append(row)
+
+            for start in range(0, len(removed), self.LOOKUP_BATCH):
+                batch = [doc_id for doc_id, _ in removed[start:start + self.LOOKUP_BATCH]]
+                self._conn.execute(f"DELETE FROM rows WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._conn.commit()
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> List[List[str]]:
+        """
+        Ids of the top_k chunks by approximate cosine similarity for each query, best first
+        """
+        with self._lock:
+            # The arrays are replaced, not resized in place, when the files grow, so a scan can use these
+            size, codes, scales, alive, ids = self._size, self._codes, self._scales, self._alive, self._ids
+
+        queries = normalize(np.atleast_2d(query_embeddings))
+        if not size or not top_k:
+            return [[] for _ in queries]
+
+        # Best top_k of each block for every query, merged once at the end
+        block_scores, block_rows = [], []
+        for start in range(0, size, self.SCAN_BLOCK):
+            end = min(start + self.SCAN_BLOCK, size)
+            scores = queries @ codes[start:end].astype(np.float32).T
+            scores *= scales[start:end]
+            scores[:, ~alive[start:end]] = -np.inf
+
+            rows = np.arange(start, end)
+            if end - start > top_k:
+                keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = rows[keep]
+            else:
+                rows = np.broadcast_to(rows, scores.shape)
+            block_scores.append(scores)
+            block_rows.append(rows)
+
+        scores = np.concatenate(block_scores, axis=1)
+        rows = np.concatenate(block_rows, axis=1)
+        if scores.shape[1] > top_k:
+            keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            scores = np.take_along_axis(scores, keep, axis=1)
+            rows = np.take_along_axis(rows, keep, axis=1)
+
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            order = np.argsort(-query_scores, kind="stable")
+            results.append([
+                ids[query_rows[i]] for i in order
+                if np.isfinite(query_scores[i]) and ids[query_rows[i]] is not None
+            ])
+        return results
+
+    def clear(self) -> None:
+        """
+        Drop every stored embedding
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM rows")
+            self._conn.commit()
+            self._rows = {}
+            self._ids = [None] * self._capacity
+            self._alive = np.zeros(self._capacity, dtype=bool)
+            self._size = 0
+            self._free = []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Size of the store, and of the same vectors as float32
+        """
+        code_bytes = self._size * (self.dim * np.dtype(CODE_DTYPES[self.dtype]).itemsize + 4)
+        return {
+            "dtype": self.dtype,
+            "vectors": len(self._rows),
+            "bytes": code_bytes,
+            "float32_bytes": self._size * self.dim * 4,
+            "directory": self.directory
+        }
+
+    def close(self) -> None:
+        """
+        Flush the memory-mapped files, close the index and unlock the directory
+        """
+        with self._lock:
+            if self._codes is not None:
+                self._codes.flush()
+                self._scales.flush()
+            self._conn.close()
+            self._directory_lock.release()
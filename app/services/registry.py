@@ -0,0 +1,145 @@
+# app/services/registry.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+from app.config import PAGE_REGISTRY_PATH
+
+
+@dataclass
+class PageRecord:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    chunk_ids: List[str] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)
+    indexed_at: float = 0.0
+
+
+class PageRegistry:
+    """
+    Persistent per-URL record of what has been fetched and indexed, used to
+    send conditional requests on re-crawls and to replace a page's chunks
+    """
+
+    def __init__(self, path: str = PAGE_REGISTRY_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                chunk_ids TEXT NOT NULL DEFAULT '[]',
+                links TEXT NOT NULL DEFAULT '[]',
+                indexed_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[PageRecord]:
+        """
+        Get the record for a URL, or None if it has never been indexed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, content_hash, chunk_ids, links, indexed_at "
+                "FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return PageRecord(
+            url=row[0],
+            etag=row[1],
+            last_modified=row[2],
+            content_hash=row[3],
+            chunk_ids=json.loads(row[4]),
+            links=json.loads(row[5]),
+            indexed_at=row[6]
+        )
+
+    def upsert(self, record: PageRecord) -> None:
+        """
+        Insert or replace the record for a URL
+        """
+        self.upsert_many([record])
+
+    def upsert_many(self, records: List[PageRecord]) -> None:
+        """
+        Insert or replace several records in one transaction
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages "
+                "(url, etag, last_modified, content_hash, chunk_ids, links, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        record.url,
+                        record.etag,
+                        record.last_modified,
+                        record.content_hash,
+                        json.dumps(record.chunk_ids),
+                        json.dumps(record.links),
+                        record.indexed_at or time.time()
+                    )
+                    for record in records
+                ]
+            )
+            self._conn.commit()
+
+    def touch(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """
+        Refresh the cache validators of an unchanged page
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                "WHERE url = ?",
+                (etag, last_modified, url)
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        """
+        Number of URLs with a record
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def count_indexed(self) -> int:
+        """
+        Number of URLs with at least one chunk in the index
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages WHERE chunk_ids != '[]'").fetchone()[0]
+
+    def clear(self) -> None:
+        """
+        Forget every record, so the next crawl refetches and re-indexes all pages
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """
+        Close the underlying database connection
+        """
+        with self._lock:
+            self._conn.close()
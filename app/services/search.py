@@ -1,61 +1,128 @@
 # app/services/search.py
-from typing import List, Dict, Any
+from functools import partial
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+import math
 import time
 import asyncio
+import numpy as np
 from app.services.vectordb import VectorDatabase
 from app.services.processor import TextProcessor
 from app.services.llm import LLMService
-from app.models.schema import SearchResult, SearchResponse, SearchQuery
-from app.config import TOP_K_RESULTS, SIMILARITY_THRESHOLD
+from app.utils.snippets import SnippetMatcher
+from app.models.schema import SearchResult, SearchResponse, SearchQuery, BatchSearchQuery, BatchSearchResponse
+from app.config import (
+    TOP_K_RESULTS, SIMILARITY_THRESHOLD, SEARCH_ENHANCE_TIMEOUT, SEARCH_EMBEDDING_TIMEOUT,
+    SEARCH_RETRIEVAL_TIMEOUT, SEARCH_UNDERSTANDING_TIMEOUT, RRF_K, HYBRID_CANDIDATE_MULTIPLIER,
+    SEARCH_BATCH_MAX_QUERIES, SEARCH_MAX_CANDIDATES
+)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists by summing 1 / (k + rank) for each chunk id.
+
+    similarity_score of the fused results is the fused score scaled to [0, 1],
+    where 1 means ranked first by every list.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            fused.setdefault(result["id"], result)
+            scores[result["id"]] = scores.get(result["id"], 0.0) + 1.0 / (k + rank)
+
+    best_possible = len(result_lists) / (k + 1)
+    ranked_ids = sorted(scores, key=scores.get, reverse=True)
+    return [
+        {**fused[doc_id], "similarity_score": scores[doc_id] / best_possible}
+        for doc_id in ranked_ids
+    ]
+
+
+def collapse_by_url(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Keep the best ranked chunk of each page, in rank order, with chunk_count
+    set to the number of the page's chunks among the results
+    """
+    collapsed: Dict[str, Dict[str, Any]] = {}
+    for result in results:
+        url = result["metadata"]["url"]
+        if url in collapsed:
+            collapsed[url]["chunk_count"] += 1
+        else:
+            collapsed[url] = {**result, "chunk_count": 1}
+    return list(collapsed.values())
+
+
+def maximal_marginal_relevance(results: List[Dict[str, Any]], top_k: int, diversity: float) -> List[Dict[str, Any]]:
+    """
+    Greedily pick top_k results, each maximizing
+    (1 - diversity) * similarity_score - diversity * (highest cosine similarity to a result already picked).
+
+    Results must carry their "embedding". Similarities between candidates are
+    computed with one matrix product, and each pick updates the closest
+    similarity of every remaining candidate in one vectorized step.
+    """
+    if len(results) <= 1 or diversity <= 0:
+        return results[:top_k]
+
+    embeddings = np.stack([result["embedding"] for result in results]).astype(np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.where(norms > 0, norms, 1)
+    similarity = embeddings @ embeddings.T
+    relevance = np.array([result["similarity_score"] for result in results], dtype=np.float32)
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    closest = similarity[first].copy()
+    available = np.ones(len(results), dtype=bool)
+    available[first] = False
+
+    while len(selected) < min(top_k, len(results)):
+        scores = np.where(available, (1 - diversity) * relevance - diversity * closest, -np.inf)
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(closest, similarity[pick], out=closest)
+
+    return [results[i] for i in selected]
 
 
 class SearchService:
-    def __init__(self):
-        self.vector_db = VectorDatabase()
-        self.processor = TextProcessor()
-        self.llm_service = LLMService()
+    def __init__(self, vector_db: Optional[VectorDatabase] = None, processor: Optional[TextProcessor] = None,
+                 llm_service: Optional[LLMService] = None):
+        self.vector_db = vector_db or VectorDatabase(processor=processor)
+        self.processor = processor or self.vector_db.processor
+        self.llm_service = llm_service or LLMService()
 
     async def search(self, query: SearchQuery) -> SearchResponse:
         """
-        Perform a semantic search using the query
+        Perform a search using the query; query.mode selects dense, lexical or hybrid retrieval
         """
         start_time = time.time()
 
         # Process the query
         original_query = query.query
+        degraded_stages: List[str] = []
 
-        # Use LLM to enhance the query
-        enhanced_query = await self.llm_service.enhance_query(original_query)
-
-        # Generate query embedding
-        query_embedding = self.processor.process_query(enhanced_query)
-
-        # Search the vector database
-        raw_results = self.vector_db.search(query_embedding, top_k=query.top_k or TOP_K_RESULTS)
-
-        # Filter results by similarity threshold
-        filtered_results = [
-            result for result in raw_results
-            if result["similarity_score"] >= SIMILARITY_THRESHOLD
-        ]
-
-        # Generate semantic understanding
-        semantic_understanding = await self.llm_service.generate_semantic_understanding(original_query)
+        # Semantic understanding only needs the original query, so it runs alongside the rest of the pipeline
+        understanding_task = asyncio.create_task(
+            self.llm_service.generate_semantic_understanding(original_query)
+        )
 
-        # Format results
-        search_results = []
-        for result in filtered_results:
-            # Extract a snippet from the document
-            snippet = self._extract_snippet(result["document"], enhanced_query)
+        try:
+            enhanced_query, results = await self._retrieve(query, degraded_stages)
 
-            search_results.append(
-                SearchResult(
-                    url=result["metadata"]["url"],
-                    title=result["metadata"]["title"],
-                    snippet=snippet,
-                    relevance_score=result["similarity_score"]
-                )
+            # The understanding budget started with the search, so only wait for what is left of it
+            remaining = SEARCH_UNDERSTANDING_TIMEOUT - (time.time() - start_time)
+            semantic_understanding = await self._within_budget(
+                "semantic_understanding", understanding_task, max(remaining, 0), "", degraded_stages
             )
+        except BaseException:
+            understanding_task.cancel()
+            raise
+
+        search_results = self._format_results(results, enhanced_query, query)
 
         execution_time = time.time() - start_time
 
@@ -64,57 +131,427 @@ class SearchService:
             query=original_query,
             semantic_understanding=semantic_understanding,
             total_results=len(search_results),
-            execution_time=execution_time
+            execution_time=execution_time,
+            degraded_stages=degraded_stages
         )
 
-    def _extract_snippet(self, document: str, query: str, max_length: int = 200) -> str:
+    async def search_stream(self, query: SearchQuery) -> AsyncIterator[Dict[str, Any]]:
         """
-        Extract a relevant snippet from the document based on the query
+        Perform a search, yielding events as each part is ready instead of one response at the end:
+
+        - "results" as soon as retrieval finishes, with the same fields as SearchResponse except semantic_understanding
+        - "understanding" once per token of the semantic understanding as the LLM generates it
+        - "done" with the total execution time and the degraded stages of the whole search
+
+        The understanding is generated from the start, alongside retrieval; tokens produced
+        before the results are sent are buffered. It has no latency budget here, since the
+        user already has the results while it streams. If it fails, the stream still ends
+        with "done", whose degraded_stages include "semantic_understanding".
+        """
+        start_time = time.time()
+        degraded_stages: List[str] = []
+
+        tokens: asyncio.Queue = asyncio.Queue()
+        understanding_failed = False
+
+        async def produce_understanding() -> None:
+            nonlocal understanding_failed
+            try:
+                async for token in self.llm_service.stream_semantic_understanding(query.query):
+                    await tokens.put(token)
+            except Exception:
+                # The results are already out; the failure is reported on the done event
+                understanding_failed = True
+            finally:
+                tokens.put_nowait(None)
+
+        understanding_task = asyncio.create_task(produce_understanding())
+
+        try:
+            enhanced_query, results = await self._retrieve(query, degraded_stages)
+            search_results = self._format_results(results, enhanced_query, query)
+
+            yield {
+                "event": "results",
+                "data": {
+                    "results": search_results,
+                    "query": query.query,
+                    "total_results": len(search_results),
+                    "execution_time": time.time() - start_time,
+                    "degraded_stages": list(degraded_stages)
+                }
+            }
+
+            while (token := await tokens.get()) is not None:
+                yield {"event": "understanding", "data": {"token": token}}
+
+            if understanding_failed:
+                degraded_stages.append("semantic_understanding")
+            yield {
+                "event": "done",
+                "data": {"execution_time": time.time() - start_time, "degraded_stages": degraded_stages}
+            }
+        finally:
+            # Also runs when the client disconnects mid-stream
+            understanding_task.cancel()
+
+    async def _retrieve(self, query: SearchQuery, degraded_stages: List[str]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Run the retrieval stages for the query mode, each within its budget.
+
+        Returns the enhanced query (the original one if enhancement was skipped) and the ranked results.
+        """
+        original_query = query.query
+        use_dense = query.mode in ("dense", "hybrid")
+        candidates = self._candidates(query)
+        # Maximal marginal relevance compares the candidates' embeddings with each other
+        include_embeddings = query.diversity > 0
+
+        # Keyword search matches the exact terms the user typed, so it can start right away
+        lexical_task = None
+        if query.mode in ("lexical", "hybrid") and self._lexical_available(degraded_stages):
+            lexical_task = asyncio.create_task(
+                asyncio.to_thread(
+                    self._fetch_pages, query, candidates, partial(
+                        self.vector_db.lexical_search, original_query,
+                        include_embeddings=include_embeddings, filters=query.filters
+                    )
+                )
+            )
+
+        try:
+            enhanced_query = original_query
+            dense_results = []
+            if use_dense:
+                # Use LLM to enhance the query, falling back to the raw query
+                enhanced_query = await self._within_budget(
+                    "query_enhancement", self.llm_service.enhance_query(original_query),
+                    SEARCH_ENHANCE_TIMEOUT, original_query, degraded_stages
+                )
+
+                # Generate query embedding off the event loop
+                query_embedding = await self._within_budget(
+                    "embedding", asyncio.to_thread(self.processor.process_query, enhanced_query),
+                    SEARCH_EMBEDDING_TIMEOUT, None, degraded_stages
+                )
+
+                # Search the vector database
+                if query_embedding is not None:
+                    dense_results = await self._within_budget(
+                        "retrieval",
+                        asyncio.to_thread(
+                            self._fetch_pages, query, candidates, partial(
+                                self.vector_db.search, query_embedding,
+                                include_embeddings=include_embeddings, filters=query.filters
+                            ), SIMILARITY_THRESHOLD
+                        ),
+                        SEARCH_RETRIEVAL_TIMEOUT, [], degraded_stages
+                    )
+
+            lexical_results = []
+            if lexical_task is not None:
+                lexical_results = await self._within_budget(
+                    "lexical_retrieval", lexical_task, SEARCH_RETRIEVAL_TIMEOUT, [], degraded_stages
+                )
+        except BaseException:
+            if lexical_task is not None:
+                lexical_task.cancel()
+            raise
+
+        return enhanced_query, self._rank_results(query, dense_results, lexical_results)
+
+    async def search_batch(self, batch: BatchSearchQuery) -> BatchSearchResponse:
         """
-        if not document:
-            return ""
+        Run many queries together: one batched encode for all dense queries and
+        one multi-embedding vector query per distinct set of filters, instead
+        of one of each per query.
 
-        # Simple approach: find the first occurrence of any query term
-        query_terms = query.lower().split()
+        LLM enhancement and semantic understanding are opt-in and run
+        concurrently across queries, each within its usual budget. The batched
+        encode and the dense retrieval are each one stage with the budget of
+        the same stage in search(); every keyword search has its own.
+        """
+        if len(batch.queries) > SEARCH_BATCH_MAX_QUERIES:
+            raise ValueError(f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch")
 
-        # Find the position of the first query term in the document
-        positions = []
-        for term in query_terms:
-            if len(term) < 3:  # Skip very short terms
-                continue
+        start_time = time.time()
+        queries = batch.queries
+        degraded = [[] for _ in queries]
 
-            pos = document.lower().find(term)
-            if pos != -1:
-                positions.append(pos)
+        understanding_task = None
+        if batch.semantic_understanding:
+            understanding_task = asyncio.gather(*(
+                self._within_budget(
+                    "semantic_understanding", self.llm_service.generate_semantic_understanding(query.query),
+                    SEARCH_UNDERSTANDING_TIMEOUT, "", degraded[i]
+                )
+                for i, query in enumerate(queries)
+            ))
 
-        if not positions:
-            # If no terms found, return the beginning of the document
-            return document[:max_length] + "..."
+        # Keyword searches need no embedding, so they start right away
+        lexical_indices = [
+            i for i, query in enumerate(queries)
+            if query.mode in ("lexical", "hybrid") and self._lexical_available(degraded[i])
+        ]
+        lexical_task = asyncio.gather(*(
+            self._within_budget(
+                "lexical_retrieval",
+                asyncio.to_thread(
+                    self._fetch_pages, queries[i], self._candidates(queries[i]), partial(
+                        self.vector_db.lexical_search, queries[i].query,
+                        include_embeddings=queries[i].diversity > 0, filters=queries[i].filters
+                    )
+                ),
+                SEARCH_RETRIEVAL_TIMEOUT, [], degraded[i]
+            )
+            for i in lexical_indices
+        ))
+
+        try:
 
-        # Start the snippet from the earliest position found
-        start_pos = min(positions)
+            enhanced_queries = [query.query for query in queries]
+            dense_indices = [i for i, query in enumerate(queries) if query.mode in ("dense", "hybrid")]
+            if batch.enhance and dense_indices:
+                enhanced = await asyncio.gather(*(
+                    self._within_budget(
+                        "query_enhancement", self.llm_service.enhance_query(queries[i].query),
+                        SEARCH_ENHANCE_TIMEOUT, queries[i].query, degraded[i]
+                    )
+                    for i in dense_indices
+                ))
+                for i, enhanced_query in zip(dense_indices, enhanced):
+                    enhanced_queries[i] = enhanced_query
+
+            # One forward pass for every dense query in the batch, and one collection query per distinct filter
+            dense_results = [[] for _ in queries]
+            embeddings = None
+            if dense_indices:
+                embeddings = await self._within_batch_budget(
+                    "embedding",
+                    asyncio.to_thread(self.processor.process_queries, [enhanced_queries[i] for i in dense_indices]),
+                    SEARCH_EMBEDDING_TIMEOUT, None, [degraded[i] for i in dense_indices]
+                )
 
-        # Try to start at the beginning of a sentence
-        sentence_start = document.rfind('. ', 0, start_pos)
-        if sentence_start != -1 and start_pos - sentence_start < 100:
-            start_pos = sentence_start + 2
+            if embeddings is not None:
+                # Queries whose dense results are in; on timeout the others are marked degraded
+                retrieved = set()
+
+                async def retrieve_dense() -> None:
+                    groups: Dict[str, List[int]] = {}
+                    for row, i in enumerate(dense_indices):
+                        filters = queries[i].filters
+                        groups.setdefault(filters.model_dump_json() if filters is not None else "", []).append(row)
+
+                    for rows in groups.values():
+                        indices = [dense_indices[row] for row in rows]
+                        results = await asyncio.to_thread(
+                            self.vector_db.search_many, embeddings[rows],
+                            max(self._candidates(queries[i]) for i in indices),
+                            any(queries[i].diversity > 0 for i in indices),
+                            queries[indices[0]].filters
+                        )
+                        for row, i, query_results in zip(rows, indices, results):
+                            candidates = self._candidates(queries[i])
+                            dense_results[i] = query_results[:candidates]
+                            # Hits clustered on a few pages: fetch more for this query alone
+                            if (candidates < SEARCH_MAX_CANDIDATES and self._short_of_pages(
+                                    queries[i], dense_results[i], candidates, SIMILARITY_THRESHOLD)):
+                                dense_results[i] = await asyncio.to_thread(
+                                    self._fetch_pages, queries[i], min(candidates * 2, SEARCH_MAX_CANDIDATES), partial(
+                                        self.vector_db.search, embeddings[row],
+                                        include_embeddings=queries[i].diversity > 0, filters=queries[i].filters
+                                    ), SIMILARITY_THRESHOLD
+                                )
+                            retrieved.add(i)
+
+                timed_out = []
+                await self._within_budget("retrieval", retrieve_dense(), SEARCH_RETRIEVAL_TIMEOUT, None, timed_out)
+                for i in dense_indices:
+                    if i not in retrieved:
+                        degraded[i].extend(timed_out)
+
+            lexical_results = [[] for _ in queries]
+            for i, query_results in zip(lexical_indices, await lexical_task):
+                lexical_results[i] = query_results
+
+            understandings = await understanding_task if understanding_task is not None else [""] * len(queries)
+        except BaseException:
+            lexical_task.cancel()
+            if understanding_task is not None:
+                understanding_task.cancel()
+            raise
+
+        execution_time = time.time() - start_time
+        responses = []
+        for i, query in enumerate(queries):
+            search_results = self._format_results(
+                self._rank_results(query, dense_results[i], lexical_results[i]), enhanced_queries[i], query
+            )
+            responses.append(SearchResponse(
+                results=search_results,
+                query=query.query,
+                semantic_understanding=understandings[i],
+                total_results=len(search_results),
+                execution_time=execution_time,
+                degraded_stages=degraded[i]
+            ))
 
-        # Ensure we don't start beyond the document length
-        if start_pos >= len(document):
-            start_pos = 0
+        return BatchSearchResponse(responses=responses, total_queries=len(responses), execution_time=execution_time)
 
-        # Extract the snippet
-        end_pos = start_pos + max_length
-        if end_pos >= len(document):
-            snippet = document[start_pos:]
+    def _lexical_available(self, degraded_stages: List[str]) -> bool:
+        """
+        Whether the keyword index is built; until it is, keyword retrieval is skipped as degraded
+        """
+        if self.vector_db.indexes_ready.is_set():
+            return True
+        degraded_stages.append("lexical_index")
+        return False
+
+    def _candidates(self, query: SearchQuery) -> int:
+        """
+        Results to fetch from each retriever.
+
+        Collapsing by page needs about a page's worth of chunks per result, as
+        a page's chunks tend to rank together (a first guess that _fetch_pages
+        grows when needed); MMR needs alternatives to choose from; fusion needs
+        extra candidates from both retrievers.
+        """
+        top_k = query.top_k or TOP_K_RESULTS
+        candidates = top_k
+        if query.collapse:
+            candidates = math.ceil(top_k * self.vector_db.chunks_per_page)
+        if query.diversity > 0:
+            candidates *= 2
+        if query.mode == "hybrid":
+            candidates *= HYBRID_CANDIDATE_MULTIPLIER
+        return max(top_k, min(candidates, SEARCH_MAX_CANDIDATES))
+
+    def _short_of_pages(self, query: SearchQuery, results: List[Dict[str, Any]], fetched: int,
+                        min_score: Optional[float] = None) -> bool:
+        """
+        Whether collapsing results, fetched as the best `fetched` hits, leaves
+        fewer than top_k pages although more hits could still qualify: the
+        store returned all `fetched` and (for dense results) the last one
+        still scores at least min_score
+        """
+        if not query.collapse or len(results) < fetched or not results:
+            return False
+        if min_score is not None and results[-1]["similarity_score"] < min_score:
+            return False
+        pages = {result["metadata"]["url"] for result in results
+                 if min_score is None or result["similarity_score"] >= min_score}
+        return len(pages) < (query.top_k or TOP_K_RESULTS)
+
+    def _fetch_pages(self, query: SearchQuery, candidates: int, fetch: Callable[[int], List[Dict[str, Any]]],
+                     min_score: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        fetch(n) with n starting at candidates and doubling, up to
+        SEARCH_MAX_CANDIDATES, while the results are short of top_k distinct
+        pages (see _short_of_pages).
+
+        _candidates sizes n from the average chunks per page, which falls
+        short when a query's hits cluster on a few long pages.
+        """
+        results = fetch(candidates)
+        while candidates < SEARCH_MAX_CANDIDATES and self._short_of_pages(query, results, candidates, min_score):
+            candidates = min(candidates * 2, SEARCH_MAX_CANDIDATES)
+            results = fetch(candidates)
+        return results
+
+    def _rank_results(self, query: SearchQuery, dense_results: List[Dict[str, Any]],
+                      lexical_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Apply the similarity threshold to dense results, combine them with
+        lexical results for the query mode, then collapse and diversify the
+        ranking as the query asks and cut it to top_k
+        """
+        # Filter dense results by similarity threshold
+        dense_results = [
+            result for result in dense_results
+            if result["similarity_score"] >= SIMILARITY_THRESHOLD
+        ]
+
+        if query.mode == "dense":
+            ranked = dense_results
+        elif query.mode == "lexical":
+            # Scale BM25 scores so the best match scores 1
+            best_score = lexical_results[0]["similarity_score"] if lexical_results else 1.0
+            ranked = [
+                {**result, "similarity_score": result["similarity_score"] / best_score}
+                for result in lexical_results
+            ]
         else:
-            # Try to end at the end of a sentence
-            sentence_end = document.find('. ', start_pos, end_pos + 20)
-            if sentence_end != -1:
-                end_pos = sentence_end + 1
-            snippet = document[start_pos:end_pos] + "..."
+            # Keyword hits survive fusion even when their embedding similarity is under the threshold
+            ranked = reciprocal_rank_fusion([dense_results, lexical_results])
+
+        top_k = query.top_k or TOP_K_RESULTS
+        if query.collapse:
+            ranked = collapse_by_url(ranked)
+        if query.diversity > 0:
+            ranked = maximal_marginal_relevance(ranked, top_k, query.diversity)
+
+        return ranked[:top_k]
+
+    def _format_results(self, results: List[Dict[str, Any]], enhanced_query: str,
+                        query: SearchQuery) -> List[SearchResult]:
+        """
+        Turn ranked results into SearchResult items with snippets.
+
+        Snippet windows are chosen by the enhanced query's terms, favouring the
+        user's own words, which are also the ones highlighted when asked for.
+        """
+        # The query terms are compiled once for all results
+        matcher = SnippetMatcher(enhanced_query, highlight_query=query.query)
+
+        search_results = []
+        for result in results:
+            # Extract a snippet from the document
+            snippet = matcher.snippet(result["document"], highlight=query.highlight)
+
+            search_results.append(
+                SearchResult(
+                    url=result["metadata"]["url"],
+                    title=result["metadata"]["title"],
+                    snippet=snippet,
+                    relevance_score=result["similarity_score"],
+                    chunk_count=result.get("chunk_count", 1)
+                )
+            )
+
+        return search_results
+
+    async def _within_budget(self, stage: str, awaitable: Awaitable, timeout: float, fallback: Any,
+                             degraded_stages: List[str]) -> Any:
+        """
+        Await a pipeline stage, returning the fallback and recording the stage if it exceeds its budget
+
+        A stage offloaded with asyncio.to_thread cannot be interrupted: on timeout its thread runs the
+        current call to completion and the result is discarded. Stages therefore wrap a single model or
+        database call (or, in search_batch, a loop that stops at the next call once cancelled), which
+        bounds the abandoned work to the one call in flight.
+        """
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            degraded_stages.append(stage)
+            return fallback
+
+    async def _within_batch_budget(self, stage: str, awaitable: Awaitable, timeout: float, fallback: Any,
+                                   degraded_lists: List[List[str]]) -> Any:
+        """
+        Await a stage shared by several queries of a batch, recording it for each of them on timeout
+        """
+        timed_out = []
+        value = await self._within_budget(stage, awaitable, timeout, fallback, timed_out)
+        for degraded_stages in degraded_lists:
+            degraded_stages.extend(timed_out)
+        return value
 
-        return snippet
+    def _extract_snippet(self, document: str, query: str, max_length: int = 200) -> str:
+        """
+        Extract a relevant snippet from the document based on the query
+        """
+        return SnippetMatcher(query).snippet(document, max_length)
 
 
 # Add this method to the existing SearchService class in app/services/search.py
@@ -1,21 +1,56 @@
 # app/services/vectordb.py
-import chromadb
-from chromadb.config import Settings
 import numpy as np
 from typing import List, Dict, Any, Optional
 import os
-import uuid
-from app.config import CHROMA_PERSIST_DIRECTORY
-from app.models.schema import WebPage
-from app.services.processor import TextProcessor
+import threading
+import time
+from app.config import (
+    CHROMA_PERSIST_DIRECTORY, DEDUP_ENABLED, LEXICAL_FILTER_CANDIDATE_MULTIPLIER, QUANTIZED_RERANK_MULTIPLIER,
+    VECTOR_BACKEND, VECTOR_INDEX_DIRECTORY
+)
+from app.models.schema import WebPage, SearchFilters
+from app.services.dedup import Deduplicator, PageFingerprints, fingerprint_page, simhash, to_int64, from_int64
+from app.services.filters import path_prefixes, build_where, matches_filters
+from app.services.lexical import LexicalIndex
+from app.services.memmap_index import MemmapClient
+from app.services.processor import TextProcessor, PreparedContent
+from app.services.quantized import QuantizedVectorStore, rerank
+from app.services.registry import PageRegistry, PageRecord
 
 
 class VectorDatabase:
-    def __init__(self):
-        self.processor = TextProcessor()
-        self.client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIRECTORY)
+    def __init__(self, processor: Optional[TextProcessor] = None, registry: Optional[PageRegistry] = None,
+                 quantized_store: Optional[QuantizedVectorStore] = None, backend: str = VECTOR_BACKEND):
+        self.processor = processor or TextProcessor()
+        self.registry = registry or PageRegistry()
+        # Compact copy of the chunk embeddings scanned by unfiltered dense search, see search_many
+        self.quantized_store = quantized_store
+
+        self.backend = backend
+        if backend == "memmap":
+            # Same collection interface; opening maps the index files instead of loading them
+            self.client = MemmapClient(VECTOR_INDEX_DIRECTORY)
+        elif backend == "chroma":
+            # Imported here to keep chromadb out of the application's import time
+            import chromadb
+
+            self.client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIRECTORY)
+        else:
+            raise ValueError(f"Unsupported vector backend {backend!r}; expected chroma or memmap")
         self.collection = self._get_or_create_collection()
 
+        # Keyword and near-duplicate indexes over the same chunks; in memory only, see rebuild_indexes.
+        # indexes_ready is set once they hold every stored chunk
+        self.lexical_index = LexicalIndex()
+        self.deduplicator = Deduplicator() if DEDUP_ENABLED else None
+        self.indexes_ready = threading.Event()
+        # Held while the indexes are rebuilt or written; _closing stops a rebuild at its next batch
+        self._index_lock = threading.Lock()
+        self._closing = threading.Event()
+
+        # Average chunks per indexed page, used to size over-fetching when results are collapsed by page
+        self.chunks_per_page = 1.0
+
     def _get_or_create_collection(self):
         """
         Get or create the collection for storing document embeddings
@@ -32,64 +67,389 @@ class VectorDatabase:
         """
         Process a webpage and add it to the vector database
         """
-        processed_data = self.processor.process_webpage(webpage)
+        self.add_webpages([webpage])
 
-        # Add each chunk to the collection
-        for i, (chunk, embedding) in enumerate(zip(processed_data["chunks"], processed_data["embeddings"])):
-            if not chunk:  # Skip empty chunks
-                continue
+    def add_webpages(self, webpages: List[WebPage], prepared: Optional[List[PreparedContent]] = None,
+                     fingerprints: Optional[List[PageFingerprints]] = None) -> Dict[str, int]:
+        """
+        Add multiple webpages to the vector database.
+
+        Chunks of all pages are embedded in one batch and upserted in as few
+        collection writes as possible. Chunk ids are derived from the URL and
+        chunk index, so re-indexing a page overwrites its chunks instead of
+        duplicating them. prepared and fingerprints optionally hold each page's
+        chunks and SimHash fingerprints, already computed (see IngestionPipeline).
+
+        Near-duplicate pages and chunks are dropped before embedding. Returns the
+        number of pages and chunks indexed and of near-duplicates dropped.
+        Writes wait for a running rebuild_indexes, so pages are never checked
+        against a partly rebuilt near-duplicate index.
+        """
+        with self._index_lock:
+            return self._add_webpages(webpages, prepared, fingerprints)
+
+    def _add_webpages(self, webpages: List[WebPage], prepared: Optional[List[PreparedContent]],
+                      fingerprints: Optional[List[PageFingerprints]]) -> Dict[str, int]:
+        """
+        add_webpages, with the index lock held
+        """
+        if prepared is None:
+            prepared = [self.processor.chunk_content(webpage.content) for webpage in webpages]
+        if fingerprints is None:
+            fingerprints = [
+                fingerprint_page(webpage.content, chunks) if self.deduplicator is not None else None
+                for webpage, (chunks, _) in zip(webpages, prepared)
+            ]
+
+        # Upserting the same id twice in one write fails, so keep the last copy of each URL
+        latest = {}
+        for webpage, page, page_fingerprints in zip(webpages, prepared, fingerprints):
+            latest[str(webpage.url)] = (webpage, page, page_fingerprints)
+        webpages = [webpage for webpage, _, _ in latest.values()]
+        prepared = [page for _, page, _ in latest.values()]
+        fingerprints = [page_fingerprints for _, _, page_fingerprints in latest.values()]
+
+        counts = {"pages": 0, "duplicate_pages": 0, "chunks": 0, "duplicate_chunks": 0}
+        duplicates = [False] * len(webpages)
+        dedup_batch = self.deduplicator.new_batch() if self.deduplicator is not None else None
+        if self.deduplicator is not None:
+            # Dropped chunks become empty, which process_webpages does not embed and the loop below skips
+            for i, (webpage, (chunks, offsets), page_fingerprints) in enumerate(zip(webpages, prepared, fingerprints)):
+                kept, duplicates[i] = self.deduplicator.filter_page(
+                    str(webpage.url), page_fingerprints, chunks, dedup_batch
+                )
+                prepared[i] = (kept, offsets)
+                counts["duplicate_pages"] += duplicates[i]
+                counts["duplicate_chunks"] += sum(1 for chunk, kept_chunk in zip(chunks, kept)
+                                                  if chunk and not kept_chunk)
+
+        ids = []
+        embeddings = []
+        documents = []
+        metadatas = []
+        stale_ids = []
+        records = []
 
-            doc_id = f"{uuid.uuid4()}"
+        processed = self.processor.process_webpages(webpages, prepared)
+        for processed_data, page_fingerprints, duplicate in zip(processed, fingerprints, duplicates):
+            url = processed_data["url"]
+            metadata = processed_data["metadata"]
+            chunk_ids = []
 
-            self.collection.add(
-                ids=[doc_id],
-                embeddings=[embedding.tolist()],
-                documents=[chunk],
-                metadatas=[{
-                    "url": processed_data["url"],
+            offsets = processed_data.get("offsets")
+            for i, (chunk, embedding) in enumerate(zip(processed_data["chunks"],
+                                                       processed_data["embeddings"].tolist())):
+                if not chunk:  # Skip empty chunks
+                    continue
+
+                doc_id = self.chunk_id(url, i)
+                ids.append(doc_id)
+                embeddings.append(embedding)
+                documents.append(chunk)
+                chunk_metadata = {
+                    "url": url,
                     "title": processed_data["title"],
                     "chunk_index": i,
-                    "domain": processed_data["metadata"].get("domain", ""),
-                    "crawled_at": processed_data["metadata"].get("crawled_at", 0)
-                }]
+                    "domain": metadata.get("domain", ""),
+                    "crawled_at": metadata.get("crawled_at", 0),
+                    **path_prefixes(url)
+                }
+                # Where the chunk came from in the page content, for rendering snippets from the original text
+                if offsets is not None:
+                    chunk_metadata["char_start"], chunk_metadata["char_end"] = offsets[i]
+                # Kept so the near-duplicate index can be rebuilt without rehashing every chunk
+                if page_fingerprints is not None:
+                    chunk_metadata["simhash"] = to_int64(page_fingerprints.chunks[i])
+                    chunk_metadata["page_simhash"] = to_int64(page_fingerprints.page)
+                metadatas.append(chunk_metadata)
+                chunk_ids.append(doc_id)
+
+            # Chunks of the previous version of the page that were not overwritten
+            previous = self.registry.get(url)
+            if previous is not None:
+                stale_ids.extend(set(previous.chunk_ids) - set(chunk_ids))
+
+            # A near-duplicate page is recorded without cache validators or content hash, so the
+            # next crawl fetches and checks it again instead of treating it as unchanged
+            records.append(PageRecord(
+                url=url,
+                etag=metadata.get("etag") if not duplicate else None,
+                last_modified=metadata.get("last_modified") if not duplicate else None,
+                content_hash=metadata.get("content_hash") if not duplicate else None,
+                chunk_ids=chunk_ids,
+                links=metadata.get("links", []),
+                indexed_at=time.time()
+            ))
+
+        batch_size = self.client.max_batch_size
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.collection.upsert(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
             )
 
-    def add_webpages(self, webpages: List[WebPage]) -> None:
+        for start in range(0, len(stale_ids), batch_size):
+            self.collection.delete(ids=stale_ids[start:start + batch_size])
+
+        # Only now that the chunks are stored do their fingerprints count as indexed
+        if self.deduplicator is not None:
+            self.deduplicator.commit([str(webpage.url) for webpage in webpages], dedup_batch)
+
+        if self.quantized_store is not None:
+            self.quantized_store.upsert(ids, np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+            self.quantized_store.delete(stale_ids)
+
+        self.lexical_index.add_many(ids, documents)
+        self.lexical_index.remove_many(stale_ids)
+
+        self.registry.upsert_many(records)
+
+        self.update_chunks_per_page()
+
+        counts["pages"] = len(webpages) - counts["duplicate_pages"]
+        counts["chunks"] = len(ids)
+        return counts
+
+    @staticmethod
+    def chunk_id(url: str, chunk_index: int) -> str:
+        """
+        Deterministic id of a chunk
+        """
+        return f"{url}#chunk-{chunk_index}"
+
+    def update_chunks_per_page(self) -> float:
+        """
+        Refresh the average number of chunks per indexed page
+        """
+        pages = self.registry.count_indexed()
+        self.chunks_per_page = max(self.collection.count() / pages, 1.0) if pages else 1.0
+        return self.chunks_per_page
+
+    def rebuild_indexes(self, batch_size: int = 5000) -> int:
+        """
+        Rebuild the keyword and near-duplicate indexes from the chunks stored in the collection.
+
+        The quantized store persists on its own and is only refilled when it
+        does not hold as many vectors as the collection (first enabled, or a
+        write interrupted between the two). Returns the number of chunks indexed.
+
+        This reads every stored chunk, so the application runs it in the
+        background once it is ready. Until it finishes indexes_ready is clear:
+        searches skip the keyword index and the quantized store. close() stops
+        it early, leaving indexes_ready clear.
+        """
+        with self._index_lock:
+            self.indexes_ready.clear()
+            indexed = self._rebuild_indexes(batch_size)
+            if not self._closing.is_set():
+                self.indexes_ready.set()
+            return indexed
+
+    def _rebuild_indexes(self, batch_size: int) -> int:
+        """
+        One pass over the collection refilling the indexes, batch_size chunks at a time
+        """
+        self.lexical_index.clear()
+        if self.deduplicator is not None:
+            self.deduplicator.clear()
+
+        include = ["documents", "metadatas"]
+        resync_quantized = (
+            self.quantized_store is not None and len(self.quantized_store) != self.collection.count()
+        )
+        if resync_quantized:
+            self.quantized_store.clear()
+            include.append("embeddings")
+
+        offset = 0
+        while not self._closing.is_set():
+            batch = self.collection.get(include=include, limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            self.lexical_index.add_many(batch["ids"], batch["documents"])
+            if resync_quantized:
+                self.quantized_store.upsert(batch["ids"], np.asarray(batch["embeddings"], dtype=np.float32))
+            self._backfill_path_prefixes(batch["ids"], batch["metadatas"])
+
+            if self.deduplicator is not None:
+                for document, metadata in zip(batch["documents"], batch["metadatas"]):
+                    # Chunks indexed before fingerprints were stored are hashed now
+                    chunk_fingerprint = metadata.get("simhash")
+                    page_fingerprint = metadata.get("page_simhash")
+                    self.deduplicator.add_indexed(
+                        metadata["url"],
+                        from_int64(page_fingerprint) if page_fingerprint is not None else None,
+                        from_int64(chunk_fingerprint) if chunk_fingerprint is not None else simhash(document)
+                    )
+
+            offset += len(batch["ids"])
+
+        self.update_chunks_per_page()
+        return offset
+
+    def _backfill_path_prefixes(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
         """
-        Add multiple webpages to the vector database
+        Add the path_N metadata used by url_prefix filters to chunks indexed before it existed
         """
-        for webpage in webpages:
-            self.add_webpage(webpage)
+        missing = [
+            (doc_id, {**metadata, **path_prefixes(metadata["url"])})
+            for doc_id, metadata in zip(ids, metadatas)
+            if "path_1" not in metadata and path_prefixes(metadata["url"])
+        ]
+        if missing:
+            self.collection.update(
+                ids=[doc_id for doc_id, _ in missing],
+                metadatas=[metadata for _, metadata in missing]
+            )
 
-    def search(self, query_embedding: np.ndarray, top_k: int = 10) -> List[Dict[str, Any]]:
+    def search(self, query_embedding: np.ndarray, top_k: int = 10, include_embeddings: bool = False,
+               filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
         """
         Search for similar documents using the query embedding
         """
+        return self.search_many(np.asarray(query_embedding)[np.newaxis, :], top_k, include_embeddings, filters)[0]
+
+    def search_many(self, query_embeddings: np.ndarray, top_k: int = 10, include_embeddings: bool = False,
+                    filters: Optional[SearchFilters] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several query embeddings in one collection query.
+
+        Returns one result list per row of query_embeddings. With
+        include_embeddings each result also carries its chunk's embedding.
+        filters apply to every row. They are pushed into the collection's
+        where clause; what it cannot express (the part of a url_prefix
+        beyond whole stored path segments) is filtered afterwards, which can
+        leave fewer than top_k results.
+
+        Unfiltered searches use the quantized store instead of the collection's
+        HNSW index when one is configured and in sync (see rebuild_indexes).
+        """
+        if len(query_embeddings) == 0:
+            return []
+        if (filters is None and self.quantized_store is not None and self.indexes_ready.is_set()
+                and len(self.quantized_store)):
+            return self._quantized_search_many(query_embeddings, top_k, include_embeddings)
+
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+
         results = self.collection.query(
-            query_embeddings=[query_embedding.tolist()],
-            n_results=top_k
+            query_embeddings=np.asarray(query_embeddings).tolist(),
+            n_results=top_k,
+            where=build_where(filters),
+            include=include
         )
 
-        search_results = []
-
         if not results["documents"]:
-            return []
+            return [[] for _ in query_embeddings]
 
-        for i, (doc, metadata, distance) in enumerate(zip(
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0]
+        all_results = []
+        for row, (ids, docs, metadatas, distances) in enumerate(zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"]
         )):
-            # Convert distance to similarity score (1 - distance for cosine)
-            similarity_score = 1 - distance
+            search_results = []
+            for i, (doc_id, doc, metadata, distance) in enumerate(zip(ids, docs, metadatas, distances)):
+                if not matches_filters(metadata, filters):
+                    continue
+
+                # Convert distance to similarity score (1 - distance for cosine)
+                similarity_score = 1 - distance
+
+                result = {
+                    "id": doc_id,
+                    "document": doc,
+                    "metadata": metadata,
+                    "similarity_score": similarity_score
+                }
+                if include_embeddings:
+                    result["embedding"] = np.asarray(results["embeddings"][row][i], dtype=np.float32)
+                search_results.append(result)
+            all_results.append(search_results)
+
+        return all_results
 
-            search_results.append({
-                "document": doc,
-                "metadata": metadata,
-                "similarity_score": similarity_score
-            })
+    def _quantized_search_many(self, query_embeddings: np.ndarray, top_k: int,
+                               include_embeddings: bool) -> List[List[Dict[str, Any]]]:
+        """
+        search_many over the quantized store: an approximate scan for
+        top_k * QUANTIZED_RERANK_MULTIPLIER candidates per query, then an exact
+        cosine re-rank against the float32 embeddings in the collection
+        """
+        candidates = self.quantized_store.search(query_embeddings, top_k * max(1, QUANTIZED_RERANK_MULTIPLIER))
+        candidate_ids = list(dict.fromkeys(doc_id for query_candidates in candidates for doc_id in query_candidates))
+        if not candidate_ids:
+            return [[] for _ in query_embeddings]
+
+        stored = self.collection.get(ids=candidate_ids, include=["documents", "metadatas", "embeddings"])
+        rows = {doc_id: i for i, doc_id in enumerate(stored["ids"])}
+        ranked = rerank(query_embeddings, candidates, stored["ids"], stored["embeddings"], top_k)
+
+        all_results = []
+        for query_ranked in ranked:
+            search_results = []
+            for doc_id, similarity_score in query_ranked:
+                i = rows[doc_id]
+                result = {
+                    "id": doc_id,
+                    "document": stored["documents"][i],
+                    "metadata": stored["metadatas"][i],
+                    "similarity_score": similarity_score
+                }
+                if include_embeddings:
+                    result["embedding"] = np.asarray(stored["embeddings"][i], dtype=np.float32)
+                search_results.append(result)
+            all_results.append(search_results)
+
+        return all_results
+
+    def lexical_search(self, query: str, top_k: int = 10, include_embeddings: bool = False,
+                       filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        """
+        Search for documents containing the query terms, ranked by BM25.
+
+        similarity_score holds the BM25 score, which is not on the same scale as cosine similarity.
+        The keyword index has no metadata, so with filters extra hits are
+        fetched and the ones that fail the filters are dropped.
+        """
+        where = build_where(filters)
+        candidates = top_k * LEXICAL_FILTER_CANDIDATE_MULTIPLIER if filters is not None else top_k
+
+        # Chunks were preprocessed before indexing, so the query must be too ("XK-42" -> "xk42")
+        hits = self.lexical_index.search(self.processor.preprocess_text(query), candidates)
+        if not hits:
+            return []
+
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+
+        stored = self.collection.get(ids=[doc_id for doc_id, _ in hits], where=where, include=include)
+        documents = {doc_id: i for i, doc_id in enumerate(stored["ids"])}
+
+        results = []
+        for doc_id, score in hits:
+            if doc_id not in documents:
+                continue
+            i = documents[doc_id]
+            if not matches_filters(stored["metadatas"][i], filters):
+                continue
+            result = {
+                "id": doc_id,
+                "document": stored["documents"][i],
+                "metadata": stored["metadatas"][i],
+                "similarity_score": score
+            }
+            if include_embeddings:
+                result["embedding"] = np.asarray(stored["embeddings"][i], dtype=np.float32)
+            results.append(result)
+            if len(results) == top_k:
+                break
 
-        return search_results
+        return results
 
     # app/services/vectordb.py (continued)
     def clear(self) -> None:
@@ -97,11 +457,31 @@ class VectorDatabase:
         Clear all documents from the collection
         """
         try:
-            self.client.delete_collection("semantic_search")
-            self.collection = self._get_or_create_collection()
+            with self._index_lock:
+                self.client.delete_collection("semantic_search")
+                self.collection = self._get_or_create_collection()
+                self.lexical_index.clear()
+                if self.deduplicator is not None:
+                    self.deduplicator.clear()
+                if self.quantized_store is not None:
+                    self.quantized_store.clear()
+                self.registry.clear()
+                self.chunks_per_page = 1.0
+                # Empty indexes match the empty collection
+                self.indexes_ready.set()
         except Exception as e:
             print(f"Error clearing collection: {str(e)}")
 
+    def close(self) -> None:
+        """
+        Stop an index rebuild and the memmap backend's background maintenance, and
+        flush the memmap files; Chroma persists on its own
+        """
+        self._closing.set()
+        with self._index_lock:
+            if self.backend == "memmap":
+                self.client.close()
+
     def get_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the vector database
@@ -111,7 +491,14 @@ class VectorDatabase:
             return {
                 "document_count": count,
                 "collection_name": "semantic_search",
-                "persist_directory": CHROMA_PERSIST_DIRECTORY
+                "backend": self.backend,
+                "persist_directory": VECTOR_INDEX_DIRECTORY if self.backend == "memmap" else CHROMA_PERSIST_DIRECTORY,
+                "vector_index": self.collection.stats() if self.backend == "memmap" else None,
+                "chunks_per_page": self.chunks_per_page,
+                "indexes_ready": self.indexes_ready.is_set(),
+                "lexical_index": self.lexical_index.stats(),
+                "near_duplicate_index": self.deduplicator.stats() if self.deduplicator is not None else None,
+                "quantized_store": self.quantized_store.stats() if self.quantized_store is not None else None
             }
         except Exception as e:
             print(f"Error getting stats: {str(e)}")
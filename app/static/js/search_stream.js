@@ -0,0 +1,95 @@
+// app/static/js/search_stream.js
+document.addEventListener('DOMContentLoaded', function() {
+    // Stream search results: the results card list first, then the semantic understanding token by token
+    const resultsStream = document.getElementById('results-stream');
+    if (resultsStream) {
+        const summary = document.getElementById('results-summary');
+        const understanding = document.getElementById('semantic-understanding');
+        const params = new URLSearchParams({
+            q: resultsStream.dataset.query,
+            top_k: resultsStream.dataset.topK,
+            mode: resultsStream.dataset.mode,
+            highlight: 'true'
+        });
+        const source = new EventSource('/api/search/stream?' + params.toString());
+
+        source.addEventListener('results', function(e) {
+            const data = JSON.parse(e.data);
+            summary.textContent = `Found ${data.total_results} results for "${data.query}" (${formatSeconds(data.execution_time)})`;
+            renderResults(data.results);
+        });
+
+        source.addEventListener('understanding', function(e) {
+            understanding.textContent += JSON.parse(e.data).token;
+        });
+
+        source.addEventListener('done', function(e) {
+            source.close();
+            if (JSON.parse(e.data).degraded_stages.includes('semantic_understanding') && !understanding.textContent) {
+                understanding.textContent = 'Query understanding is unavailable right now.';
+            }
+        });
+
+        source.onerror = function() {
+            // EventSource reconnects by default, which would rerun the search
+            source.close();
+            if (!resultsStream.querySelector('.result-card, .no-results')) {
+                summary.textContent = 'Search failed. Please try again.';
+            }
+        };
+    }
+
+    function renderResults(results) {
+        resultsStream.innerHTML = '';
+
+        if (!results.length) {
+            const empty = document.createElement('div');
+            empty.className = 'no-results';
+            empty.innerHTML = '<p>No results found for your query. Try different keywords or add more content to the index.</p>';
+            resultsStream.appendChild(empty);
+            return;
+        }
+
+        for (const result of results) {
+            const card = document.createElement('div');
+            card.className = 'result-card';
+
+            const title = document.createElement('h2');
+            title.className = 'result-title';
+            const link = document.createElement('a');
+            link.href = result.url;
+            link.target = '_blank';
+            link.textContent = result.title;
+            title.appendChild(link);
+
+            const url = document.createElement('p');
+            url.className = 'result-url';
+            url.textContent = result.url;
+
+            // Snippets carry <mark> highlighting, as in the server-rendered page
+            const snippet = document.createElement('p');
+            snippet.className = 'result-snippet';
+            snippet.innerHTML = result.snippet;
+
+            const meta = document.createElement('div');
+            meta.className = 'result-meta';
+            const score = document.createElement('span');
+            score.className = 'relevance-score';
+            score.textContent = `Relevance: ${result.relevance_score.toFixed(2)}`;
+            meta.appendChild(score);
+            if (result.chunk_count > 1) {
+                const chunks = document.createElement('span');
+                chunks.className = 'chunk-count';
+                chunks.textContent = `${result.chunk_count} matching sections`;
+                meta.appendChild(chunks);
+            }
+
+            card.append(title, url, snippet, meta);
+            resultsStream.appendChild(card);
+        }
+    }
+
+    function formatSeconds(seconds) {
+        return seconds < 1 ? `${(seconds * 1000).toFixed(2)} ms` : `${seconds.toFixed(2)} s`;
+    }
+});
\ No newline at end of file
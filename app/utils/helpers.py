@@ -1,8 +1,8 @@
 # app/utils/helpers.py
-import re
 from typing import List, Dict, Any
 from urllib.parse import urlparse
 import time
+from app.utils.snippets import highlight_text
 
 
 def format_time(seconds: float) -> str:
@@ -49,15 +49,8 @@ def highlight_terms(text: str, terms: List[str]) -> str:
     if not text or not terms:
         return text
 
-    highlighted = text
-    for term in terms:
-        if len(term) < 3:  # Skip very short terms
-            continue
-
-        pattern = re.compile(re.escape(term), re.IGNORECASE)
-        highlighted = pattern.sub(f"<mark>{term}</mark>", highlighted)
-
-    return highlighted
+    # One compiled alternation for all terms, instead of a regex per term
+    return highlight_text(text, terms)
 
 
 def get_timestamp() -> str:
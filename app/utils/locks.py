@@ -0,0 +1,43 @@
+# app/utils/locks.py
+import os
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so single-process use is not enforced
+    fcntl = None
+
+
+class DirectoryLock:
+    """
+    Exclusive lock on a data directory, held from acquire until release.
+
+    The on-disk stores allocate rows in-process, so two processes writing the
+    same directory would hand out the same rows. Taking this lock on open makes
+    a second process (another uvicorn worker, say) fail at startup instead. An
+    flock belongs to the open file, so a second open in one process fails too.
+    """
+
+    def __init__(self, directory: str, name: str = ".lock"):
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self._file: Optional[IO] = None
+
+    def acquire(self) -> None:
+        lock_file = open(self.path, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                raise RuntimeError(
+                    f"{self.directory} is already open in another process or store; "
+                    "run a single worker per data directory"
+                ) from None
+        self._file = lock_file
+
+    def release(self) -> None:
+        if self._file is not None:
+            # Closing the file drops the flock
+            self._file.close()
+            self._file = None
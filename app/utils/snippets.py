@@ -0,0 +1,154 @@
+# app/utils/snippets.py
+import bisect
+import html
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Pattern, Tuple
+
+# Shorter terms ("a", "of", "is") match almost everywhere and say nothing about relevance
+MIN_TERM_LENGTH = 3
+
+
+def query_terms(text: Optional[str]) -> List[str]:
+    """
+    Distinct lowercase word terms of a query worth matching, in order of appearance
+    """
+    if not text:
+        return []
+    return list(dict.fromkeys(term for term in re.findall(r"\w+", text.lower()) if len(term) >= MIN_TERM_LENGTH))
+
+
+@lru_cache(maxsize=512)
+def compile_terms(terms: Tuple[str, ...]) -> Optional[Pattern]:
+    """
+    One case-insensitive alternation, captured as a group, matching any of the terms.
+
+    Longer terms come first, so where terms overlap the longest one wins.
+    """
+    if not terms:
+        return None
+    alternation = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(f"({alternation})", re.IGNORECASE)
+
+
+class SnippetMatcher:
+    """
+    Picks and highlights the best snippet of each document for one query.
+
+    Query terms are deduplicated, filtered, weighted and compiled into one
+    alternation once per query. Each document is scanned in a single pass
+    that finds every term occurrence; the densest window is chosen from those
+    occurrences, and highlighting reuses them instead of rescanning.
+    """
+
+    def __init__(self, query: str, highlight_query: Optional[str] = None):
+        """
+        query supplies the terms that select the window. highlight_query, if
+        given, supplies the terms that are highlighted and count double when
+        scoring windows (for example the user's words within an LLM-enhanced query).
+        """
+        terms = query_terms(query)
+        self.highlighted = set(query_terms(highlight_query)) if highlight_query is not None else set(terms)
+        # Longest first, so where terms overlap the longest occurrence is kept
+        self.terms = sorted(set(terms) | self.highlighted, key=len, reverse=True)
+        self.weights = {term: 2 if term in self.highlighted else 1 for term in self.terms}
+        self.pattern = compile_terms(tuple(self.terms))
+
+    def snippet(self, document: str, max_length: int = 200, highlight: bool = False) -> str:
+        """
+        The densest window of about max_length characters, extended to sentence
+        boundaries where close by. With highlight, the result is HTML: text is
+        escaped and highlighted terms are wrapped in <mark>.
+        """
+        if not document:
+            return ""
+
+        matches = self._find(document)
+        if not matches:
+            return self._finish(document, 0, max_length, matches, highlight)
+
+        start_pos = matches[self._best_window(matches, max_length)][0]
+
+        # Try to start at the beginning of a sentence
+        sentence_start = document.rfind('. ', 0, start_pos)
+        if sentence_start != -1 and start_pos - sentence_start < 100:
+            start_pos = sentence_start + 2
+
+        end_pos = start_pos + max_length
+        if end_pos < len(document):
+            # Try to end at the end of a sentence, but keep at least half the window
+            sentence_end = document.rfind('. ', start_pos + max_length // 2, end_pos + 20)
+            if sentence_end != -1:
+                end_pos = sentence_end + 1
+
+        return self._finish(document, start_pos, end_pos, matches, highlight)
+
+    def _find(self, document: str) -> List[Tuple[int, int, str]]:
+        """
+        (start, end, term) of every non-overlapping term occurrence, in document order.
+
+        The alternation lists longer terms first, so an occurrence inside a
+        longer term's occurrence ("search" within "searches") is not reported.
+        """
+        if self.pattern is None:
+            return []
+        return [(match.start(), match.end(), match.group().lower()) for match in self.pattern.finditer(document)]
+
+    def _best_window(self, matches: List[Tuple[int, int, str]], max_length: int) -> int:
+        """
+        Index of the first match of the densest window, highlighted terms counting double
+        """
+        weights = self.weights
+        score = 0
+        best_score = -1
+        best = 0
+        left = 0
+
+        for right, (_, end, term) in enumerate(matches):
+            # Case-insensitive matches whose lowercase differs from every term count once
+            score += weights.get(term, 1)
+            # Shrink the window until it fits in max_length; a single match longer
+            # than max_length is kept as a window of its own
+            while left < right and end - matches[left][0] > max_length:
+                score -= weights.get(matches[left][2], 1)
+                left += 1
+            if score > best_score:
+                best_score = score
+                best = left
+
+        return best
+
+    def _finish(self, document: str, start_pos: int, end_pos: int,
+                matches: List[Tuple[int, int, str]], highlight: bool) -> str:
+        """
+        Cut the window out of the document, highlighting the matches inside it
+        """
+        end_pos = min(end_pos, len(document))
+        suffix = "..." if end_pos < len(document) else ""
+
+        if not highlight:
+            return document[start_pos:end_pos] + suffix
+
+        parts = []
+        position = start_pos
+        for match_start, match_end, term in matches[bisect.bisect_left(matches, (start_pos,)):]:
+            if match_end > end_pos:
+                break
+            if term not in self.highlighted:
+                continue
+            parts.append(html.escape(document[position:match_start]))
+            parts.append(f"<mark>{html.escape(document[match_start:match_end])}</mark>")
+            position = match_end
+        parts.append(html.escape(document[position:end_pos]))
+
+        return "".join(parts) + suffix
+
+
+def highlight_text(text: str, terms: Iterable[str]) -> str:
+    """
+    Wrap every occurrence of the terms in <mark>, with a single regex pass; the text is not escaped
+    """
+    terms = tuple(sorted({term.lower() for term in terms if len(term) >= MIN_TERM_LENGTH}))
+    if not text or not terms:
+        return text
+    return compile_terms(terms).sub(r"<mark>\1</mark>", text)
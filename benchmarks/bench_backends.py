@@ -0,0 +1,118 @@
+# benchmarks/bench_backends.py
+"""
+Compare the Chroma and memmap vector backends at the collection level.
+
+Usage:
+    python -m benchmarks.bench_backends [--vectors 100000] [--dim 384] [--queries 200] [--top-k 10]
+                                        [--batch 32] [--domains 20] [--segment-rows 16384]
+
+Writes synthetic clustered unit vectors, spread over --domains domains, into
+a temporary Chroma collection and a memmap index. For each backend (memmap
+in both flat and ivf mode) it reports the time to open the existing index,
+single-query and batched latency, latency with a one-domain where clause,
+and recall@k against exact brute-force search. --segment-rows is kept small
+so that most rows sit in sealed segments, which are the ones ivf mode
+clusters. No model is loaded.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from app.services.memmap_index import MemmapCollection
+from benchmarks.bench_quantized import clustered_vectors, recall
+
+
+def latency(search, queries, batch: int = 1):
+    """
+    (results of every query, p50 ms per call, p95 ms per call) of search(batch of queries)
+    """
+    found, latencies = [], []
+    for start in range(0, len(queries), batch):
+        began = time.perf_counter()
+        found.extend(search(queries[start:start + batch]))
+        latencies.append((time.perf_counter() - began) * 1000)
+    latencies.sort()
+    return found, statistics.median(latencies), latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--domains", type=int, default=20)
+    parser.add_argument("--segment-rows", type=int, default=16384)
+    args = parser.parse_args()
+    top_k = args.top_k
+
+    vectors = clustered_vectors(args.vectors, args.dim)
+    ids = [f"https://site{i % args.domains}.example.com/{i}#chunk-0" for i in range(args.vectors)]
+    metadatas = [{"url": doc_id.split("#")[0], "domain": f"site{i % args.domains}.example.com"}
+                 for i, doc_id in enumerate(ids)]
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.vectors, size=args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    exact = [[ids[i] for i in np.argsort(-(vectors @ query))[:top_k]] for query in queries]
+    where = {"domain": "site0.example.com"}
+
+    # Imported here so the memmap runs are not charged for chromadb's import time
+    import chromadb
+
+    chroma_directory = tempfile.mkdtemp(prefix="bench_backends_chroma_")
+    memmap_directory = tempfile.mkdtemp(prefix="bench_backends_memmap_")
+
+    def open_chroma():
+        client = chromadb.PersistentClient(path=chroma_directory)
+        return client.get_or_create_collection("semantic_search", metadata={"hnsw:space": "cosine"})
+
+    batch_size = 5000
+    writers = (
+        ("chroma", open_chroma()),
+        ("memmap", MemmapCollection(memmap_directory, segment_rows=args.segment_rows))
+    )
+    for name, collection in writers:
+        start = time.perf_counter()
+        for offset in range(0, args.vectors, batch_size):
+            end = offset + batch_size
+            collection.upsert(ids=ids[offset:end], embeddings=vectors[offset:end].tolist(),
+                              documents=[""] * len(ids[offset:end]), metadatas=metadatas[offset:end])
+        print(f"{name}: indexed {args.vectors} x {args.dim} vectors in {time.perf_counter() - start:.1f}s")
+        if name == "memmap":
+            collection.close()
+
+    backends = {
+        "chroma hnsw": open_chroma,
+        "memmap flat": lambda: MemmapCollection(memmap_directory, mode="flat", segment_rows=args.segment_rows),
+        "memmap ivf": lambda: MemmapCollection(memmap_directory, mode="ivf", segment_rows=args.segment_rows)
+    }
+
+    print(f"{'backend':<14}{'open ms':>9}{'recall':>8}{'1q p50':>9}{'1q p95':>9}"
+          f"{f'{args.batch}q p50':>10}{'where p50':>11}")
+    for name, open_backend in backends.items():
+        start = time.perf_counter()
+        collection = open_backend()
+        opened = (time.perf_counter() - start) * 1000
+        if name == "memmap ivf":
+            # Inverted lists are built in the background after opening; wait for them
+            while collection.stats()["clustered_segments"] < collection.stats()["sealed_segments"]:
+                time.sleep(0.5)
+
+        def search(batch, where=None):
+            return collection.query(query_embeddings=batch.tolist(), n_results=top_k, where=where,
+                                    include=["distances"])["ids"]
+
+        found, single_p50, single_p95 = latency(search, queries)
+        _, batch_p50, _ = latency(search, queries, args.batch)
+        _, where_p50, _ = latency(lambda batch: search(batch, where), queries)
+        print(f"{name:<14}{opened:>9.1f}{recall(found, exact, top_k):>8.3f}{single_p50:>9.2f}{single_p95:>9.2f}"
+              f"{batch_p50:>10.2f}{where_p50:>11.2f}")
+        if name != "chroma hnsw":
+            collection.close()
+
+
+if __name__ == "__main__":
+    main()
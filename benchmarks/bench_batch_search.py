@@ -0,0 +1,66 @@
+# benchmarks/bench_batch_search.py
+"""
+Measure search throughput as a function of batch size.
+
+Usage:
+    python -m benchmarks.bench_batch_search [--pages 300] [--queries 256] [--batch-sizes 1,8,32,128]
+
+Indexes a synthetic corpus into a temporary Chroma directory. The same
+query set then runs through SearchService.search_batch in batches of each
+size. Batch size 1 is the one-request-per-query baseline. LLM stages are
+off, and the query embedding cache is cleared before every run so each
+batch pays for its encode.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# The benchmark must not touch the real index
+os.environ["CHROMA_PERSIST_DIRECTORY"] = tempfile.mkdtemp(prefix="bench_batch_")
+os.environ.setdefault("EMBEDDING_STORE_DIRECTORY", "")
+
+from app.models.schema import BatchSearchQuery, SearchQuery
+from app.services.registry import PageRegistry
+from app.services.search import SearchService
+from app.services.vectordb import VectorDatabase
+from benchmarks.bench_hybrid import synthetic_corpus
+
+
+async def run(search_service: SearchService, queries, batch_size: int) -> float:
+    """
+    Queries per second for the whole query set at one batch size
+    """
+    search_service.processor.query_cache.clear()
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        await search_service.search_batch(BatchSearchQuery(queries=queries[offset:offset + batch_size]))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch-sizes", default="1,8,32,128")
+    args = parser.parse_args()
+
+    webpages, _, topic_queries = synthetic_corpus(args.pages)
+    registry = PageRegistry(os.path.join(os.environ["CHROMA_PERSIST_DIRECTORY"], "registry.sqlite3"))
+    vector_db = VectorDatabase(registry=registry)
+    vector_db.add_webpages(webpages)
+    search_service = SearchService(vector_db=vector_db)
+
+    queries = [SearchQuery(query=query, top_k=10) for query, _ in (topic_queries * 10)[:args.queries]]
+
+    baseline = None
+    print(f"{'batch':>6}{'queries/s':>12}{'speedup':>10}")
+    for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        throughput = asyncio.run(run(search_service, queries, batch_size))
+        baseline = baseline or throughput
+        print(f"{batch_size:>6}{throughput:>12.1f}{throughput / baseline:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_extractor.py
+"""
+Compare HTML extraction backends against the BeautifulSoup html.parser path.
+
+Usage:
+    python -m benchmarks.bench_extractor [page.html ...] [--repeat N]
+
+Without files, a synthetic article page with navigation, scripts and links
+is used.
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from app.services.extractor import EXTRACTORS, available_backends
+
+BASE_URL = "https://example.com/articles/index.html"
+
+
+def synthetic_page(paragraphs: int = 200, links: int = 300, seed: int = 0) -> str:
+    """
+    Build an article-like page of roughly 100 KB
+    """
+    rng = random.Random(seed)
+    words = ["semantic", "search", "vector", "index", "crawler", "embedding", "query", "page",
+             "content", "relevance", "ranking", "document", "model", "latency", "result"]
+
+    body = []
+    for i in range(paragraphs):
+        sentence = " ".join(rng.choice(words) for _ in range(40))
+        body.append(f"<p>{sentence} <b>{rng.choice(words)}</b> <i>{rng.choice(words)}</i>.</p>")
+        if i % 10 == 0:
+            body.append(f"<script>var tracker{i} = {{'id': {i}}};</script>")
+
+    anchors = "".join(f'<a href="/articles/{i}.html?ref=nav#top">Article {i}</a> ' for i in range(links))
+
+    return (
+        "<html><head><title>Benchmark page</title><style>p { margin: 0 }</style></head><body>"
+        f"<header><a href=\"/\">Home</a></header><nav>{anchors}</nav>"
+        f"<main>{''.join(body)}<div>{anchors}</div></main>"
+        "<footer>Footer text <a href=\"/about\">About</a></footer></body></html>"
+    )
+
+
+def bench(backend: str, pages: List[str], repeat: int) -> float:
+    """
+    Mean seconds per page for a backend
+    """
+    extractor = EXTRACTORS[backend]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extractor.extract(html, BASE_URL)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="*", help="HTML files to extract")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    else:
+        pages = [synthetic_page(seed=i) for i in range(5)]
+
+    size_kb = sum(len(page) for page in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size_kb:.1f} KB average, {args.repeat} repeats")
+
+    reference = [EXTRACTORS["bs4"].extract(html, BASE_URL) for html in pages]
+    baseline = bench("bs4", pages, args.repeat)
+
+    print(f"{'backend':<12}{'ms/page':>10}{'speedup':>10}{'same text':>12}{'same links':>12}")
+    for backend in available_backends():
+        per_page = baseline if backend == "bs4" else bench(backend, pages, args.repeat)
+        extracted = [EXTRACTORS[backend].extract(html, BASE_URL) for html in pages]
+        same_text = all(a.content == b.content for a, b in zip(extracted, reference))
+        same_links = all(a.links == b.links for a, b in zip(extracted, reference))
+        print(f"{backend:<12}{per_page * 1000:>10.2f}{baseline / per_page:>9.1f}x"
+              f"{str(same_text):>12}{str(same_links):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_filters.py
+"""
+Compare filtered search pushed down into Chroma's where clause with post-filtering.
+
+Usage:
+    python -m benchmarks.bench_filters [--pages 2000] [--domains 20] [--queries 200] [--top-k 10]
+
+Indexes a synthetic corpus spread evenly over --domains sites into a
+temporary Chroma directory. Each query is scoped to one site, first by
+domain and then by URL prefix. Pushdown passes the filters to
+VectorDatabase.search. Post-filtering fetches top_k * domains results
+unfiltered, which is about what it takes to leave top_k from one site, and
+then drops the other sites.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# The benchmark must not touch the real index
+os.environ["CHROMA_PERSIST_DIRECTORY"] = tempfile.mkdtemp(prefix="bench_filters_")
+os.environ.setdefault("EMBEDDING_STORE_DIRECTORY", "")
+
+from app.models.schema import SearchFilters, WebPage
+from app.services.filters import matches_filters
+from app.services.registry import PageRegistry
+from app.services.vectordb import VectorDatabase
+from benchmarks.bench_hybrid import synthetic_corpus
+
+
+def multi_domain_corpus(pages: int, domains: int):
+    """
+    (pages, topic queries) with page i on site i % domains, half of each site under /docs/
+    """
+    webpages, _, topic_queries = synthetic_corpus(pages)
+    spread = []
+    for i, webpage in enumerate(webpages):
+        domain = f"site{i % domains}.example.com"
+        section = "docs" if (i // domains) % 2 else "blog"
+        spread.append(WebPage(
+            url=f"https://{domain}/{section}/{i}",
+            title=webpage.title,
+            content=webpage.content,
+            metadata={"domain": domain, "crawled_at": time.time()}
+        ))
+    return spread, [query for query, _ in topic_queries]
+
+
+def measure(search, cases, top_k: int):
+    """
+    (p50 ms, p95 ms, mean results returned) of search(embedding, filters) over all cases
+    """
+    latencies, returned = [], []
+    for embedding, filters in cases:
+        start = time.perf_counter()
+        results = search(embedding, filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+        returned.append(len(results[:top_k]))
+    latencies.sort()
+    return (
+        statistics.median(latencies),
+        latencies[int(len(latencies) * 0.95) - 1],
+        statistics.mean(returned)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--domains", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    webpages, queries = multi_domain_corpus(args.pages, args.domains)
+    registry = PageRegistry(os.path.join(os.environ["CHROMA_PERSIST_DIRECTORY"], "registry.sqlite3"))
+    vector_db = VectorDatabase(registry=registry)
+
+    start = time.perf_counter()
+    vector_db.add_webpages(webpages)
+    print(f"Indexed {args.pages} pages ({vector_db.collection.count()} chunks) over {args.domains} domains "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    queries = queries[:args.queries]
+    embeddings = vector_db.processor.process_queries(queries)
+    top_k = args.top_k
+    oversample = top_k * args.domains
+
+    scopes = {
+        "domain": lambda i: SearchFilters(domains=[f"site{i % args.domains}.example.com"]),
+        "url_prefix": lambda i: SearchFilters(url_prefix=f"https://site{i % args.domains}.example.com/docs/")
+    }
+
+    def pushdown(embedding, filters):
+        return vector_db.search(embedding, top_k, filters=filters)
+
+    def post_filter(embedding, filters):
+        return [
+            result for result in vector_db.search(embedding, oversample)
+            if matches_filters(result["metadata"], filters)
+        ]
+
+    print(f"{'filter':<12}{'strategy':<13}{'p50 ms':>9}{'p95 ms':>9}{'results':>9}")
+    for name, scope in scopes.items():
+        cases = [(embedding, scope(i)) for i, embedding in enumerate(embeddings)]
+        for strategy, search in (("pushdown", pushdown), ("post-filter", post_filter)):
+            p50, p95, returned = measure(search, cases, top_k)
+            print(f"{name:<12}{strategy:<13}{p50:>9.2f}{p95:>9.2f}{returned:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
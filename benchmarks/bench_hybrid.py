@@ -0,0 +1,113 @@
+# benchmarks/bench_hybrid.py
+"""
+Compare dense, lexical (BM25) and hybrid retrieval for latency and recall.
+
+Usage:
+    python -m benchmarks.bench_hybrid [--pages 500] [--queries 200] [--top-k 10]
+
+Indexes a synthetic corpus into a temporary Chroma directory. Every page
+carries a unique product code and a topical paragraph. Two query sets each
+have one known relevant page: the bare product code, which is what
+dense retrieval tends to miss, and a shuffled phrase from the page topic.
+LLM stages are not involved; only retrieval is timed.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# The benchmark must not touch the real index
+os.environ["CHROMA_PERSIST_DIRECTORY"] = tempfile.mkdtemp(prefix="bench_hybrid_")
+os.environ.setdefault("EMBEDDING_STORE_DIRECTORY", "")
+
+from app.config import SIMILARITY_THRESHOLD, HYBRID_CANDIDATE_MULTIPLIER
+from app.models.schema import WebPage
+from app.services.registry import PageRegistry
+from app.services.search import reciprocal_rank_fusion
+from app.services.vectordb import VectorDatabase
+
+WORDS = ["search", "vector", "index", "crawler", "embedding", "query", "battery", "engine", "garden",
+         "weather", "recipe", "camera", "football", "election", "telescope", "violin", "mountain",
+         "database", "network", "protein", "satellite", "bicycle", "coffee", "painting", "market"]
+
+
+def synthetic_corpus(pages: int, seed: int = 0):
+    """
+    (pages, code queries, topic queries); each query is paired with the URL it should find
+    """
+    rng = random.Random(seed)
+    webpages, code_queries, topic_queries = [], [], []
+    for i in range(pages):
+        url = f"https://example.com/products/{i}"
+        code = f"XK-{rng.randint(1000, 9999)}{chr(65 + i % 26)}"
+        topic = [rng.choice(WORDS) for _ in range(6)]
+        filler = " ".join(rng.choice(WORDS) for _ in range(120))
+        content = f"The {' '.join(topic)} kit ships as model {code}. {filler}"
+        webpages.append(WebPage(url=url, title=f"Product {i}", content=content))
+
+        code_queries.append((code, url))
+        rng.shuffle(topic)
+        topic_queries.append((" ".join(topic), url))
+
+    return webpages, code_queries, topic_queries
+
+
+def retrieve(vector_db: VectorDatabase, mode: str, query: str, top_k: int):
+    """
+    Ranked URLs for a query, filtered and fused the way SearchService does
+    """
+    candidates = top_k * HYBRID_CANDIDATE_MULTIPLIER if mode == "hybrid" else top_k
+    dense, lexical = [], []
+    if mode in ("dense", "hybrid"):
+        dense = [
+            result for result in vector_db.search(vector_db.processor.process_query(query), candidates)
+            if result["similarity_score"] >= SIMILARITY_THRESHOLD
+        ]
+    if mode in ("lexical", "hybrid"):
+        lexical = vector_db.lexical_search(query, candidates)
+
+    if mode == "dense":
+        results = dense
+    elif mode == "lexical":
+        results = lexical
+    else:
+        results = reciprocal_rank_fusion([dense, lexical])
+
+    return [result["metadata"]["url"] for result in results[:top_k]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    webpages, code_queries, topic_queries = synthetic_corpus(args.pages)
+    registry = PageRegistry(os.path.join(os.environ["CHROMA_PERSIST_DIRECTORY"], "registry.sqlite3"))
+    vector_db = VectorDatabase(registry=registry)
+
+    start = time.perf_counter()
+    vector_db.add_webpages(webpages)
+    print(f"Indexed {args.pages} pages ({vector_db.collection.count()} chunks) in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'queries':<8}{'mode':<9}{'recall@' + str(args.top_k):>11}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, queries in (("code", code_queries), ("topic", topic_queries)):
+        queries = queries[:args.queries]
+        for mode in ("dense", "lexical", "hybrid"):
+            latencies, found = [], 0
+            for query, url in queries:
+                query_start = time.perf_counter()
+                urls = retrieve(vector_db, mode, query, args.top_k)
+                latencies.append((time.perf_counter() - query_start) * 1000)
+                found += url in urls
+
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{name:<8}{mode:<9}{found / len(queries):>11.3f}{statistics.median(latencies):>9.2f}{p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_quantized.py
+"""
+Compare dense search over Chroma's HNSW index with the quantized store.
+
+Usage:
+    python -m benchmarks.bench_quantized [--vectors 50000] [--dim 384] [--queries 200] [--top-k 10]
+
+Writes synthetic clustered unit vectors straight into a temporary Chroma
+collection and into a float16 and an int8 QuantizedVectorStore, so no pages
+are embedded. Queries are noisy copies of stored vectors. recall@k is
+measured against exact brute-force search and against the current Chroma
+path, for the approximate scan alone and with the exact re-rank that
+VectorDatabase.search uses.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# The benchmark must not touch the real index
+os.environ["CHROMA_PERSIST_DIRECTORY"] = tempfile.mkdtemp(prefix="bench_quantized_")
+os.environ.setdefault("EMBEDDING_STORE_DIRECTORY", "")
+
+import numpy as np
+from app.config import QUANTIZED_RERANK_MULTIPLIER
+from app.services.quantized import QuantizedVectorStore, normalize
+from app.services.registry import PageRegistry
+from app.services.vectordb import VectorDatabase
+
+
+def clustered_vectors(count: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """
+    Unit vectors drawn around random centroids, which is closer to text embeddings than uniform noise
+    """
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(clusters, size=count)] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32)
+    return normalize(vectors)
+
+
+def recall(found, expected, top_k: int) -> float:
+    """
+    Mean share of each query's expected top_k ids that were found
+    """
+    return statistics.mean(len(set(f[:top_k]) & set(e[:top_k])) / top_k for f, e in zip(found, expected))
+
+
+def timed(search, queries):
+    """
+    (result id lists, p50 ms, p95 ms) of search(query) over all queries
+    """
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return found, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    top_k = args.top_k
+
+    vectors = clustered_vectors(args.vectors, args.dim)
+    ids = [f"https://example.com/{i}#chunk-0" for i in range(args.vectors)]
+    rng = np.random.default_rng(1)
+    rows = rng.choice(args.vectors, size=args.queries, replace=False)
+    queries = normalize(vectors[rows] + 0.05 * rng.normal(size=(args.queries, args.dim)).astype(np.float32))
+
+    registry = PageRegistry(os.path.join(os.environ["CHROMA_PERSIST_DIRECTORY"], "registry.sqlite3"))
+    vector_db = VectorDatabase(registry=registry)
+
+    start = time.perf_counter()
+    batch_size = vector_db.client.max_batch_size
+    for offset in range(0, args.vectors, batch_size):
+        end = offset + batch_size
+        vector_db.collection.add(
+            ids=ids[offset:end],
+            embeddings=vectors[offset:end].tolist(),
+            documents=[""] * len(ids[offset:end]),
+            metadatas=[{"url": doc_id.split("#")[0]} for doc_id in ids[offset:end]]
+        )
+    print(f"Indexed {args.vectors} x {args.dim} vectors in Chroma in {time.perf_counter() - start:.1f}s")
+
+    exact = [[ids[i] for i in np.argsort(-(vectors @ query))[:top_k]] for query in queries]
+
+    def dense(query):
+        return [result["id"] for result in vector_db.search(query, top_k)]
+
+    print(f"{'path':<24}{'recall/exact':>14}{'recall/chroma':>15}{'p50 ms':>9}{'p95 ms':>9}{'MB':>9}")
+
+    vector_db.quantized_store = None
+    chroma, p50, p95 = timed(dense, queries)
+    float32_mb = args.vectors * args.dim * 4 / 2 ** 20
+    print(f"{'chroma hnsw':<24}{recall(chroma, exact, top_k):>14.3f}{1.0:>15.3f}{p50:>9.2f}{p95:>9.2f}"
+          f"{float32_mb:>9.1f}")
+
+    for dtype in ("float16", "int8"):
+        store = QuantizedVectorStore(
+            args.dim, dtype, os.path.join(os.environ["CHROMA_PERSIST_DIRECTORY"], f"quantized_{dtype}")
+        )
+        store.upsert(ids, vectors)
+        megabytes = store.stats()["bytes"] / 2 ** 20
+
+        def approximate(query):
+            return store.search(query, top_k)[0]
+
+        vector_db.quantized_store = store
+        for name, search in ((f"{dtype} scan", approximate),
+                             (f"{dtype} scan+rerank x{QUANTIZED_RERANK_MULTIPLIER}", dense)):
+            found, p50, p95 = timed(search, queries)
+            print(f"{name:<24}{recall(found, exact, top_k):>14.3f}{recall(found, chroma, top_k):>15.3f}"
+                  f"{p50:>9.2f}{p95:>9.2f}{megabytes:>9.1f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/bench_snippets.py
+"""
+Per-result cost of snippet extraction and highlighting, old path against the snippet engine.
+
+Usage:
+    python -m benchmarks.bench_snippets [--results 200] [--doc-words 180] [--query-words 30]
+                                        [--vocabulary 2000] [--repeat 20]
+
+The old path extracts a snippet with a lowercase copy and find per query
+term, then highlights it with one regex per term (highlight_terms). The new
+path prepares the terms once per query with SnippetMatcher, then picks the
+densest window and highlights it from a single set of matches per result.
+Queries are sized like LLM-enhanced queries, which run to dozens of words.
+"""
+import argparse
+import random
+import re
+import time
+from typing import List
+
+from app.utils.snippets import SnippetMatcher
+
+WORDS = ["semantic", "search", "vector", "index", "crawler", "embedding", "query", "page", "content",
+         "relevance", "ranking", "document", "model", "latency", "result", "python", "framework",
+         "tutorial", "install", "configure", "database", "network", "server", "client", "request"]
+
+
+def legacy_snippet(document: str, query: str, max_length: int = 200) -> str:
+    """
+    SearchService._extract_snippet before the snippet engine: one lowercase copy and find per term
+    """
+    if not document:
+        return ""
+
+    # Simple approach: find the first occurrence of any query term
+    query_terms = query.lower().split()
+
+    # Find the position of the first query term in the document
+    positions = []
+    for term in query_terms:
+        if len(term) < 3:  # Skip very short terms
+            continue
+
+        pos = document.lower().find(term)
+        if pos != -1:
+            positions.append(pos)
+
+    if not positions:
+        # If no terms found, return the beginning of the document
+        return document[:max_length] + "..."
+
+    # Start the snippet from the earliest position found
+    start_pos = min(positions)
+
+    # Try to start at the beginning of a sentence
+    sentence_start = document.rfind('. ', 0, start_pos)
+    if sentence_start != -1 and start_pos - sentence_start < 100:
+        start_pos = sentence_start + 2
+
+    # Ensure we don't start beyond the document length
+    if start_pos >= len(document):
+        start_pos = 0
+
+    # Extract the snippet
+    end_pos = start_pos + max_length
+    if end_pos >= len(document):
+        snippet = document[start_pos:]
+    else:
+        # Try to end at the end of a sentence
+        sentence_end = document.find('. ', start_pos, end_pos + 20)
+        if sentence_end != -1:
+            end_pos = sentence_end + 1
+        snippet = document[start_pos:end_pos] + "..."
+
+    return snippet
+
+
+def legacy_highlight(text: str, terms: List[str]) -> str:
+    """
+    highlight_terms before the snippet engine: one compiled regex per term
+    """
+    if not text or not terms:
+        return text
+
+    highlighted = text
+    for term in terms:
+        if len(term) < 3:  # Skip very short terms
+            continue
+
+        pattern = re.compile(re.escape(term), re.IGNORECASE)
+        highlighted = pattern.sub(f"<mark>{term}</mark>", highlighted)
+
+    return highlighted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=200)
+    parser.add_argument("--doc-words", type=int, default=180)
+    parser.add_argument("--query-words", type=int, default=30)
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # A few topical words recur across the corpus; most words come from a long tail
+    vocabulary = WORDS * 4 + [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10)))
+        for _ in range(args.vocabulary)
+    ]
+    documents = [
+        ". ".join(" ".join(rng.choice(vocabulary) for _ in range(12)) for _ in range(args.doc_words // 12))
+        for _ in range(args.results)
+    ]
+    user_query = " ".join(rng.sample(WORDS, 3))
+    enhanced_query = user_query + " " + " ".join(rng.choice(vocabulary) for _ in range(args.query_words - 3))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for document in documents:
+            legacy_highlight(legacy_snippet(document, enhanced_query), user_query.split())
+    old = (time.perf_counter() - start) / (args.repeat * len(documents))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        # Built once per query, as SearchService does
+        matcher = SnippetMatcher(enhanced_query, highlight_query=user_query)
+        for document in documents:
+            matcher.snippet(document, highlight=True)
+    new = (time.perf_counter() - start) / (args.repeat * len(documents))
+
+    print(f"{args.results} results of ~{args.doc_words} words, {args.query_words}-word enhanced query")
+    print(f"{'path':<10}{'us/result':>12}")
+    print(f"{'old':<10}{old * 1e6:>12.1f}")
+    print(f"{'engine':<10}{new * 1e6:>12.1f}   {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/import_profile.py
+"""
+Report where the import time of the API goes, to catch cold-start regressions.
+
+Usage:
+    python -m benchmarks.import_profile [--module app.main] [--top 25] [--max-seconds 2.0]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+prints the slowest imports by cumulative time. Exits with status 1 if the
+total exceeds --max-seconds or if a heavy package that should be imported
+lazily shows up.
+"""
+import argparse
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Packages that must only be imported when the services are built, not by `import app.main`
+LAZY_PACKAGES = ["torch", "sentence_transformers", "transformers", "chromadb", "groq"]
+
+
+def profile_imports(module: str) -> List[Tuple[str, int, int]]:
+    """
+    (module, self microseconds, cumulative microseconds) for every import
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+
+    # Top-level imports have no leading indentation in the tree; their cumulative times add up to the total
+    total_us = sum(cumulative for name, _, cumulative in rows if not name.startswith("  "))
+
+    print(f"import {args.module}: {total_us / 1e6:.3f}s total, {len(rows)} modules")
+    print(f"{'cumulative':>12}{'self':>10}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms{self_us / 1000:>8.1f}ms  {name.strip()}")
+
+    failed = False
+    eager = sorted({name.strip() for name, _, _ in rows if name.strip().split(".")[0] in LAZY_PACKAGES})
+    if eager:
+        print(f"\nHeavy packages imported eagerly: {', '.join(eager[:10])}")
+        failed = True
+
+    if args.max_seconds is not None and total_us / 1e6 > args.max_seconds:
+        print(f"\nImport time {total_us / 1e6:.3f}s exceeds the {args.max_seconds:.3f}s budget")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
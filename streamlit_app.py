@@ -12,6 +12,7 @@ from langchain.callbacks import StreamlitCallbackHandler
 import os
 import httpx
 import json
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -54,17 +55,31 @@ if st.sidebar.checkbox("Show Crawler Settings"):
         if crawl_url:
             try:
                 with st.sidebar:
-                    with st.spinner("Crawling website..."):
-                        response = httpx.post(
-                            f"{API_BASE_URL}/api/crawl",
-                            json={"url": crawl_url, "max_pages": max_pages, "max_depth": max_depth},
-                            timeout=300.0  # Longer timeout for crawling
-                        )
-                        if response.status_code == 200:
+                    # Crawls run as background jobs; poll the job instead of holding the request open
+                    response = httpx.post(
+                        f"{API_BASE_URL}/api/jobs",
+                        json={"url": crawl_url, "max_pages": max_pages, "max_depth": max_depth},
+                        timeout=10.0
+                    )
+                    if response.status_code == 202:
+                        job = response.json()
+                        progress_bar = st.progress(0.0, text="Crawl queued...")
+                        while job["status"] in ("queued", "running"):
+                            time.sleep(2)
+                            job = httpx.get(f"{API_BASE_URL}/api/jobs/{job['id']}", timeout=10.0).json()
+                            crawled = job["progress"]["pages_crawled"]
+                            progress_bar.progress(
+                                min(crawled / max_pages, 1.0),
+                                text=f"Crawling website... {crawled}/{max_pages} pages"
+                            )
+
+                        if job["status"] == "completed":
                             st.sidebar.success(
-                                f"Successfully crawled and indexed {len(response.json()['pages'])} pages!")
+                                f"Successfully crawled and indexed {job['progress']['pages_indexed']} pages!")
                         else:
-                            st.sidebar.error(f"Error: {response.json()['detail']}")
+                            st.sidebar.error(f"Crawl {job['status']}: {job.get('error') or ''}")
+                    else:
+                        st.sidebar.error(f"Error: {response.json()['detail']}")
             except Exception as e:
                 st.sidebar.error(f"Error: {str(e)}")
         else:
@@ -106,30 +121,57 @@ class VectorSearchTool:
         self.api_url = api_url
         self.top_k = top_k
 
-    def run(self, query):
+    def run(self, query, on_update=None):
+        """
+        Search through the streaming endpoint: results arrive as soon as retrieval
+        finishes, then the semantic understanding token by token. on_update, if
+        given, is called with the output so far each time it grows.
+        """
         try:
-            response = httpx.post(
-                self.api_url,
+            output = ""
+            understanding = ""
+            with httpx.stream(
+                "POST",
+                f"{self.api_url}/stream",
                 json={"query": query, "top_k": self.top_k},
-                timeout=10.0
-            )
-
-            if response.status_code == 200:
-                results = response.json()
-                if results.get("results", []):
-                    output = "### Vector Search Results:\n\n"
-                    for i, result in enumerate(results["results"], 1):
-                        output += f"**Result {i}**: {result['title']}\n"
-                        output += f"**Source**: {result['url']}\n"
-                        output += f"**Snippet**: {result['snippet']}\n\n"
-                    return output
-                else:
-                    return "No vector search results found."
-            else:
-                return f"Error accessing vector search: {response.text}"
+                timeout=30.0
+            ) as response:
+                if response.status_code != 200:
+                    return f"Error accessing vector search: {response.read().decode()}"
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+
+                    if event["event"] == "results":
+                        results = event["data"]["results"]
+                        if not results:
+                            return "No vector search results found."
+
+                        output = "### Vector Search Results:\n\n"
+                        for i, result in enumerate(results, 1):
+                            output += f"**Result {i}**: {result['title']}\n"
+                            output += f"**Source**: {result['url']}\n"
+                            output += f"**Snippet**: {result['snippet']}\n\n"
+                    elif event["event"] == "understanding":
+                        understanding += event["data"]["token"]
+                    else:
+                        continue
+
+                    if on_update is not None:
+                        on_update(self._format(output, understanding))
+
+            return self._format(output, understanding)
         except Exception as e:
             return f"Vector search error: {str(e)}"
 
+    @staticmethod
+    def _format(output, understanding):
+        if understanding:
+            output += f"**Semantic Understanding**: {understanding}\n"
+        return output
+
 
 # User input handling
 if prompt := st.chat_input(placeholder="Ask me anything..."):
@@ -143,7 +185,9 @@ if prompt := st.chat_input(placeholder="Ask me anything..."):
                 # Only use vector search
                 with st.spinner("Searching indexed documents..."):
                     vector_search = VectorSearchTool(vector_search_url, top_k_vector)
-                    vector_results = vector_search.run(prompt)
+                    # Show results as they stream in
+                    placeholder = st.empty()
+                    vector_results = vector_search.run(prompt, on_update=placeholder.markdown)
 
                     if "No vector search results found" in vector_results:
                         if api_key:
@@ -155,7 +199,7 @@ if prompt := st.chat_input(placeholder="Ask me anything..."):
                             st.session_state.messages.append(
                                 {"role": "assistant", "content": "No results found in indexed documents."})
                     else:
-                        st.write(vector_results)
+                        placeholder.markdown(vector_results)
                         st.session_state.messages.append({"role": "assistant", "content": vector_results})
 
             elif search_mode == "Web Search Only":
@@ -0,0 +1,64 @@
+# tests/conftest.py
+import hashlib
+
+import numpy as np
+import pytest
+from app.services.processor import TextProcessor
+from app.services.registry import PageRegistry
+
+
+class HashingEmbeddingModel:
+    """
+    Deterministic bag-of-words embeddings, so tests need no model download
+    """
+
+    model_name = "hashing-test-model"
+    dim = 32
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.batch_encode([text])[0]
+
+    def batch_encode(self, texts, batch_size: int = 64) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[row, hashlib.blake2b(word.encode(), digest_size=2).digest()[0] % self.dim] += 1
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.where(norms > 0, norms, 1)
+
+    def get_tokenizer(self):
+        return None
+
+    def get_max_tokens(self) -> int:
+        return 254
+
+    def get_dimension(self) -> int:
+        return self.dim
+
+
+@pytest.fixture
+def processor():
+    return TextProcessor(embedding_model=HashingEmbeddingModel(), chunk_strategy="chars")
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = PageRegistry(str(tmp_path / "registry.sqlite3"))
+    yield registry
+    registry.close()
+
+
+@pytest.fixture
+def vector_db(tmp_path, monkeypatch, processor):
+    """
+    VectorDatabase on the memmap backend in a temporary directory, with its indexes ready
+    """
+    import app.services.vectordb as vectordb
+
+    monkeypatch.setattr(vectordb, "VECTOR_INDEX_DIRECTORY", str(tmp_path / "memmap"))
+    registry = PageRegistry(str(tmp_path / "registry.sqlite3"))
+    db = vectordb.VectorDatabase(processor=processor, registry=registry, backend="memmap")
+    db.rebuild_indexes()
+    yield db
+    db.close()
+    registry.close()
@@ -0,0 +1,66 @@
+# tests/test_chunker.py
+import re
+
+from app.services.chunker import APPROXIMATE_TOKEN, TokenChunker
+
+# Five approximate tokens per sentence
+CONTENT = " ".join(f"Sentence {i} has words." for i in range(12))
+
+
+def token_count(text: str) -> int:
+    return len(APPROXIMATE_TOKEN.findall(text))
+
+
+def test_chunks_keep_their_offsets_and_fit_the_window():
+    chunker = TokenChunker(None, max_tokens=20)
+    assert chunker.max_tokens == 15
+    chunks = chunker.chunk(CONTENT)
+
+    assert len(chunks) == 4
+    for chunk in chunks:
+        assert CONTENT[chunk.char_start:chunk.char_end] == chunk.text
+        assert token_count(chunk.text) <= chunker.max_tokens
+        # Whole sentences only
+        assert chunk.text.startswith("Sentence") and chunk.text.endswith(".")
+    assert " ".join(chunk.text for chunk in chunks) == CONTENT
+
+
+def test_overlap_repeats_whole_sentences_and_moves_forward():
+    chunker = TokenChunker(None, max_tokens=20, overlap_tokens=6)
+    chunks = chunker.chunk(CONTENT)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.char_start < chunk.char_start < previous.char_end
+        # The chunk starts with the last sentence of the previous one
+        assert previous.text.endswith(CONTENT[chunk.char_start:previous.char_end])
+    assert chunks[-1].char_end == len(CONTENT)
+
+    # Overlap is capped at half the window
+    assert TokenChunker(None, max_tokens=20, overlap_tokens=100).overlap_tokens == 7
+
+
+def test_long_sentences_are_cut_at_word_starts():
+    content = "x" * 5 + " " + " ".join(["word"] * 40)
+    chunks = TokenChunker(None, max_tokens=20).chunk(content)
+    assert [token_count(chunk.text) for chunk in chunks] == [15, 15, 11]
+    assert all(chunk.text == content[chunk.char_start:chunk.char_end] for chunk in chunks)
+
+
+class FakeFastTokenizer:
+    is_fast = True
+
+    def __call__(self, content, **kwargs):
+        # Subword pieces of four characters, plus an empty normalization span
+        spans = [(m.start() + i, min(m.start() + i + 4, m.end()))
+                 for m in re.finditer(r"\S+", content) for i in range(0, m.end() - m.start(), 4)]
+        return {"offset_mapping": [(0, 0)] + spans}
+
+
+def test_fast_tokenizer_offsets_and_subword_cuts():
+    chunker = TokenChunker(FakeFastTokenizer(), max_tokens=4)
+    assert chunker.max_tokens == 4
+    assert chunker.token_offsets("abcdefgh ij") == [(0, 4), (4, 8), (9, 11)]
+
+    # A cut steps back to the start of a word instead of splitting "abcdefgh"
+    chunks = chunker.chunk("ab cd ef abcdefgh")
+    assert [chunk.text for chunk in chunks] == ["ab cd ef", "abcdefgh"]
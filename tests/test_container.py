@@ -0,0 +1,75 @@
+# tests/test_container.py
+import asyncio
+from functools import partial
+
+import pytest
+
+import app.services.container as container_module
+from app.services.container import ServiceContainer
+from app.services.jobs import CrawlJobManager
+from app.services.registry import PageRegistry
+from app.services.vectordb import VectorDatabase
+from tests.conftest import HashingEmbeddingModel
+
+
+class StubLLMService:
+    async def enhance_query(self, query):
+        return query
+
+    async def generate_semantic_understanding(self, query):
+        return ""
+
+
+def test_startup_builds_one_shared_service_graph(tmp_path, monkeypatch):
+    import app.services.vectordb as vectordb
+
+    monkeypatch.setattr(container_module, "EmbeddingModel", HashingEmbeddingModel)
+    monkeypatch.setattr(container_module, "EMBEDDING_STORE_DIRECTORY", str(tmp_path / "embedding_store"))
+    monkeypatch.setattr(container_module, "EmbeddingStore",
+                        partial(container_module.EmbeddingStore, directory=str(tmp_path / "embedding_store")))
+    monkeypatch.setattr(container_module, "PageRegistry", partial(PageRegistry, str(tmp_path / "registry.sqlite3")))
+    monkeypatch.setattr(vectordb, "VECTOR_INDEX_DIRECTORY", str(tmp_path / "memmap"))
+    monkeypatch.setattr(container_module, "VectorDatabase", partial(VectorDatabase, backend="memmap"))
+    monkeypatch.setattr(container_module, "LLMService", StubLLMService)
+    monkeypatch.setattr(container_module, "CrawlJobManager",
+                        partial(CrawlJobManager, directory=str(tmp_path / "crawl_jobs")))
+
+    services = ServiceContainer()
+    assert services.status()["status"] == "starting"
+
+    async def run():
+        await services.startup(warm_up=True)
+        status = services.status()
+        await services._index_task
+        indexes_ready = services.status()["indexes_ready"]
+        await services.shutdown()
+        return status, indexes_ready
+
+    status, indexes_ready = asyncio.run(run())
+    assert status["status"] == "ready" and indexes_ready
+    assert {"embedding_model", "vector_db", "warmup_encode", "warmup_query", "total"} <= set(status["startup_timings"])
+
+    # Every consumer holds the same model, processor, collection and registry
+    processor = services.processor
+    assert processor.embedding_model is services.embedding_model
+    assert processor.embedding_store is services.embedding_store
+    assert services.vector_db.processor is processor
+    assert services.vector_db.registry is services.registry is services.crawler.registry
+    assert services.search_service.vector_db is services.vector_db
+    assert services.search_service.processor is processor
+    assert services.search_service.llm_service is services.llm_service
+    assert services.pipeline.vector_db is services.vector_db
+    assert services.job_manager.crawler is services.crawler
+    assert services.job_manager.pipeline is services.pipeline
+
+
+def test_failed_startup_is_reported(monkeypatch):
+    def broken_model():
+        raise RuntimeError("model download failed")
+
+    monkeypatch.setattr(container_module, "EmbeddingModel", broken_model)
+    services = ServiceContainer()
+    with pytest.raises(RuntimeError):
+        asyncio.run(services.startup())
+    assert services.status()["status"] == "failed"
+    assert services.status()["error"] == "model download failed"
@@ -0,0 +1,151 @@
+# tests/test_crawler.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from app.services.crawler import WebCrawler
+from app.services.registry import PageRecord
+
+
+def site(host: str, pages: int, delay: float = 0.0):
+    """
+    Handler of a site whose pages link to every other page of the same site
+    """
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host != host:
+            return httpx.Response(404)
+        await asyncio.sleep(delay)
+        links = "".join(f'<a href="https://{host}/{i}">{i}</a>' for i in range(pages))
+        return httpx.Response(200, html=f"<html><title>{request.url.path}</title><body><p>Page "
+                                        f"{request.url.path} of {host}</p>{links}</body></html>")
+    return handler
+
+
+def make_crawler(handler, registry, concurrency: int = 8) -> WebCrawler:
+    return WebCrawler(
+        concurrency=concurrency,
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        registry=registry,
+        extractor="bs4",
+        parse_executor=ThreadPoolExecutor(max_workers=2)
+    )
+
+
+def test_max_pages_is_respected_under_concurrency(registry):
+    async def run():
+        crawler = make_crawler(site("a.example.com", 50, delay=0.01), registry, concurrency=16)
+        pages = await crawler.crawl("https://a.example.com/", max_pages=7, max_depth=3)
+        return crawler, pages
+
+    crawler, pages = asyncio.run(run())
+    assert len(pages) == 7
+    assert len({str(page.url) for page in pages}) == 7
+    assert crawler.progress()["pages_crawled"] == 7
+    assert crawler._in_flight == 0
+
+
+def test_reserve_page_slot_waits_for_in_flight_fetches():
+    async def run():
+        crawler = WebCrawler(concurrency=1, registry=object())
+        crawler._page_count = 0
+        crawler._in_flight = 0
+        crawler._slot_condition = asyncio.Condition()
+
+        assert await crawler._reserve_page_slot(2)
+        assert await crawler._reserve_page_slot(2)
+        # Both slots are in flight: a third reservation waits until one of them settles
+        waiting = asyncio.create_task(crawler._reserve_page_slot(2))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        # The fetch failed, so its slot is free again
+        await crawler._release_page_slot()
+        assert await asyncio.wait_for(waiting, 1)
+
+        # Both remaining fetches succeed, filling the budget
+        crawler._page_count = 2
+        crawler._in_flight = 0
+        assert not await crawler._reserve_page_slot(2)
+
+    asyncio.run(run())
+
+
+def test_forked_crawls_keep_their_own_state(registry):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return await site(request.url.host, 5, delay=0.005)(request)
+
+    async def run():
+        crawler = make_crawler(handler, registry)
+        first, second = crawler.fork(), crawler.fork()
+        assert first.get_client() is crawler.get_client()
+        assert first.registry is crawler.registry
+        a, b = await asyncio.gather(
+            first.crawl("https://a.example.com/", max_pages=4, max_depth=2),
+            second.crawl("https://b.example.com/", max_pages=3, max_depth=2)
+        )
+        return a, b
+
+    a, b = asyncio.run(run())
+    assert a is not b
+    assert len(a) == 4 and all(page.url.host == "a.example.com" for page in a)
+    assert len(b) == 3 and all(page.url.host == "b.example.com" for page in b)
+
+
+def test_recrawl_marks_pages_with_the_same_content_unchanged(registry):
+    async def run():
+        crawler = make_crawler(site("a.example.com", 3), registry)
+        pages = await crawler.crawl("https://a.example.com/", max_pages=3, max_depth=1)
+        registry.upsert_many([
+            PageRecord(url=str(page.url), content_hash=page.metadata["content_hash"], links=page.metadata["links"])
+            for page in pages
+        ])
+        again = crawler.fork()
+        return pages, await again.crawl("https://a.example.com/", max_pages=3, max_depth=1), again
+
+    pages, second, crawler = asyncio.run(run())
+    assert len(pages) == 3
+    assert second == []
+    assert sorted(crawler.unchanged_urls) == sorted(str(page.url) for page in pages)
+
+
+def test_pooled_client_is_shared_by_forks_and_rebuilt_after_close(registry):
+    async def run():
+        crawler = WebCrawler(registry=registry, parse_executor=ThreadPoolExecutor(max_workers=1))
+        client = crawler.get_client()
+        assert crawler.get_client() is client
+        assert crawler.fork().get_client() is client
+
+        await crawler.aclose()
+        assert client.is_closed
+
+        fresh = crawler.get_client()
+        assert fresh is not client and not fresh.is_closed
+        await crawler.aclose()
+
+    asyncio.run(run())
+
+
+def test_not_modified_response_reuses_the_registry_record(registry):
+    conditional = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if "If-None-Match" in request.headers:
+            conditional.append(str(request.url))
+            return httpx.Response(304, headers={"ETag": request.headers["If-None-Match"]})
+        return httpx.Response(200, headers={"ETag": '"v1"'}, html="<html><title>Home</title><body><p>Home page"
+                                                                   "</p></body></html>")
+
+    url = "https://a.example.com/"
+    # The stored hash matches nothing the server sends, so only the 304 can mark the page unchanged
+    registry.upsert(PageRecord(url=url, etag='"v1"', content_hash="stale", chunk_ids=[f"{url}#0"]))
+
+    async def run():
+        crawler = make_crawler(handler, registry)
+        return crawler, await crawler.crawl(url, max_pages=1, max_depth=0)
+
+    crawler, pages = asyncio.run(run())
+    assert conditional == [url]
+    assert pages == []
+    assert crawler.unchanged_urls == [url]
+    record = registry.get(url)
+    assert record.etag == '"v1"' and record.chunk_ids == [f"{url}#0"]
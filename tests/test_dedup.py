@@ -0,0 +1,101 @@
+# tests/test_dedup.py
+import pytest
+from app.models.schema import WebPage
+from app.services.dedup import (
+    Deduplicator, NearDuplicateIndex, fingerprint_page, from_int64, hamming_distance, simhash, to_int64
+)
+
+TEXT = " ".join(f"word{i} appears in sentence number {i} of the article." for i in range(60))
+
+
+def test_simhash_is_stable_and_near_for_small_edits():
+    assert simhash(TEXT) == simhash(TEXT)
+    assert simhash("") == 0
+    edited = TEXT.replace("word7 ", "changed ")
+    assert hamming_distance(simhash(TEXT), simhash(edited)) <= 3
+    assert hamming_distance(simhash(TEXT), simhash("an entirely different short text about cooking")) > 3
+
+
+def test_int64_round_trip():
+    for fingerprint in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert -(1 << 63) <= to_int64(fingerprint) < 1 << 63
+        assert from_int64(to_int64(fingerprint)) == fingerprint
+
+
+def test_banded_index_finds_every_fingerprint_within_distance():
+    index = NearDuplicateIndex(max_distance=3)
+    base = 0x0123456789ABCDEF
+    index.add("a", base)
+
+    # Flipped bits spread over different bands still share at least one band
+    assert index.find(base ^ (1 << 0) ^ (1 << 20) ^ (1 << 40)) == "a"
+    assert index.find(base ^ (1 << 0) ^ (1 << 20) ^ (1 << 40) ^ (1 << 60)) is None
+    assert index.find(base, exclude_owner="a") is None
+
+    index.remove("a")
+    assert index.find(base) is None
+    assert len(index) == 0 and index.owners() == 0
+
+
+def test_filter_page_drops_duplicate_pages_and_shared_chunks():
+    dedup = Deduplicator(max_distance=3)
+    boilerplate = "subscribe to our newsletter for weekly updates and offers"
+    chunks = [TEXT, boilerplate]
+    batch = dedup.new_batch()
+    kept, duplicate = dedup.filter_page("https://a.com/", fingerprint_page(TEXT, chunks), chunks, batch)
+    assert kept == chunks and not duplicate
+
+    # A copy of the page within the same batch is caught before anything is committed
+    kept, duplicate = dedup.filter_page("https://b.com/", fingerprint_page(TEXT, chunks), chunks, batch)
+    assert duplicate and kept == ["", ""]
+    assert len(dedup.pages) == 0
+
+    dedup.commit(["https://a.com/", "https://b.com/"], batch)
+    assert dedup.stats() == {"pages": 1, "chunks": 2, "max_distance": 3}
+
+    # A different page sharing only the boilerplate chunk keeps its own content
+    other = "a different article entirely, about rivers and mountains and weather"
+    batch = dedup.new_batch()
+    kept, duplicate = dedup.filter_page("https://c.com/", fingerprint_page(other + " " + boilerplate,
+                                                                           [other, boilerplate]),
+                                        [other, boilerplate], batch)
+    assert not duplicate and kept == [other, ""]
+
+
+def test_reindexing_a_page_does_not_match_itself():
+    dedup = Deduplicator()
+    for _ in range(2):
+        batch = dedup.new_batch()
+        kept, duplicate = dedup.filter_page("https://a.com/", fingerprint_page(TEXT, [TEXT]), [TEXT], batch)
+        assert not duplicate and kept == [TEXT]
+        dedup.commit(["https://a.com/"], batch)
+    assert dedup.stats()["chunks"] == 1
+
+
+def page(url: str, content: str = TEXT) -> WebPage:
+    return WebPage(url=url, title="Article", content=content,
+                   metadata={"domain": "example.com", "content_hash": f"hash of {url}", "etag": '"v1"'})
+
+
+def test_failed_write_leaves_the_index_unchanged(vector_db, monkeypatch):
+    def fail(**kwargs):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(vector_db.collection, "upsert", fail)
+    with pytest.raises(RuntimeError):
+        vector_db.add_webpages([page("https://a.com/")])
+    assert len(vector_db.deduplicator.pages) == 0
+    monkeypatch.undo()
+
+    # The page was never stored, so indexing it for real is not a duplicate of itself
+    assert vector_db.add_webpages([page("https://a.com/")])["pages"] == 1
+
+
+def test_duplicate_page_is_not_recorded_as_unchanged(vector_db):
+    counts = vector_db.add_webpages([page("https://a.com/"), page("https://b.com/")])
+    assert counts["pages"] == 1 and counts["duplicate_pages"] == 1
+
+    original = vector_db.registry.get("https://a.com/")
+    duplicate = vector_db.registry.get("https://b.com/")
+    assert original.content_hash and original.etag
+    assert duplicate.content_hash is None and duplicate.etag is None and duplicate.chunk_ids == []
@@ -0,0 +1,49 @@
+# tests/test_embedding.py
+import numpy as np
+from app.models.embedding import EmbeddingModel
+
+
+class StubSentenceTransformer:
+    """
+    Encodes a text as (length, first character code, last character code, 1)
+    """
+
+    def __init__(self):
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 4
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        self.batches.append(texts)
+        vectors = np.array([[len(text), ord(text[0]), ord(text[-1]), 1] for text in texts], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def stub_model() -> EmbeddingModel:
+    # Bypasses __new__, which loads the real model once per process
+    model = object.__new__(EmbeddingModel)
+    model.model_name = "stub"
+    model.model = StubSentenceTransformer()
+    return model
+
+
+def test_batch_rows_line_up_with_the_input():
+    model = stub_model()
+    texts = ["short", "", "a much longer text than the others", "   ", "medium text", "zz"]
+    embeddings = model.batch_encode(texts, batch_size=2)
+
+    # Encoded longest first, without the empty texts
+    assert model.model.batches[0] == ["a much longer text than the others", "medium text", "short", "zz"]
+    assert embeddings.shape == (6, 4) and embeddings.dtype == np.float32
+    for i, text in enumerate(texts):
+        assert np.array_equal(embeddings[i], model.encode(text))
+    assert not embeddings[1].any() and not embeddings[3].any()
+
+
+def test_all_empty_batch_skips_the_model():
+    model = stub_model()
+    assert not model.batch_encode(["", " "]).any()
+    assert model.model.batches == []
@@ -0,0 +1,40 @@
+# tests/test_embedding_store.py
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from app.services.embedding_store import EmbeddingStore
+
+
+def test_store_round_trip_and_reopen(tmp_path):
+    store = EmbeddingStore("test/model", dim=4, directory=str(tmp_path))
+    store.put_many(["a", "b"], np.eye(4, dtype=np.float32)[:2])
+    embeddings, missing = store.get_many(["b", "c", "a"])
+    assert missing == [1]
+    assert np.array_equal(embeddings[[0, 2]], np.eye(4, dtype=np.float32)[[1, 0]])
+    store.close()
+
+    store = EmbeddingStore("test/model", dim=4, directory=str(tmp_path))
+    assert store.get_many(["a"])[1] == [] and store.count() == 2
+    store.close()
+
+
+def test_store_directory_is_locked_while_open(tmp_path):
+    store = EmbeddingStore("test/model", dim=4, directory=str(tmp_path))
+    with pytest.raises(RuntimeError, match="already open"):
+        EmbeddingStore("test/model", dim=4, directory=str(tmp_path))
+
+    # Another worker process is refused as well
+    opened = subprocess.run(
+        [sys.executable, "-c",
+         f"from app.services.embedding_store import EmbeddingStore; EmbeddingStore('test/model', 4, {str(tmp_path)!r})"],
+        capture_output=True, text=True
+    )
+    assert opened.returncode != 0 and "already open" in opened.stderr
+
+    # Another model has its own directory
+    EmbeddingStore("other/model", dim=4, directory=str(tmp_path)).close()
+
+    store.close()
+    EmbeddingStore("test/model", dim=4, directory=str(tmp_path)).close()
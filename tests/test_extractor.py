@@ -0,0 +1,42 @@
+# tests/test_extractor.py
+import pytest
+from app.services.extractor import (
+    EXTRACTORS, HTMLExtractor, available_backends, extract_html, normalize_links, resolve_backend
+)
+
+PAGE = """<html><head><title>Vector search</title><style>p { color: red }</style></head>
+<body><header>Site header</header><nav><a href="/nav">Menu</a></nav>
+<p>First <b>paragraph</b> about <a href="/docs/intro?x=1#top">embeddings</a>.</p>
+<script>var ignored = 1;</script>
+<p>Second paragraph. <a href="https://other.com/page">External</a> <a href="/docs/intro">Again</a></p>
+<footer>Footer text</footer></body></html>"""
+
+
+def test_base_extractor_is_abstract():
+    with pytest.raises(TypeError):
+        HTMLExtractor()
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_backends_match_the_reference(backend):
+    reference = extract_html("bs4", PAGE, "https://example.com/")
+    assert reference.title == "Vector search"
+    assert reference.content == "Vector search First paragraph about embeddings . Second paragraph. External Again"
+    assert reference.links == ["https://example.com/docs/intro"]
+
+    extracted = extract_html(backend, PAGE, "https://example.com/")
+    assert (extracted.title, extracted.links) == (reference.title, reference.links)
+    assert extracted.content.split() == reference.content.split()
+
+
+def test_normalize_links_keeps_distinct_same_domain_urls():
+    hrefs = ["/a", "/a#x", "/a?q=1", None, "", "https://other.com/", "b"]
+    assert normalize_links(hrefs, "https://example.com/dir/page") == [
+        "https://example.com/a", "https://example.com/dir/b"
+    ]
+
+
+def test_resolve_backend():
+    assert resolve_backend("auto") in EXTRACTORS
+    with pytest.raises(ValueError):
+        resolve_backend("regex")
@@ -0,0 +1,101 @@
+# tests/test_filters.py
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+from app.models.schema import SearchFilters
+from app.services.filters import build_where, matches_filters, path_prefixes
+
+
+def test_path_prefixes():
+    assert path_prefixes("https://a.com/docs/api/v1/search") == {
+        "path_1": "/docs", "path_2": "/docs/api", "path_3": "/docs/api/v1"
+    }
+    assert path_prefixes("https://a.com/") == {}
+
+
+def test_no_filters_means_no_where_clause():
+    assert build_where(None) is None
+    assert build_where(SearchFilters()) is None
+
+
+def test_single_condition_is_not_wrapped():
+    assert build_where(SearchFilters(domains=["a.com", "b.com"])) == {"domain": {"$in": ["a.com", "b.com"]}}
+
+
+def test_all_filters_combine_with_and():
+    after = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    before = datetime(2024, 2, 1, tzinfo=timezone.utc)
+    where = build_where(SearchFilters(domains=["a.com"], crawled_after=after, crawled_before=before,
+                                      url_prefix="https://a.com/docs/api/ref"))
+    assert where == {"$and": [
+        {"domain": {"$in": ["a.com"]}},
+        {"crawled_at": {"$gte": after.timestamp()}},
+        {"crawled_at": {"$lte": before.timestamp()}},
+        {"domain": "a.com"},
+        {"path_2": "/docs/api"}
+    ]}
+
+
+def test_url_prefix_uses_only_complete_stored_segments():
+    # "/docs/ap" may continue as "/docs/api", so only "/docs" is pushed down
+    assert build_where(SearchFilters(url_prefix="https://a.com/docs/ap")) == {
+        "$and": [{"domain": "a.com"}, {"path_1": "/docs"}]
+    }
+    # Deeper than the stored levels: the rest is left to matches_filters
+    assert build_where(SearchFilters(url_prefix="https://a.com/1/2/3/4/5"))["$and"][1] == {"path_3": "/1/2/3"}
+
+
+def test_matches_filters_checks_the_full_prefix():
+    filters = SearchFilters(url_prefix="https://a.com/docs/ap")
+    assert matches_filters({"url": "https://a.com/docs/api/x"}, filters)
+    assert not matches_filters({"url": "https://a.com/docs/guide"}, filters)
+    assert matches_filters({"url": "anything"}, None)
+
+
+def test_naive_datetimes_are_utc():
+    filters = SearchFilters(crawled_after=datetime(2024, 1, 1), crawled_before="2024-01-02T00:00:00")
+    assert filters.crawled_after.tzinfo is timezone.utc
+    assert build_where(filters)["$and"][0] == {"crawled_at": {"$gte": 1704067200.0}}
+    assert build_where(filters)["$and"][1] == {"crawled_at": {"$lte": 1704153600.0}}
+    assert not matches_filters({"crawled_at": 1704067199.0}, filters)
+    assert matches_filters({"crawled_at": 1704067200.0}, filters)
+
+
+@pytest.mark.parametrize("prefix", ["/docs/", "example.com/docs", "ftp://example.com/", "https:///docs"])
+def test_url_prefix_needs_scheme_and_host(prefix):
+    with pytest.raises(ValidationError):
+        SearchFilters(url_prefix=prefix)
+
+
+class RecordingSearchService:
+    def __init__(self):
+        self.queries = []
+
+    async def search_stream(self, query):
+        self.queries.append(query)
+        yield {"event": "done", "data": {"execution_time": 0.0}}
+
+
+def test_get_stream_endpoint_takes_the_post_options():
+    from fastapi.testclient import TestClient
+    from app.main import app, get_search_service
+
+    service = RecordingSearchService()
+    app.dependency_overrides[get_search_service] = lambda: service
+    try:
+        client = TestClient(app)
+        response = client.get("/api/search/stream", params={
+            "q": "vector", "collapse": "false", "diversity": 0.5, "domain": ["a.com", "b.com"],
+            "crawled_after": "2024-01-01T00:00:00", "url_prefix": "https://a.com/docs/"
+        })
+        assert response.status_code == 200
+        query = service.queries[0]
+        assert not query.collapse and query.diversity == 0.5
+        assert query.filters.domains == ["a.com", "b.com"]
+        assert query.filters.crawled_after == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+        response = client.get("/api/search/stream", params={"q": "vector", "url_prefix": "/docs/"})
+        assert response.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
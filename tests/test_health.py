@@ -0,0 +1,99 @@
+# tests/test_health.py
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+
+class StubContainer:
+    """
+    Stands in for ServiceContainer; startup finishes once release is set
+    """
+
+    instances = []
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.fail = False
+        self.ready = False
+        self.startup_error = None
+        self.shut_down = False
+        StubContainer.instances.append(self)
+
+    async def startup(self) -> None:
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        if self.fail:
+            self.startup_error = "model download failed"
+            raise RuntimeError(self.startup_error)
+        self.ready = True
+
+    def status(self):
+        if self.ready:
+            state = "ready"
+        elif self.startup_error is not None:
+            state = "failed"
+        else:
+            state = "starting"
+        return {"status": state, "error": self.startup_error, "indexes_ready": False, "startup_timings": {}}
+
+    async def shutdown(self) -> None:
+        self.shut_down = True
+
+
+@pytest.fixture
+def stub_container(monkeypatch):
+    StubContainer.instances = []
+    monkeypatch.setattr(main, "ServiceContainer", StubContainer)
+    return StubContainer
+
+
+def wait_for_status(client, state: str, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while (response := client.get("/readyz")).json()["status"] != state:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return response
+
+
+def test_background_startup_answers_liveness_before_ready(stub_container, monkeypatch):
+    monkeypatch.setattr(main, "BACKGROUND_STARTUP", True)
+    with TestClient(main.app) as client:
+        services = stub_container.instances[0]
+        assert client.get("/healthz").json() == {"status": "alive"}
+        response = client.get("/readyz")
+        assert response.status_code == 503 and response.json()["status"] == "starting"
+        # Routes that need the services refuse instead of blocking
+        assert client.post("/api/search", json={"query": "q"}).status_code == 503
+
+        services.release.set()
+        assert wait_for_status(client, "ready").status_code == 200
+    assert services.shut_down
+
+
+def test_failed_background_startup_stays_unready(stub_container, monkeypatch):
+    monkeypatch.setattr(main, "BACKGROUND_STARTUP", True)
+    with TestClient(main.app) as client:
+        services = stub_container.instances[0]
+        services.fail = True
+        services.release.set()
+        assert wait_for_status(client, "failed").status_code == 503
+        assert client.get("/healthz").status_code == 200
+
+
+def test_foreground_startup_is_ready_before_serving(stub_container, monkeypatch):
+    class ReleasedContainer(StubContainer):
+        def __init__(self):
+            super().__init__()
+            self.release.set()
+
+    monkeypatch.setattr(main, "BACKGROUND_STARTUP", False)
+    monkeypatch.setattr(main, "ServiceContainer", ReleasedContainer)
+    # The lifespan waits for startup, so the very first request sees a ready service
+    with TestClient(main.app) as client:
+        assert client.get("/readyz").status_code == 200
+    assert ReleasedContainer.instances[0].shut_down
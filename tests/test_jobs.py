@@ -0,0 +1,84 @@
+# tests/test_jobs.py
+import asyncio
+import json
+
+import httpx
+from app.services.jobs import COMPLETED, RUNNING, CrawlJobManager
+from tests.test_crawler import make_crawler, site
+
+
+class RecordingPipeline:
+    """
+    Stands in for the ingestion pipeline; with hang_after it blocks on later
+    calls, so a shutdown interrupts the job mid-crawl
+    """
+
+    def __init__(self, hang_after: int = None):
+        self.hang_after = hang_after
+        self.calls = 0
+        self.indexed = []
+
+    async def add_webpages(self, pages):
+        self.calls += 1
+        if self.hang_after is not None and self.calls > self.hang_after:
+            await asyncio.Event().wait()
+        self.indexed.extend(str(page.url) for page in pages)
+        return {"pages": len(pages), "duplicate_pages": 0, "chunks": len(pages), "duplicate_chunks": 0}
+
+
+def recording_site(host: str, pages: int, fetched: list):
+    handler = site(host, pages)
+
+    async def record(request: httpx.Request) -> httpx.Response:
+        fetched.append(str(request.url))
+        return await handler(request)
+    return record
+
+
+async def wait_until(condition, timeout: float = 10.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_interrupted_job_resumes_from_its_checkpoint(tmp_path, registry):
+    directory = str(tmp_path / "jobs")
+    first_fetches, second_fetches = [], []
+    interrupted = RecordingPipeline(hang_after=1)
+    resumed = RecordingPipeline()
+
+    async def first_run():
+        crawler = make_crawler(recording_site("a.example.com", 30, first_fetches), registry, concurrency=1)
+        manager = CrawlJobManager(crawler, interrupted, directory=directory, workers=1, checkpoint_every=3)
+        await manager.start()
+        job = manager.submit("https://a.example.com/", max_pages=10, max_depth=2)
+        # The second checkpoint never finishes indexing; shut down while it waits
+        await wait_until(lambda: interrupted.calls == 2)
+        await manager.stop()
+        await crawler.aclose()
+        return job.id
+
+    job_id = asyncio.run(first_run())
+    with open(tmp_path / "jobs" / f"{job_id}.json") as f:
+        saved = json.load(f)
+    assert saved["status"] == RUNNING and saved["state"]["page_count"] == 3
+    assert saved["progress"]["pages_indexed"] == 3
+
+    async def second_run():
+        crawler = make_crawler(recording_site("a.example.com", 30, second_fetches), registry, concurrency=1)
+        manager = CrawlJobManager(crawler, resumed, directory=directory, workers=1, checkpoint_every=3)
+        await manager.start()
+        await wait_until(lambda: manager.get(job_id).status == COMPLETED)
+        await manager.stop()
+        await crawler.aclose()
+        return manager.get(job_id)
+
+    job = asyncio.run(second_run())
+    # Pages indexed before the interruption are neither fetched nor indexed again
+    assert not set(interrupted.indexed) & set(second_fetches)
+    assert not set(interrupted.indexed) & set(resumed.indexed)
+    assert len(set(interrupted.indexed) | set(resumed.indexed)) == 10
+    assert job.progress["pages_crawled"] == 10 and job.progress["pages_indexed"] == 10
+    assert job.state is None
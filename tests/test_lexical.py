@@ -0,0 +1,69 @@
+# tests/test_lexical.py
+import math
+
+from app.services.lexical import LexicalIndex, tokenize
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Vector-Search, 2024!") == ["vector", "search", "2024"]
+    assert tokenize("") == []
+
+
+def test_bm25_score_matches_formula():
+    index = LexicalIndex(k1=1.2, b=0.75)
+    index.add_many(["a", "b", "c"], ["apple apple pear", "pear plum", "plum"])
+
+    # "apple": in 1 of 3 documents, twice in "a" (3 tokens; average length 2)
+    idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+    norm = 1.2 * (1 - 0.75 + 0.75 * 3 / 2)
+    expected = idf * 2 * 2.2 / (2 + norm)
+
+    hits = index.search("apple", top_k=10)
+    assert [doc_id for doc_id, _ in hits] == ["a"]
+    assert math.isclose(hits[0][1], expected, rel_tol=1e-5)
+
+
+def test_rarer_terms_rank_higher_and_top_k_cuts():
+    index = LexicalIndex()
+    index.add_many(["a", "b", "c"], ["common rare", "common", "common filler words"])
+    hits = index.search("common rare", top_k=2)
+    assert [doc_id for doc_id, _ in hits][0] == "a"
+    assert len(hits) == 2
+    assert index.search("missing", top_k=5) == []
+
+
+def test_replacing_a_document_drops_its_old_terms():
+    index = LexicalIndex()
+    index.add_many(["a"], ["old text"])
+    index.add_many(["a"], ["new text"])
+    assert index.search("old") == []
+    assert [doc_id for doc_id, _ in index.search("new")] == ["a"]
+    assert len(index) == 1
+
+
+def test_compaction_drops_tombstones_and_keeps_results():
+    index = LexicalIndex()
+    ids = [f"doc{i}" for i in range(8)]
+    index.add_many(ids, [f"shared term{i}" for i in range(8)])
+
+    index.remove_many(ids[:1])
+    assert index.stats()["tombstones"] == 1
+
+    # A quarter of the documents removed triggers compaction
+    index.remove_many(ids[1:2])
+    assert index.stats() == {"documents": 6, "terms": 7, "tombstones": 0}
+    assert sorted(doc_id for doc_id, _ in index.search("shared", top_k=10)) == ids[2:]
+    assert [doc_id for doc_id, _ in index.search("term5")] == ["doc5"]
+    assert index.search("term0") == []
+
+    # Documents added after compaction get fresh numbers
+    index.add_many(["late"], ["term5 shared"])
+    assert {doc_id for doc_id, _ in index.search("term5")} == {"doc5", "late"}
+
+
+def test_clear():
+    index = LexicalIndex()
+    index.add_many(["a"], ["text"])
+    index.clear()
+    assert len(index) == 0
+    assert index.search("text") == []
@@ -0,0 +1,122 @@
+# tests/test_llm_cache.py
+import asyncio
+import threading
+
+import pytest
+from app.services.llm_cache import LLMResponseCache
+
+
+def make_cache(tmp_path, model: str = "test-model") -> LLMResponseCache:
+    return LLMResponseCache(model=model, max_size=10, ttl=None, path=str(tmp_path / "llm_cache.sqlite3"))
+
+
+class SlowCompletion:
+    def __init__(self, value: str = "answer", error: Exception = None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def test_concurrent_misses_share_one_completion(tmp_path):
+    cache = make_cache(tmp_path)
+    compute = SlowCompletion()
+
+    async def run():
+        compute.release = asyncio.Event()
+        callers = [asyncio.create_task(cache.get_or_compute("enhance", query, compute))
+                   for query in ("Vector search", "vector  SEARCH", "vector search")]
+        await asyncio.sleep(0)
+        compute.release.set()
+        return await asyncio.gather(*callers)
+
+    assert asyncio.run(run()) == ["answer"] * 3
+    assert compute.calls == 1
+    assert cache.stats()["coalesced"] == 2 and cache.stats()["in_flight"] == 0
+    assert asyncio.run(cache.get("enhance", "vector search")) == "answer"
+    assert asyncio.run(cache.get("semantic_understanding", "vector search")) is None
+
+
+def test_failures_reach_every_caller_and_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    failing = SlowCompletion(error=RuntimeError("rate limited"))
+
+    async def run():
+        failing.release = asyncio.Event()
+        callers = [asyncio.create_task(cache.get_or_compute("enhance", "q", failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        failing.release.set()
+        return await asyncio.gather(*callers, return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(run())] == ["rate limited"] * 2
+    assert failing.calls == 1 and asyncio.run(cache.get("enhance", "q")) is None
+
+    retry = SlowCompletion(value="recovered")
+
+    async def run_retry():
+        retry.release = asyncio.Event()
+        retry.release.set()
+        return await cache.get_or_compute("enhance", "q", retry)
+
+    assert asyncio.run(run_retry()) == "recovered"
+
+
+def test_a_caller_giving_up_does_not_cancel_the_others(tmp_path):
+    cache = make_cache(tmp_path)
+    compute = SlowCompletion()
+
+    async def run():
+        compute.release = asyncio.Event()
+        impatient = asyncio.create_task(cache.get_or_compute("enhance", "q", compute))
+        patient = asyncio.create_task(cache.get_or_compute("enhance", "q", compute))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        compute.release.set()
+        return await patient
+
+    assert asyncio.run(run()) == "answer"
+    assert compute.calls == 1
+
+
+def test_disk_tier_outlives_the_process_cache(tmp_path):
+    cache = make_cache(tmp_path)
+    asyncio.run(cache.set("enhance", "q", "stored"))
+
+    restarted = make_cache(tmp_path)
+    assert asyncio.run(restarted.get_or_compute("enhance", "q", SlowCompletion())) == "stored"
+    assert restarted.stats()["disk_hits"] == 1
+    # Another model's responses are not reused
+    assert asyncio.run(make_cache(tmp_path, model="other-model").get("enhance", "q")) is None
+
+
+def test_disk_tier_is_used_off_the_event_loop(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    loop_thread = threading.get_ident()
+    disk_threads = []
+
+    for name in ("get", "set"):
+        method = getattr(cache.disk, name)
+
+        def record(*args, method=method):
+            disk_threads.append(threading.get_ident())
+            return method(*args)
+        monkeypatch.setattr(cache.disk, name, record)
+
+    compute = SlowCompletion()
+
+    async def run():
+        compute.release = asyncio.Event()
+        compute.release.set()
+        return await cache.get_or_compute("enhance", "q", compute)
+
+    assert asyncio.run(run()) == "answer"
+    assert len(disk_threads) == 2 and loop_thread not in disk_threads
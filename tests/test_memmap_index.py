@@ -0,0 +1,138 @@
+# tests/test_memmap_index.py
+import time
+
+import numpy as np
+import pytest
+from app.services.memmap_index import MemmapClient, MemmapCollection
+from app.services.quantized import normalize
+
+
+def test_collection_directory_is_locked_while_open(tmp_path):
+    collection = MemmapCollection(str(tmp_path / "index"))
+    collection.upsert(["a"], np.ones((1, 4), dtype=np.float32))
+    with pytest.raises(RuntimeError, match="already open"):
+        MemmapCollection(str(tmp_path / "index"))
+    collection.close()
+
+    collection = MemmapCollection(str(tmp_path / "index"))
+    assert collection.count() == 1
+    collection.close()
+
+
+def test_deleted_collection_can_be_recreated(tmp_path):
+    client = MemmapClient(str(tmp_path))
+    client.get_or_create_collection("chunks").upsert(["a"], np.ones((1, 4), dtype=np.float32))
+    client.delete_collection("chunks")
+    assert client.get_or_create_collection("chunks").count() == 0
+    client.close()
+
+
+def wait_for(condition, timeout: float = 10.0) -> None:
+    # Compaction and list building run on the collection's maintenance thread
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "background maintenance did not finish"
+        time.sleep(0.01)
+
+
+def random_vectors(count: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def test_where_clauses_match_chroma_operators(tmp_path):
+    collection = MemmapCollection(str(tmp_path))
+    collection.upsert([f"c{i}" for i in range(6)], random_vectors(6),
+                      metadatas=[{"domain": f"{'ab'[i % 2]}.com", "crawled_at": i} for i in range(6)])
+
+    def ids(where):
+        return sorted(collection.get(where=where)["ids"])
+
+    assert ids({"domain": "a.com"}) == ["c0", "c2", "c4"]
+    assert ids({"$and": [{"domain": {"$in": ["a.com"]}}, {"crawled_at": {"$gte": 2}}]}) == ["c2", "c4"]
+    assert ids({"$or": [{"crawled_at": {"$lt": 1}}, {"crawled_at": {"$gt": 4}}]}) == ["c0", "c5"]
+    assert ids({"domain": {"$nin": ["a.com"]}}) == ids({"domain": {"$ne": "a.com"}}) == ["c1", "c3", "c5"]
+    collection.close()
+
+
+def test_upsert_replaces_and_delete_tombstones(tmp_path):
+    collection = MemmapCollection(str(tmp_path), segment_rows=100)
+    vectors = random_vectors(10)
+    collection.upsert([f"c{i}" for i in range(10)], vectors, documents=[f"doc {i}" for i in range(10)],
+                      metadatas=[{"domain": "a.com" if i < 5 else "b.com"} for i in range(10)])
+
+    # Re-upserting moves the id to a new row and leaves a tombstone behind
+    collection.upsert(["c0"], vectors[9:], documents=["replaced"], metadatas=[{"domain": "a.com"}])
+    assert collection.count() == 10 and collection.stats()["dead_rows"] == 1
+    stored = collection.get(ids=["c0"], include=["documents", "embeddings"])
+    assert stored["documents"] == ["replaced"]
+    assert np.allclose(stored["embeddings"][0], normalize(vectors[9]))
+
+    collection.delete(where={"domain": "b.com"})
+    assert collection.count() == 5
+    assert sorted(collection.get(where={"domain": "a.com"})["ids"]) == ["c0", "c1", "c2", "c3", "c4"]
+
+    # Tombstoned rows are never returned
+    result = collection.query(vectors[9:], n_results=3)
+    assert result["ids"][0][0] == "c0" and "c9" not in result["ids"][0]
+    assert abs(result["distances"][0][0]) < 1e-6
+    collection.close()
+
+
+def test_flat_query_is_exact_and_filters_rows(tmp_path):
+    collection = MemmapCollection(str(tmp_path), segment_rows=64)
+    collection.SCAN_BLOCK = 16
+    vectors = random_vectors(200)
+    ids = [f"c{i}" for i in range(200)]
+    collection.upsert(ids, vectors, metadatas=[{"even": i % 2 == 0} for i in range(200)])
+
+    queries = random_vectors(3, seed=1)
+    exact = np.argsort(-(normalize(queries) @ normalize(vectors).T), axis=1)[:, :10]
+    result = collection.query(queries, n_results=10)
+    assert result["ids"] == [[ids[i] for i in row] for row in exact]
+
+    filtered = collection.query(queries, n_results=10, where={"even": True})
+    assert all(int(doc_id[1:]) % 2 == 0 for row in filtered["ids"] for doc_id in row)
+    collection.close()
+
+
+def test_compaction_drops_tombstones_and_survives_reopening(tmp_path):
+    collection = MemmapCollection(str(tmp_path), segment_rows=100, compaction_dead_ratio=0.2)
+    vectors = random_vectors(300)
+    ids = [f"c{i}" for i in range(300)]
+    collection.upsert(ids, vectors)
+    collection.delete(ids[:50])
+
+    wait_for(lambda: collection.stats()["dead_rows"] == 0)
+    assert collection.stats()["live_rows"] == 250
+    expected = collection.query(vectors[50:53], n_results=5)["ids"]
+    assert [row[0] for row in expected] == ids[50:53]
+    collection.close()
+
+    reopened = MemmapCollection(str(tmp_path), segment_rows=100)
+    assert reopened.count() == 250
+    assert reopened.query(vectors[50:53], n_results=5)["ids"] == expected
+    reopened.close()
+
+
+def test_ivf_lists_are_built_and_probed(tmp_path, monkeypatch):
+    monkeypatch.setattr(MemmapCollection, "IVF_MIN_ROWS", 100)
+    # Points around 20 well separated centers, so each center's points share a list
+    centers = random_vectors(20, dim=16, seed=2) * 10
+    vectors = np.repeat(centers, 20, axis=0) + random_vectors(400, dim=16, seed=3)
+    ids = [f"c{i}" for i in range(400)]
+
+    collection = MemmapCollection(str(tmp_path), mode="ivf", nprobe=4, segment_rows=400)
+    collection.upsert(ids, vectors)
+    wait_for(lambda: collection.stats()["clustered_segments"] == 1)
+
+    queries = vectors[::40]
+    exact = np.argsort(-(normalize(queries) @ normalize(vectors).T), axis=1)[:, :5]
+    result = collection.query(queries, n_results=5)
+    for row, found in zip(exact, result["ids"]):
+        assert found[0] == ids[row[0]]
+        assert len(set(found) & {ids[i] for i in row}) >= 4
+
+    # Probing every list is an exact search
+    collection.nprobe = 10 ** 6
+    assert collection.query(queries, n_results=5)["ids"] == [[ids[i] for i in row] for row in exact]
+    collection.close()
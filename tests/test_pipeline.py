@@ -0,0 +1,111 @@
+# tests/test_pipeline.py
+import asyncio
+import time
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+import app.services.pipeline as pipeline_module
+from app.models.schema import WebPage
+from app.services.chunker import TokenChunker
+from app.services.pipeline import IngestionPipeline
+
+
+def pages(count: int):
+    return [
+        WebPage(url=f"https://example.com/{i}", title=f"Page {i}",
+                content=f"Page {i} is about topic{i}. " + " ".join(f"word{i}x{j}" for j in range(40)),
+                metadata={"domain": "example.com"})
+        for i in range(count)
+    ]
+
+
+def indexed_urls(vector_db):
+    return {metadata["url"] for metadata in vector_db.collection.get(include=["metadatas"])["metadatas"]}
+
+
+def test_batches_reach_the_vector_db_in_process(vector_db):
+    pipeline = IngestionPipeline(vector_db, workers=0, batch_pages=2)
+    report = asyncio.run(pipeline.add_webpages(pages(5)))
+
+    assert report["pages"] == 5 and report["chunks"] == vector_db.collection.count() > 0
+    assert indexed_urls(vector_db) == {f"https://example.com/{i}" for i in range(5)}
+    assert pipeline.stats()["batches"] == 3
+    assert asyncio.run(pipeline.add_webpages([]))["pages"] == 0
+
+
+def test_process_pool_prepares_the_same_chunks(vector_db):
+    # A token chunker, so the pool initializer has to hand it to the worker
+    vector_db.processor.chunker = TokenChunker(None, max_tokens=20, overlap_tokens=4)
+    pipeline = IngestionPipeline(vector_db, workers=1, batch_pages=2)
+    try:
+        report = asyncio.run(pipeline.add_webpages(pages(4)))
+    finally:
+        pipeline.close()
+
+    assert report["pages"] == 4
+    stored = vector_db.collection.get(include=["documents", "metadatas"])
+    for page in pages(4):
+        expected, _ = vector_db.processor.chunk_content(page.content)
+        assert len(expected) > 1
+        documents = [document for document, metadata in zip(stored["documents"], stored["metadatas"])
+                     if metadata["url"] == str(page.url)]
+        assert sorted(documents) == sorted(expected)
+
+
+def test_pending_batches_are_bounded(vector_db, monkeypatch):
+    pipeline = IngestionPipeline(vector_db, workers=0, batch_pages=1, max_pending=1)
+    prepared, indexed, outstanding = [], [], []
+    prepare = pipeline._prepare
+    add_webpages = vector_db.add_webpages
+
+    async def counting_prepare(contents):
+        prepared.append(contents)
+        outstanding.append(len(prepared) - len(indexed))
+        return await prepare(contents)
+
+    def slow_add_webpages(*args):
+        time.sleep(0.02)
+        counts = add_webpages(*args)
+        indexed.append(args[0])
+        return counts
+
+    monkeypatch.setattr(pipeline, "_prepare", counting_prepare)
+    monkeypatch.setattr(vector_db, "add_webpages", slow_add_webpages)
+    report = asyncio.run(pipeline.add_webpages(pages(10)))
+
+    assert report["pages"] == 10 and len(indexed) == 10
+    # One batch being indexed, max_pending queued and one waiting to be queued
+    assert max(outstanding) <= pipeline.max_pending + 2
+
+
+class BrokenPool(Executor):
+    """
+    Process pool whose workers have all died
+    """
+
+    created = []
+
+    def __init__(self, *args, **kwargs):
+        self.shut_down = False
+        BrokenPool.created.append(self)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("a worker died"))
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_falls_back_without_dropping_pages(vector_db, monkeypatch):
+    BrokenPool.created = []
+    monkeypatch.setattr(pipeline_module, "ProcessPoolExecutor", BrokenPool)
+    pipeline = IngestionPipeline(vector_db, workers=2, batch_pages=2)
+
+    report = asyncio.run(pipeline.add_webpages(pages(5)))
+    assert report["pages"] == 5
+    assert indexed_urls(vector_db) == {f"https://example.com/{i}" for i in range(5)}
+    # Every broken pool is shut down and replaced for the next batch
+    assert BrokenPool.created and all(pool.shut_down for pool in BrokenPool.created)
+    pipeline.close()
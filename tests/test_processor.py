@@ -0,0 +1,39 @@
+# tests/test_processor.py
+import numpy as np
+from app.services.processor import TextProcessor
+from tests.conftest import HashingEmbeddingModel
+
+
+class CountingModel(HashingEmbeddingModel):
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return super().batch_encode([text])[0]
+
+    def batch_encode(self, texts, batch_size: int = 64):
+        self.encoded.extend(texts)
+        return super().batch_encode(texts, batch_size)
+
+
+def test_query_embeddings_are_cached_by_preprocessed_query():
+    model = CountingModel()
+    processor = TextProcessor(embedding_model=model, chunk_strategy="chars")
+
+    first = processor.process_query("Vector  Search")
+    second = processor.process_query("vector search")
+    assert model.encoded == ["vector search"]
+    assert first is second and not first.flags.writeable
+
+
+def test_batched_queries_share_the_cache_and_encode_duplicates_once():
+    model = CountingModel()
+    processor = TextProcessor(embedding_model=model, chunk_strategy="chars")
+    processor.process_query("cached")
+
+    embeddings = processor.process_queries(["cached", "new one", "New one"])
+    assert model.encoded == ["cached", "new one"]
+    assert embeddings.shape == (3, model.dim)
+    assert np.array_equal(embeddings[1], embeddings[2])
+    assert np.array_equal(embeddings[0], processor.process_query("cached"))
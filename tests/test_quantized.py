@@ -0,0 +1,82 @@
+# tests/test_quantized.py
+import numpy as np
+import pytest
+from app.models.schema import WebPage
+from app.services.quantized import CODE_DTYPES, QuantizedVectorStore, normalize, quantize, rerank
+
+
+def test_store_directory_is_locked_while_open(tmp_path):
+    store = QuantizedVectorStore(dim=4, dtype="int8", directory=str(tmp_path))
+    store.upsert(["a"], np.ones((1, 4), dtype=np.float32))
+    # The float16 codes share the directory and its scale file
+    with pytest.raises(RuntimeError, match="already open"):
+        QuantizedVectorStore(dim=4, dtype="float16", directory=str(tmp_path))
+    store.close()
+
+    store = QuantizedVectorStore(dim=4, dtype="int8", directory=str(tmp_path))
+    assert len(store) == 1
+    store.close()
+
+
+def test_quantized_codes_approximate_the_normalized_vectors():
+    vectors = np.random.default_rng(0).normal(size=(50, 16)).astype(np.float32)
+    for dtype, tolerance in (("float16", 1e-3), ("int8", 1e-2)):
+        codes, scales = quantize(vectors, dtype)
+        assert codes.dtype == CODE_DTYPES[dtype]
+        decoded = codes.astype(np.float32) * scales[:, np.newaxis]
+        assert np.abs(decoded - normalize(vectors)).max() < tolerance
+    # Zero vectors stay zero instead of dividing by zero
+    codes, scales = quantize(np.zeros((1, 4), dtype=np.float32), "int8")
+    assert not codes.any() and scales[0] == 1
+
+
+def test_rerank_orders_by_exact_cosine_and_skips_unknown_ids():
+    stored = np.array([[1, 0], [1, 1], [0, 1]], dtype=np.float32)
+    ranked = rerank(np.array([[1, 0.1]]), [["c", "missing", "a", "b"]], ["a", "b", "c"], stored, top_k=2)
+    assert [doc_id for doc_id, _ in ranked[0]] == ["a", "b"]
+    assert abs(ranked[0][0][1] - float(normalize(np.array([1, 0.1])) @ np.array([1, 0]))) < 1e-6
+    assert rerank(np.ones((1, 2)), [["missing"]], ["a"], stored[:1], top_k=2) == [[]]
+
+
+@pytest.mark.parametrize("dtype", list(CODE_DTYPES))
+def test_store_search_finds_the_nearest_rows_and_reuses_deleted_ones(tmp_path, dtype):
+    vectors = np.random.default_rng(1).normal(size=(300, 16)).astype(np.float32)
+    ids = [f"chunk{i}" for i in range(len(vectors))]
+    store = QuantizedVectorStore(dim=16, dtype=dtype, directory=str(tmp_path))
+    store.SCAN_BLOCK = 64
+    store.upsert(ids, vectors)
+
+    queries = vectors[:5] + 0.01
+    exact = np.argsort(-(normalize(queries) @ normalize(vectors).T), axis=1)
+    for query_exact, found in zip(exact, store.search(queries, top_k=10)):
+        assert found[0] == ids[query_exact[0]]
+        assert len(set(found) & {ids[i] for i in query_exact[:10]}) >= 8
+
+    store.delete(["chunk0"])
+    assert "chunk0" not in store.search(queries[:1], top_k=10)[0]
+    store.upsert(["replacement"], vectors[:1])
+    assert len(store) == 300 and store.stats()["vectors"] == 300
+    assert store._rows["replacement"] == 0
+    store.close()
+
+
+def test_vector_database_reranks_quantized_candidates(vector_db, processor, tmp_path):
+    pages = [WebPage(url=f"https://example.com/{i}", title=f"Page {i}",
+                     content=f"topic{i} " * 5 + "shared words about search engines", metadata={})
+             for i in range(20)]
+    vector_db.add_webpages(pages)
+    query = processor.process_queries(["topic3 search"])
+    exact = vector_db.search_many(query, top_k=5)[0]
+
+    vector_db.quantized_store = QuantizedVectorStore(dim=processor.embedding_model.dim, dtype="int8",
+                                                     directory=str(tmp_path / "quantized"))
+    # Out of sync with the collection, so the rebuild refills it
+    vector_db.rebuild_indexes()
+    assert len(vector_db.quantized_store) == vector_db.collection.count()
+
+    reranked = vector_db.search_many(query, top_k=5)[0]
+    # Exact scores; ids may differ only among pages with tied scores
+    assert np.allclose([item["similarity_score"] for item in reranked],
+                       [item["similarity_score"] for item in exact], atol=1e-5)
+    assert {item["id"] for item in reranked[:2]} == {item["id"] for item in exact[:2]}
+    vector_db.quantized_store.close()
@@ -0,0 +1,323 @@
+# tests/test_search.py
+import asyncio
+import threading
+import time
+
+import numpy as np
+from app.models.schema import BatchSearchQuery, SearchQuery
+from app.services import search
+from app.services.search import SearchService, maximal_marginal_relevance, reciprocal_rank_fusion
+
+
+def result(doc_id: str, url: str = None, score: float = 1.0):
+    return {"id": doc_id, "document": doc_id, "metadata": {"url": url or f"https://example.com/{doc_id}",
+                                                           "title": doc_id}, "similarity_score": score}
+
+
+def test_rrf_rewards_agreement_between_lists():
+    fused = reciprocal_rank_fusion([[result("a"), result("b")], [result("b"), result("c")]], k=60)
+    assert [item["id"] for item in fused] == ["b", "a", "c"]
+    assert abs(fused[0]["similarity_score"] - (1 / 62 + 1 / 61) / (2 / 61)) < 1e-9
+
+
+def test_rrf_first_in_every_list_scores_one():
+    fused = reciprocal_rank_fusion([[result("a")], [result("a")]])
+    assert fused[0]["similarity_score"] == 1.0
+
+
+class FakeVectorDatabase:
+    def __init__(self, chunks_per_page: float = 1.0):
+        self.chunks_per_page = chunks_per_page
+        self.indexes_ready = threading.Event()
+        self.lexical_calls = 0
+
+    def lexical_search(self, query, top_k, include_embeddings=False, filters=None):
+        self.lexical_calls += 1
+        return [result("keyword", score=3.0)]
+
+
+class FakeLLM:
+    async def enhance_query(self, query):
+        return query
+
+    async def generate_semantic_understanding(self, query):
+        return ""
+
+
+def test_keyword_retrieval_waits_for_the_index():
+    vector_db = FakeVectorDatabase()
+    service = SearchService(vector_db=vector_db, processor=object(), llm_service=FakeLLM())
+    query = SearchQuery(query="keyword", mode="lexical")
+
+    degraded = []
+    _, results = asyncio.run(service._retrieve(query, degraded))
+    assert results == [] and degraded == ["lexical_index"]
+    assert vector_db.lexical_calls == 0
+
+    vector_db.indexes_ready.set()
+    degraded = []
+    _, results = asyncio.run(service._retrieve(query, degraded))
+    assert [item["id"] for item in results] == ["keyword"] and degraded == []
+
+
+def test_collapsed_search_fetches_more_when_hits_cluster_on_few_pages():
+    # 40 chunks of one long page rank above the chunks of the other pages
+    ranked = [result(f"long#{i}", url="https://example.com/long", score=0.99) for i in range(40)]
+    ranked += [result(f"p{i}", score=0.9) for i in range(10)]
+    ranked += [result(f"low{i}", score=0.1) for i in range(100)]
+    fetched = []
+
+    def fetch(n):
+        fetched.append(n)
+        return ranked[:n]
+
+    service = SearchService(vector_db=FakeVectorDatabase(), processor=object(), llm_service=FakeLLM())
+    query = SearchQuery(query="q", top_k=5)
+    results = service._fetch_pages(query, 5, fetch, min_score=0.6)
+    assert fetched == [5, 10, 20, 40, 80]
+    assert len({item["metadata"]["url"] for item in results}) >= 5
+
+    # Nothing left above the threshold: stop instead of scanning the whole store
+    fetched.clear()
+    service._fetch_pages(SearchQuery(query="q", top_k=20), 5, fetch, min_score=0.6)
+    assert fetched[-1] == 80
+
+    # Without collapsing one fetch is enough, and an exhausted store stops the loop
+    fetched.clear()
+    service._fetch_pages(SearchQuery(query="q", top_k=5, collapse=False), 5, fetch)
+    assert fetched == [5]
+    fetched.clear()
+    service._fetch_pages(SearchQuery(query="q", top_k=500), 100, fetch)
+    assert fetched == [100, 200]
+
+
+class SlowProcessor:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def process_queries(self, queries):
+        time.sleep(self.delay)
+        return np.zeros((len(queries), 4), dtype=np.float32)
+
+
+class SlowVectorDatabase(FakeVectorDatabase):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.indexes_ready.set()
+
+    def search_many(self, embeddings, top_k, include_embeddings=False, filters=None):
+        time.sleep(self.delay)
+        return [[result("dense")] for _ in embeddings]
+
+
+def test_batch_search_applies_the_stage_budgets(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_EMBEDDING_TIMEOUT", 0.05)
+    monkeypatch.setattr(search, "SEARCH_RETRIEVAL_TIMEOUT", 0.05)
+    batch = BatchSearchQuery(queries=[SearchQuery(query="a"), SearchQuery(query="b", mode="lexical")])
+
+    service = SearchService(vector_db=SlowVectorDatabase(0.0), processor=SlowProcessor(0.2), llm_service=FakeLLM())
+    responses = asyncio.run(service.search_batch(batch)).responses
+    assert responses[0].degraded_stages == ["embedding"] and responses[0].results == []
+    assert responses[1].degraded_stages == [] and responses[1].results[0].title == "keyword"
+
+    service = SearchService(vector_db=SlowVectorDatabase(0.2), processor=SlowProcessor(0.0), llm_service=FakeLLM())
+    responses = asyncio.run(service.search_batch(batch)).responses
+    assert responses[0].degraded_stages == ["retrieval"] and responses[0].results == []
+    assert responses[1].degraded_stages == []
+
+
+class StreamingLLM(FakeLLM):
+    def __init__(self, tokens, fail: bool = False, endless: bool = False):
+        self.tokens = tokens
+        self.fail = fail
+        self.endless = endless
+        self.cancelled = False
+
+    async def stream_semantic_understanding(self, query):
+        try:
+            for token in self.tokens:
+                yield token
+            if self.fail:
+                raise RuntimeError("LLM unavailable")
+            while self.endless:
+                await asyncio.sleep(0.01)
+                yield "more"
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def streaming_service(llm) -> SearchService:
+    vector_db = FakeVectorDatabase()
+    vector_db.indexes_ready.set()
+    return SearchService(vector_db=vector_db, processor=object(), llm_service=llm)
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def test_stream_sends_results_then_understanding_then_done():
+    service = streaming_service(StreamingLLM(["Looking ", "for ", "keywords"]))
+    events = asyncio.run(collect(service.search_stream(SearchQuery(query="keyword", mode="lexical"))))
+
+    assert [event["event"] for event in events] == ["results"] + ["understanding"] * 3 + ["done"]
+    assert events[0]["data"]["results"][0].title == "keyword"
+    assert "".join(event["data"]["token"] for event in events[1:4]) == "Looking for keywords"
+    assert events[-1]["data"]["degraded_stages"] == []
+
+
+def test_stream_reports_a_failed_understanding_on_done():
+    service = streaming_service(StreamingLLM(["partial"], fail=True))
+    events = asyncio.run(collect(service.search_stream(SearchQuery(query="keyword", mode="lexical"))))
+
+    assert [event["event"] for event in events] == ["results", "understanding", "done"]
+    assert events[0]["data"]["degraded_stages"] == []
+    assert events[-1]["data"]["degraded_stages"] == ["semantic_understanding"]
+
+
+def test_stream_cancels_the_understanding_when_the_consumer_stops():
+    llm = StreamingLLM([], endless=True)
+    service = streaming_service(llm)
+
+    async def run():
+        events = service.search_stream(SearchQuery(query="keyword", mode="lexical"))
+        assert (await events.__anext__())["event"] == "results"
+        assert (await events.__anext__())["event"] == "understanding"
+        await events.aclose()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert llm.cancelled
+
+
+def test_post_stream_is_newline_delimited_json():
+    import json
+    from fastapi.testclient import TestClient
+    from app.main import app, get_search_service
+
+    service = streaming_service(StreamingLLM(["a ", "b"]))
+    app.dependency_overrides[get_search_service] = lambda: service
+    try:
+        response = TestClient(app).post("/api/search/stream", json={"query": "keyword", "mode": "lexical"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert response.text.endswith("\n") and all(lines)
+    events = [json.loads(line) for line in lines]
+    assert [event["event"] for event in events] == ["results", "understanding", "understanding", "done"]
+    assert events[0]["data"]["results"][0]["title"] == "keyword"
+
+
+class SlowLLM:
+    def __init__(self, enhance_delay: float, understanding_delay: float):
+        self.enhance_delay = enhance_delay
+        self.understanding_delay = understanding_delay
+        self.understanding_cancelled = False
+
+    async def enhance_query(self, query):
+        await asyncio.sleep(self.enhance_delay)
+        return query + " enhanced"
+
+    async def generate_semantic_understanding(self, query):
+        try:
+            await asyncio.sleep(self.understanding_delay)
+        except asyncio.CancelledError:
+            self.understanding_cancelled = True
+            raise
+        return f"Looking for {query}"
+
+
+class SlowDenseDatabase(FakeVectorDatabase):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def search(self, query_embedding, top_k, include_embeddings=False, filters=None):
+        time.sleep(self.delay)
+        return [result("dense", score=0.9)]
+
+
+class ZeroProcessor:
+    def process_query(self, query):
+        return np.zeros(4, dtype=np.float32)
+
+
+def test_understanding_overlaps_enhancement_and_retrieval():
+    # 0.2s enhancement + 0.1s retrieval alongside 0.3s of understanding: about 0.3s, not 0.6s
+    llm = SlowLLM(enhance_delay=0.2, understanding_delay=0.3)
+    service = SearchService(vector_db=SlowDenseDatabase(0.1), processor=ZeroProcessor(), llm_service=llm)
+
+    start = time.perf_counter()
+    response = asyncio.run(service.search(SearchQuery(query="rivers", mode="dense")))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.45
+    assert response.semantic_understanding == "Looking for rivers"
+    assert [item.title for item in response.results] == ["dense"] and response.degraded_stages == []
+
+
+def test_slow_understanding_is_cut_off_at_its_budget(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_UNDERSTANDING_TIMEOUT", 0.15)
+    llm = SlowLLM(enhance_delay=0.0, understanding_delay=5.0)
+    service = SearchService(vector_db=SlowDenseDatabase(0.0), processor=ZeroProcessor(), llm_service=llm)
+
+    start = time.perf_counter()
+    response = asyncio.run(service.search(SearchQuery(query="rivers", mode="dense")))
+    elapsed = time.perf_counter() - start
+
+    # The budget counts from the start of the search, and the results are still returned
+    assert elapsed < 0.5
+    assert response.semantic_understanding == "" and response.degraded_stages == ["semantic_understanding"]
+    assert [item.title for item in response.results] == ["dense"]
+    assert llm.understanding_cancelled
+
+
+def test_fetching_more_stops_at_the_candidate_cap(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_MAX_CANDIDATES", 30)
+    # Every hit is on one page, so collapsing never reaches top_k pages
+    ranked = [result(f"c{i}", url="https://example.com/one", score=0.99) for i in range(1000)]
+    fetched = []
+
+    def fetch(n):
+        fetched.append(n)
+        return ranked[:n]
+
+    service = SearchService(vector_db=FakeVectorDatabase(), processor=object(), llm_service=FakeLLM())
+    service._fetch_pages(SearchQuery(query="q", top_k=5), 5, fetch)
+    assert fetched == [5, 10, 20, 30]
+
+
+def embedded(doc_id: str, score: float, embedding):
+    item = result(doc_id, score=score)
+    item["embedding"] = np.asarray(embedding, dtype=np.float32)
+    return item
+
+
+def test_mmr_demotes_near_duplicates():
+    candidates = [
+        embedded("original", 0.95, [1, 0, 0]),
+        embedded("near_copy", 0.94, [0.99, 0.05, 0]),
+        embedded("different", 0.80, [0, 1, 0]),
+    ]
+    assert [item["id"] for item in maximal_marginal_relevance(candidates, 2, 0.0)] == ["original", "near_copy"]
+    assert [item["id"] for item in maximal_marginal_relevance(candidates, 2, 0.5)] == ["original", "different"]
+    # The near copy still comes back once nothing else is left
+    assert [item["id"] for item in maximal_marginal_relevance(candidates, 5, 0.5)] == [
+        "original", "different", "near_copy"
+    ]
+
+
+def test_diverse_query_reranks_with_mmr():
+    service = SearchService(vector_db=FakeVectorDatabase(), processor=object(), llm_service=FakeLLM())
+    candidates = [
+        embedded("original", 0.95, [1, 0, 0]),
+        embedded("near_copy", 0.94, [0.99, 0.05, 0]),
+        embedded("different", 0.80, [0, 1, 0]),
+    ]
+    ranked = service._rank_results(SearchQuery(query="q", top_k=2, diversity=0.5), candidates, [])
+    assert [item["id"] for item in ranked] == ["original", "different"]
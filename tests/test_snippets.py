@@ -0,0 +1,51 @@
+# tests/test_snippets.py
+from app.utils.snippets import SnippetMatcher, query_terms, highlight_text
+
+
+def test_query_terms_drops_short_and_repeated_terms():
+    assert query_terms("Is the Search of search engines") == ["the", "search", "engines"]
+    assert query_terms(None) == []
+
+
+def test_snippet_picks_densest_window():
+    document = "filler " * 100 + "vector search with vector indexes. " + "filler " * 100
+    snippet = SnippetMatcher("vector search").snippet(document, max_length=60)
+    assert "vector search with vector" in snippet
+    assert snippet.endswith("...")
+
+
+def test_snippet_without_matches_starts_at_beginning():
+    assert SnippetMatcher("absent").snippet("short text") == "short text"
+    assert SnippetMatcher("absent").snippet("x" * 300, max_length=10) == "x" * 10 + "..."
+
+
+def test_snippet_highlights_and_escapes():
+    snippet = SnippetMatcher("search").snippet("Search <b>searches</b>", highlight=True)
+    assert snippet == "<mark>Search</mark> &lt;b&gt;<mark>search</mark>es&lt;/b&gt;"
+
+
+def test_longer_term_wins_over_contained_term():
+    snippet = SnippetMatcher("search searches").snippet("searches it", highlight=True)
+    assert snippet == "<mark>searches</mark> it"
+
+
+def test_only_highlight_query_terms_are_marked():
+    matcher = SnippetMatcher("vector search engine", highlight_query="search")
+    assert matcher.snippet("vector search", highlight=True) == "vector <mark>search</mark>"
+
+
+def test_term_longer_than_window_does_not_crash():
+    term = "a" * 250
+    snippet = SnippetMatcher(term).snippet("hello " + term + " world")
+    assert snippet == "a" * 200 + "..."
+
+
+def test_term_longer_than_window_among_other_matches():
+    term = "b" * 300
+    document = "alpha " + term + " alpha beta " + term
+    matcher = SnippetMatcher("alpha " + term)
+    assert matcher.snippet(document, max_length=50)
+
+
+def test_highlight_text_single_pass():
+    assert highlight_text("Vector search", ["search", "of"]) == "Vector <mark>search</mark>"
@@ -0,0 +1,67 @@
+# tests/test_vectordb.py
+import pytest
+from app.models.schema import WebPage
+from app.services.quantized import QuantizedVectorStore
+from app.services.registry import PageRegistry
+
+URL = "https://example.com/article"
+
+
+def article(paragraphs: int) -> WebPage:
+    # About 600 characters per paragraph, so the character chunker splits long versions into several chunks
+    content = " ".join(f"Paragraph{i} " + " ".join(f"term{i}x{j}" for j in range(60)) for i in range(paragraphs))
+    return WebPage(url=URL, title="Article", content=content, metadata={"domain": "example.com"})
+
+
+@pytest.fixture(params=["memmap", "chroma"])
+def db(request, tmp_path, monkeypatch, processor):
+    """
+    VectorDatabase on each backend, with a quantized store
+    """
+    import app.services.vectordb as vectordb
+
+    if request.param == "chroma":
+        pytest.importorskip("chromadb")
+        monkeypatch.setenv("ANONYMIZED_TELEMETRY", "False")
+    monkeypatch.setattr(vectordb, "CHROMA_PERSIST_DIRECTORY", str(tmp_path / "chroma"))
+    monkeypatch.setattr(vectordb, "VECTOR_INDEX_DIRECTORY", str(tmp_path / "memmap"))
+    registry = PageRegistry(str(tmp_path / "registry.sqlite3"))
+    quantized_store = QuantizedVectorStore(dim=processor.embedding_model.dim, dtype="float16",
+                                           directory=str(tmp_path / "quantized"))
+    database = vectordb.VectorDatabase(processor=processor, registry=registry,
+                                       quantized_store=quantized_store, backend=request.param)
+    database.rebuild_indexes()
+    yield database
+    database.close()
+    quantized_store.close()
+    registry.close()
+
+
+def test_reindexing_a_page_overwrites_its_chunks(db):
+    first = db.add_webpages([article(5)])
+    count = db.collection.count()
+    assert first["chunks"] == count > 1
+
+    db.add_webpages([article(5)])
+    assert db.collection.count() == count
+    assert len(db.quantized_store) == len(db.lexical_index) == count
+    assert sorted(db.collection.get()["ids"]) == sorted(db.chunk_id(URL, i) for i in range(count))
+
+
+def test_shorter_version_removes_the_stale_chunks(db):
+    db.add_webpages([article(5)])
+    long_ids = set(db.registry.get(URL).chunk_ids)
+
+    db.add_webpages([article(1)])
+    short_ids = set(db.registry.get(URL).chunk_ids)
+    stale = long_ids - short_ids
+    assert short_ids < long_ids and stale
+
+    assert set(db.collection.get()["ids"]) == short_ids
+    assert set(db.quantized_store._rows) == short_ids
+    assert set(db.lexical_index._doc_numbers) == short_ids
+    # Words only the removed chunks contained no longer match anything
+    assert db.lexical_index.search("term4x30") == []
+    assert all(item["id"] in short_ids for item in db.search_many(
+        db.processor.process_queries(["Paragraph4 term4x1"]), top_k=10
+    )[0])